@@ -0,0 +1,138 @@
+"""Feedback control of the batch size and the requests in flight, from the requests observed."""
+import asyncio
+import time
+from typing import Dict, Optional
+
+# Smallest prompt budget the batches are shrunk to
+MIN_PROMPT_TOKENS = 4000
+# Rate limits and server errors halve the requests in flight, slowdowns reduce them less
+DECREASE_FACTOR = 0.5
+SLOWDOWN_DECREASE_FACTOR = 0.75
+# Completion tokens coming this many times slower than at the best time signal congestion
+SLOWDOWN_RATIO = 2.0
+# Share of the largest budget added back after each round of successful requests
+BUDGET_INCREASE_SHARE = 0.1
+# Weight of the latest request in the moving averages
+SMOOTHING = 0.2
+# Seconds between decreases of the same kind until a request latency is known
+INITIAL_COOLDOWN_SECONDS = 10.0
+
+
+def moving_average(average: Optional[float], value: float) -> float:
+    return value if average is None else average + SMOOTHING * (value - average)
+
+
+class AdaptiveController:
+    """Adjusts the prompt budget of batches and the requests in flight, AIMD-style.
+
+    As in TCP congestion control, each round of successful requests, one
+    per request in flight, allows one more request in flight and grows the
+    budget additively, up to the configured maximums. Rate limits and server
+    errors halve the requests in flight, completion tokens arriving much
+    slower than at the best time reduce them, and responses that are cut off
+    or cannot be parsed halve the budget. Each kind of decrease applies at
+    most once per request latency, so a burst of failures of the requests in
+    flight together counts once.
+    """
+
+    def __init__(self, max_concurrency: int, max_prompt_tokens: int,
+                 min_concurrency: int = 1, min_prompt_tokens: int = MIN_PROMPT_TOKENS,
+                 initial_cooldown: float = INITIAL_COOLDOWN_SECONDS):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.min_prompt_tokens = min(min_prompt_tokens, max_prompt_tokens)
+        self.max_prompt_tokens = max_prompt_tokens
+        # Start halfway and probe upwards, with batches as large as allowed
+        self.concurrency = max(self.min_concurrency, self.max_concurrency // 2)
+        self.prompt_tokens = max_prompt_tokens
+        self.in_flight = 0
+        self.successes = 0
+        # Moving averages of the request latency and of the seconds per completion token
+        self.latency = None
+        self.seconds_per_token = None
+        self.best_seconds_per_token = None
+        # Stands for the latency in the cooldown of decreases before the first success
+        self.initial_cooldown = initial_cooldown
+        self._decreased_at: Dict[str, float] = {}
+        self._condition = None
+        self._condition_loop = None
+
+    def describe(self, reason: str) -> str:
+        return (f"Adapted to {reason}: {self.concurrency} requests in flight, "
+                f"batches of up to {self.prompt_tokens:,} prompt tokens.")
+
+    async def acquire(self):
+        """Wait until fewer requests than the current limit are in flight."""
+        # The controller outlives event loops, so the condition is bound per loop
+        loop = asyncio.get_running_loop()
+        if self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+            self.in_flight = 0
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            # The limit may have grown by more than the slot released
+            self._condition.notify_all()
+
+    def _cooling_down(self, kind: str) -> bool:
+        """Return True if a decrease of this kind was applied less than a latency ago."""
+        now = time.monotonic()
+        cooldown = self.latency if self.latency is not None else self.initial_cooldown
+        if now - self._decreased_at.get(kind, float("-inf")) < cooldown:
+            return True
+        self._decreased_at[kind] = now
+        return False
+
+    def _decrease_concurrency(self, factor: float, reason: str) -> Optional[str]:
+        self.successes = 0
+        if self._cooling_down("concurrency"):
+            return None
+        concurrency = max(self.min_concurrency, int(self.concurrency * factor))
+        if concurrency == self.concurrency:
+            return None
+        self.concurrency = concurrency
+        return self.describe(reason)
+
+    def record_success(self, latency: float, completion_tokens: int) -> Optional[str]:
+        """Record a request answered without retries; returns a message if the limits changed."""
+        self.latency = moving_average(self.latency, latency)
+        self.seconds_per_token = moving_average(
+            self.seconds_per_token, latency / max(1, completion_tokens)
+        )
+        if (self.best_seconds_per_token is None
+                or self.seconds_per_token < self.best_seconds_per_token):
+            self.best_seconds_per_token = self.seconds_per_token
+        if self.seconds_per_token > SLOWDOWN_RATIO * self.best_seconds_per_token:
+            return self._decrease_concurrency(SLOWDOWN_DECREASE_FACTOR, "slower responses")
+
+        self.successes += 1
+        if self.successes < self.concurrency:
+            return None
+        self.successes = 0
+        concurrency = min(self.max_concurrency, self.concurrency + 1)
+        prompt_tokens = min(self.max_prompt_tokens, self.prompt_tokens
+                            + int(self.max_prompt_tokens * BUDGET_INCREASE_SHARE))
+        if (concurrency, prompt_tokens) == (self.concurrency, self.prompt_tokens):
+            return None
+        self.concurrency, self.prompt_tokens = concurrency, prompt_tokens
+        return self.describe("successful requests")
+
+    def record_throttling(self) -> Optional[str]:
+        """Record a rate limited or failed request that is retried."""
+        return self._decrease_concurrency(DECREASE_FACTOR, "rate limits or server errors")
+
+    def record_truncation(self) -> Optional[str]:
+        """Record a response that was cut off or could not be parsed."""
+        self.successes = 0
+        if self._cooling_down("budget"):
+            return None
+        prompt_tokens = max(self.min_prompt_tokens, int(self.prompt_tokens * DECREASE_FACTOR))
+        if prompt_tokens == self.prompt_tokens:
+            return None
+        self.prompt_tokens = prompt_tokens
+        return self.describe("cut-off responses")
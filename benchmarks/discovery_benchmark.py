@@ -0,0 +1,122 @@
+"""Benchmark file discovery on a synthetic project tree.
+
+Compares the former os.walk based discovery, which stats every path, with the
+scandir walker and git ls-files used by the analyzer:
+
+    python benchmarks/discovery_benchmark.py --files 500000
+    python benchmarks/discovery_benchmark.py --tree /tmp/big_tree --git
+"""
+import argparse
+import fnmatch
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from file_discovery import iter_files_git, iter_files_scandir  # noqa: E402
+
+IGNORE_DIRS = {
+    'node_modules', 'build', 'dist', '__pycache__', 'venv', 'env', '.git',
+    '.github', '.vscode', '.idea', 'target', 'bin', 'obj', 'out', 'coverage'
+}
+INCLUDE_PATTERNS = ["*.py", "*.ts"]
+FILES_PER_DIR = 100
+
+
+def create_tree(root: Path, file_count: int):
+    """Create a tree of empty files, 10% of them in ignored folders."""
+    (root / ".gitignore").write_text("generated/\n")
+    extensions = [".py", ".ts", ".md", ".json"]
+    for index in range(0, file_count, FILES_PER_DIR):
+        block = index // FILES_PER_DIR
+        if block % 10 == 9:
+            folder = root / f"pkg{block % 50}" / "node_modules" / f"dep{block}"
+        elif block % 10 == 8:
+            folder = root / f"pkg{block % 50}" / "generated" / f"gen{block}"
+        else:
+            folder = root / f"pkg{block % 50}" / f"mod{block % 7}" / f"sub{block}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for offset in range(min(FILES_PER_DIR, file_count - index)):
+            (folder / f"file{offset}{extensions[offset % 4]}").touch()
+
+
+def should_ignore(path: Path) -> bool:
+    """The former path check, with a stat for is_dir and is_file."""
+    if path.name.startswith('.'):
+        return True
+    if path.is_dir() and path.name in IGNORE_DIRS:
+        return True
+    if path.is_file():
+        return not any(fnmatch.fnmatch(path.name, pattern) for pattern in INCLUDE_PATTERNS)
+    return False
+
+
+def iter_files_os_walk(base_path: str):
+    """The former discovery: os.walk with a stat for every path."""
+    for root, dirs, files in os.walk(base_path):
+        dirs[:] = [d for d in dirs if not should_ignore(Path(root) / d)]
+        for file in files:
+            file_path = Path(root) / file
+            if not should_ignore(file_path):
+                yield file_path.relative_to(base_path)
+
+
+def skip_dir(name: str) -> bool:
+    return name.startswith('.') or name in IGNORE_DIRS
+
+
+def include_file(name: str) -> bool:
+    return not name.startswith('.') and any(
+        fnmatch.fnmatch(name, pattern) for pattern in INCLUDE_PATTERNS
+    )
+
+
+def measure(name: str, files):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in files:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    total = time.perf_counter() - start
+    print(f"{name:<12} {count:>9,} files   first file {first or 0:8.4f}s   total {total:8.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark project file discovery")
+    parser.add_argument("--files", type=int, default=500000, help="Files in the synthetic tree")
+    parser.add_argument("--tree", help="Use or create the tree in this folder and keep it")
+    parser.add_argument("--git", action="store_true", help="Also benchmark git ls-files")
+    args = parser.parse_args()
+
+    root = Path(args.tree or tempfile.mkdtemp(prefix="discovery_benchmark_"))
+    try:
+        if not any(root.glob("pkg*")):
+            print(f"Creating {args.files:,} files in {root}...")
+            start = time.perf_counter()
+            create_tree(root, args.files)
+            print(f"Created in {time.perf_counter() - start:.1f}s")
+
+        # Note that the first measurement may include warming up the OS cache
+        measure("os.walk", iter_files_os_walk(str(root)))
+        measure("scandir", iter_files_scandir(str(root), skip_dir, include_file))
+
+        if args.git:
+            if not (root / ".git").exists():
+                print("Adding the tree to a git repository...")
+                subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+                subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+            measure("git ls-files", iter_files_git(str(root), skip_dir, include_file))
+    finally:
+        if not args.tree:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
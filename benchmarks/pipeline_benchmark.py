@@ -0,0 +1,224 @@
+"""Benchmark the analysis pipeline on synthetic projects with a fake LLM backend.
+
+Runs every stage of ProjectAnalyzer.process_project on generated projects of
+the given sizes and reports, per stage, the wall time, LLM requests, tokens
+and peak memory, without a deployment or credentials:
+
+    python benchmarks/pipeline_benchmark.py --files 100,1000,10000
+    python benchmarks/pipeline_benchmark.py --files 100000 --latency 0.5 --concurrency 16
+    python benchmarks/pipeline_benchmark.py --files 1000 --json before.json
+
+Peak memory is the process high-water mark after each stage; --tracemalloc
+measures the peak Python allocations within each stage instead, at the cost
+of slowing everything down.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from adaptive import MIN_PROMPT_TOKENS, AdaptiveController  # noqa: E402
+from llm_backends import FakeBackend  # noqa: E402
+from progress import ProgressReporter  # noqa: E402
+from project_analyzer import ProjectAnalyzer  # noqa: E402
+
+FILES_PER_DIR = 20
+DIRS_PER_PACKAGE = 10
+# Share of the files that are vendored copies of other files
+DUPLICATE_SHARE = 0.05
+TOTAL_KEYS = ("requests", "prompt_tokens", "completion_tokens", "retries")
+
+
+def module_source(rng: random.Random, index: int, module_count: int) -> str:
+    """A Python module importing a few others, with classes and functions."""
+    lines = [f'"""Module {index} of the synthetic project."""']
+    for imported in sorted(set(rng.randrange(module_count) for _ in range(rng.randint(0, 4)))):
+        lines.append(f"from {module_name(imported)} import Model{imported}")
+    for number in range(rng.randint(1, 8)):
+        lines += [
+            "", "",
+            f"class Model{index}x{number}:",
+            f'    """A data model with {number} fields."""',
+            "    id: int",
+            "    name: str",
+            "",
+            "    def save(self, store) -> None:",
+            f"        store.put(self.id, self.name * {number})",
+        ]
+    lines += ["", "", f"Model{index} = Model{index}x0", ""]
+    return "\n".join(lines)
+
+
+def module_name(index: int) -> str:
+    return f"pkg{index // (FILES_PER_DIR * DIRS_PER_PACKAGE)}.mod{index // FILES_PER_DIR}.m{index}"
+
+
+def create_project(root: Path, file_count: int, seed: int = 0):
+    """Create a Python project of file_count files, some of them vendored copies."""
+    rng = random.Random(seed)
+    module_count = int(file_count * (1 - DUPLICATE_SHARE))
+    for index in range(module_count):
+        path = root / (module_name(index).replace(".", "/") + ".py")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(module_source(rng, index, module_count))
+    for index in range(file_count - module_count):
+        original = rng.randrange(module_count)
+        path = root / "vendor" / (module_name(original).replace(".", "/") + ".py")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(root / (module_name(original).replace(".", "/") + ".py"), path)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+class StageTimer:
+    """Measures each stage of a run of the analyzer."""
+
+    def __init__(self, reporter: ProgressReporter, use_tracemalloc: bool):
+        self.reporter = reporter
+        self.use_tracemalloc = use_tracemalloc
+        self.stages = []
+
+    def run(self, name: str, stage, *args):
+        totals = {key: self.reporter.totals[key] for key in TOTAL_KEYS}
+        if self.use_tracemalloc:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        stage(*args)
+        elapsed = time.perf_counter() - start
+        result = {"stage": name, "seconds": round(elapsed, 3)}
+        result.update({key: self.reporter.totals[key] - totals[key] for key in TOTAL_KEYS})
+        if self.use_tracemalloc:
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        else:
+            result["peak_mb"] = round(peak_rss_mb(), 1)
+        self.stages.append(result)
+
+
+def benchmark(root: Path, args) -> list:
+    """Run the stages of process_project on a project and return their measurements."""
+    reporter = ProgressReporter(quiet=True)
+    backend = FakeBackend(
+        latency=args.latency, tokens_per_second=args.tokens_per_second,
+        description_words=args.description_words, error_rate=args.error_rate,
+        invalid_rate=args.invalid_rate, seed=args.seed, max_in_flight=args.max_in_flight
+    )
+    controller = None
+    if args.adaptive:
+        controller = AdaptiveController(args.concurrency, args.max_prompt_tokens,
+                                        min_prompt_tokens=args.min_prompt_tokens)
+    analyzer = ProjectAnalyzer(
+        str(root), "*.py", args.batch_size, max_prompt_tokens=args.max_prompt_tokens,
+        concurrency=args.concurrency, assume_yes=True, reporter=reporter,
+        mode=args.mode, dedup=not args.no_dedup, backend=backend, controller=controller,
+        max_retries=args.max_retries
+    )
+    timer = StageTimer(reporter, args.tracemalloc)
+    timer.run("collect_files", analyzer.collect_files)
+    timer.run("dependency_graph", analyzer.build_dependency_graph)
+    if args.mode == "skeleton":
+        timer.run("skeletons", analyzer.build_skeletons)
+    if not args.no_dedup:
+        timer.run("duplicates", analyzer.find_duplicates)
+    analyzer.checkpoint.start(analyzer.checkpoint_header())
+    analyzer.writer.start(analyzer.file_descriptions, analyzer.module_descriptions)
+    timer.run("batches", analyzer.process_batches)
+    timer.run("describe_duplicates", analyzer.describe_duplicates)
+    timer.run("project_description", analyzer.generate_project_description)
+    timer.run("save_results", analyzer.save_results)
+    analyzer.checkpoint.remove()
+    analyzer.writer.close()
+    return timer.stages
+
+
+def print_stages(file_count: int, stages: list):
+    print(f"\n{file_count:,} files")
+    print(f"  {'stage':<22}{'seconds':>9}{'requests':>10}{'prompt tok':>13}"
+          f"{'compl. tok':>12}{'retries':>9}{'peak MB':>9}")
+    for stage in stages:
+        print(f"  {stage['stage']:<22}{stage['seconds']:>9.2f}{stage['requests']:>10,}"
+              f"{stage['prompt_tokens']:>13,}{stage['completion_tokens']:>12,}"
+              f"{stage['retries']:>9,}{stage['peak_mb']:>9.1f}")
+    print(f"  {'total':<22}{sum(stage['seconds'] for stage in stages):>9.2f}"
+          f"{sum(stage['requests'] for stage in stages):>10,}"
+          f"{sum(stage['prompt_tokens'] for stage in stages):>13,}"
+          f"{sum(stage['completion_tokens'] for stage in stages):>12,}"
+          f"{sum(stage['retries'] for stage in stages):>9,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline")
+    parser.add_argument("--files", default="100,1000,10000",
+                        help="Comma-separated sizes of the synthetic projects")
+    parser.add_argument("--tree", help="Create the projects in this folder and keep them")
+    parser.add_argument("--json", help="Write the measurements to this JSON file")
+    parser.add_argument("--batch-size", type=int, default=40)
+    parser.add_argument("--max-prompt-tokens", type=int, default=32000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mode", choices=["full", "skeleton"], default="full")
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds taken by every fake request")
+    parser.add_argument("--tokens-per-second", type=float,
+                        help="Completion tokens generated per second by the fake backend")
+    parser.add_argument("--description-words", type=int, default=30,
+                        help="Words of filler in every fake file description")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of fake requests failing with a 429")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="Fraction of fake batch analyses answered with truncated JSON")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Requests the fake backend serves at a time, failing others with a 429")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt the requests in flight and the batch budget during the run")
+    parser.add_argument("--min-prompt-tokens", type=int, default=MIN_PROMPT_TOKENS)
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Measure the peak Python allocations of each stage")
+    args = parser.parse_args()
+
+    base = Path(args.tree or tempfile.mkdtemp(prefix="pipeline_benchmark_"))
+    # The analyzer writes its results, checkpoint and state to out/ in the working folder
+    work_dir = Path(tempfile.mkdtemp(prefix="pipeline_benchmark_out_"))
+    cwd = os.getcwd()
+    results = []
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        os.chdir(work_dir)
+        for file_count in (int(size) for size in args.files.split(",")):
+            root = base / f"project_{file_count}"
+            if not root.exists():
+                start = time.perf_counter()
+                create_project(root, file_count, args.seed)
+                print(f"Created {file_count:,} files in {time.perf_counter() - start:.1f}s")
+            shutil.rmtree(work_dir / "out", ignore_errors=True)
+            stages = benchmark(root, args)
+            print_stages(file_count, stages)
+            results.append({"files": file_count, "stages": stages})
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not args.tree:
+            shutil.rmtree(base, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
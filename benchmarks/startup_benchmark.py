@@ -0,0 +1,96 @@
+"""Benchmark the startup of the analyzer CLI.
+
+Times importing project_analyzer, printing --help and a --dry-run on a small
+generated project, each in a fresh interpreter, and lists the heavy modules
+loaded by the import. The commands run without Azure settings and with the
+HTTP proxies pointing at a closed port, so any network access fails them:
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 20 --files 2000
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+ANALYZER = REPO_ROOT / "project_analyzer.py"
+# Modules that should only be loaded once a request is sent
+HEAVY_MODULES = ("openai", "httpx", "azure.identity", "tiktoken")
+# Nothing listens on the discard port, so requests through this proxy fail fast
+CLOSED_PROXY = "http://127.0.0.1:9"
+FILES_PER_DIR = 50
+
+
+def offline_env() -> dict:
+    """Environment without Azure settings, where HTTP requests fail."""
+    env = {key: value for key, value in os.environ.items()
+           if not key.startswith("AZURE_")}
+    env.update({"HTTP_PROXY": CLOSED_PROXY, "HTTPS_PROXY": CLOSED_PROXY,
+                "http_proxy": CLOSED_PROXY, "https_proxy": CLOSED_PROXY,
+                "NO_PROXY": "", "no_proxy": "", "PYTHONPATH": str(REPO_ROOT)})
+    return env
+
+
+def create_project(root: Path, file_count: int):
+    for index in range(file_count):
+        folder = root / f"pkg{index // FILES_PER_DIR}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"module{index}.py").write_text(
+            f"import os\n\n\ndef function{index}():\n    return os.getcwd()\n"
+        )
+
+
+def measure(name: str, command: list, runs: int, cwd: Path):
+    """Run a command in fresh interpreters and print its min and median wall time."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=cwd, env=offline_env(),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            print(f"{name} failed:\n{result.stderr}")
+            return
+    print(f"{name:<12} min {min(times) * 1000:7.0f} ms   "
+          f"median {statistics.median(times) * 1000:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup of the analyzer CLI")
+    parser.add_argument("--runs", type=int, default=10, help="Runs of each command")
+    parser.add_argument("--files", type=int, default=500,
+                        help="Files in the project planned with --dry-run")
+    args = parser.parse_args()
+
+    loaded = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, project_analyzer; "
+         f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+        cwd=REPO_ROOT, env=offline_env(), capture_output=True, text=True
+    )
+    if loaded.returncode != 0:
+        print(f"Importing project_analyzer failed:\n{loaded.stderr}")
+        sys.exit(1)
+    print(f"Heavy modules loaded by the import: {loaded.stdout.strip() or 'none'}")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="startup_benchmark_"))
+    try:
+        project = work_dir / "project"
+        create_project(project, args.files)
+        measure("import", [sys.executable, "-c", "import project_analyzer"],
+                args.runs, work_dir)
+        measure("--help", [sys.executable, str(ANALYZER), "--help"], args.runs, work_dir)
+        measure("--dry-run", [sys.executable, str(ANALYZER), str(project), "--ext", "py",
+                              "--no-git", "--dry-run"], args.runs, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
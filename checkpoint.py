@@ -0,0 +1,85 @@
+"""Append-only checkpoint of merged batch results, so an interrupted run can resume."""
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+class Checkpoint:
+    """Journal of batch results in a JSON-lines file.
+
+    The first line is a header identifying the run, and every following line
+    is the result of one batch. Each line is flushed to disk before the next
+    batch is merged. A line torn by a crash is dropped when loading, so a
+    record is either fully present or absent.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def load(self) -> Tuple[Optional[Dict], List[Dict]]:
+        """Read the header and the complete records, truncating a torn last line."""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return None, []
+
+        header = None
+        records = []
+        valid_size = 0
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    break
+                if header is None:
+                    header = data
+                else:
+                    records.append(data)
+                valid_size += len(line)
+
+        if header is None:
+            return None, []
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+        return header, records
+
+    def start(self, header: Dict):
+        """Start a new checkpoint, atomically replacing any previous one."""
+        self.close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.open()
+
+    def open(self):
+        """Open an existing checkpoint to append records to it."""
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, record: Dict):
+        """Durably append the record of a merged batch."""
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """Delete the checkpoint once the run it belongs to has finished."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,191 @@
+"""Registry merging the data models reported by batch analyses into one entity per name.
+
+Batches name the same entity differently, e.g. "User", "UserEntity",
+"users" or "models.User". Names are normalized to an interned key, so these
+all merge into one model, with their attributes merged by normalized
+attribute name and their relationships kept in insertion-ordered sets.
+Merging a batch only touches the models it reports, so the cost of a run
+grows linearly with the reported data; lists are only built for output.
+"""
+import re
+import sys
+from typing import Dict, Iterator, List, Optional
+
+# Words that qualify an entity name without changing the entity it names
+ENTITY_SUFFIXES = {
+    "entity", "entities", "model", "models", "dto", "record", "schema", "table",
+    "document", "doc", "orm", "db", "dao", "vo", "bean", "pojo",
+}
+WORD_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z]|\d|\b|_)|[A-Z]?[a-z]+|[A-Z]+|\d+")
+# Separators of qualified names, e.g. models.User, App\\Models\\User or db::User
+QUALIFIER_PATTERN = re.compile(r"[.:/\\]+")
+
+
+def singular(word: str) -> str:
+    """Return the singular of a lowercase English word, for the common plural forms."""
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "xes", "ches", "shes", "zes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def name_words(name: str) -> List[str]:
+    """Split a camelCase, PascalCase, snake_case or kebab-case name into lowercase words."""
+    return [word.lower() for word in WORD_PATTERN.findall(name)]
+
+
+def model_key(name: str) -> str:
+    """Normalized key of a data model name, e.g. "user" for "UserEntity" or "users"."""
+    unqualified = QUALIFIER_PATTERN.split(name.strip())[-1] or name.strip()
+    words = name_words(unqualified)
+    while len(words) > 1 and words[-1] in ENTITY_SUFFIXES:
+        words.pop()
+    if not words:
+        return sys.intern(name.strip().lower())
+    words[-1] = singular(words[-1])
+    return sys.intern("_".join(words))
+
+
+def attribute_key(name: str) -> str:
+    """Normalized key of an attribute name, e.g. "user_id" for "userId" or "UserID"."""
+    return sys.intern("_".join(name_words(name)) or name.strip().lower())
+
+
+def relationship_key(relationship: str) -> str:
+    return " ".join(relationship.lower().split())
+
+
+class DataModel:
+    """An entity merged from every batch that reported it."""
+
+    __slots__ = ("name", "aliases", "description", "attributes", "relationships")
+
+    def __init__(self, name: str):
+        self.name = name
+        # Every name the entity was reported under
+        self.aliases = {name}
+        self.description = ""
+        # Attribute key -> (attribute name, description)
+        self.attributes = {}
+        # Relationship key -> relationship, an insertion-ordered set
+        self.relationships = {}
+
+    def add_name(self, name: str):
+        self.aliases.add(name)
+        # Show the shortest name, e.g. "User" rather than "UserEntity"
+        if (len(name), name) < (len(self.name), self.name):
+            self.name = name
+
+    def add_description(self, description: str):
+        # Keep the most detailed description
+        if len(description) > len(self.description):
+            self.description = description
+
+    def add_attribute(self, name: str, description: str):
+        key = attribute_key(name)
+        existing = self.attributes.get(key)
+        if existing is None or len(description) > len(existing[1]):
+            self.attributes[key] = (existing[0] if existing else name, description)
+
+    def add_relationship(self, relationship: str):
+        self.relationships.setdefault(relationship_key(relationship), relationship)
+
+    def weight(self) -> int:
+        """How much the model tells about the project, to list the richest models first."""
+        return len(self.attributes) + 2 * len(self.relationships)
+
+    def to_dict(self) -> Dict:
+        return {
+            "description": self.description,
+            "attributes": dict(self.attributes.values()),
+            "relationships": list(self.relationships.values()),
+            "aliases": sorted(self.aliases - {self.name}),
+        }
+
+
+class DataModelRegistry:
+    """Data models of the project by normalized name."""
+
+    def __init__(self):
+        self.models: Dict[str, DataModel] = {}
+        # Keys of the names seen so far, as the same names come back in many batches
+        self._keys: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def __iter__(self) -> Iterator[DataModel]:
+        return iter(self.models.values())
+
+    def key(self, name: str) -> str:
+        key = self._keys.get(name)
+        if key is None:
+            key = self._keys[name] = model_key(name)
+        return key
+
+    def get(self, name: str) -> Optional[DataModel]:
+        """Return the model a name resolves to, if any."""
+        return self.models.get(self.key(name))
+
+    def merge(self, name: str, info: Dict):
+        """Merge one reported model, tolerating malformed fields in the response."""
+        if not isinstance(name, str) or not name.strip():
+            return
+        name = name.strip()
+        key = self.key(name)
+        model = self.models.get(key)
+        if model is None:
+            model = self.models[key] = DataModel(name)
+        else:
+            model.add_name(name)
+        if not isinstance(info, dict):
+            return
+
+        description = info.get("description")
+        if isinstance(description, str):
+            model.add_description(description.strip())
+        for alias in info.get("aliases") or []:
+            if isinstance(alias, str) and alias.strip():
+                model.aliases.add(alias.strip())
+
+        attributes = info.get("attributes") or {}
+        if isinstance(attributes, list):
+            attributes = {attribute: "" for attribute in attributes if isinstance(attribute, str)}
+        if isinstance(attributes, dict):
+            for attribute, description in attributes.items():
+                model.add_attribute(str(attribute), str(description or ""))
+
+        relationships = info.get("relationships") or []
+        if isinstance(relationships, str):
+            relationships = [relationships]
+        if isinstance(relationships, list):
+            for relationship in relationships:
+                if isinstance(relationship, str) and relationship.strip():
+                    model.add_relationship(relationship.strip())
+
+    def merge_all(self, data_models: Dict):
+        """Merge the data models of a batch result."""
+        if isinstance(data_models, dict):
+            for name, info in data_models.items():
+                self.merge(name, info)
+
+    def ranked(self) -> List[DataModel]:
+        """Models with the most attributes and relationships first, then by name."""
+        return sorted(self.models.values(), key=lambda model: (-model.weight(), model.name))
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Serialize the models by display name, sorted for stable output."""
+        return {
+            model.name: model.to_dict()
+            for model in sorted(self.models.values(), key=lambda model: model.name)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict]) -> "DataModelRegistry":
+        """Load the models saved with to_dict, or with the former name-keyed dicts."""
+        registry = cls()
+        registry.merge_all(data or {})
+        return registry
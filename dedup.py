@@ -0,0 +1,150 @@
+"""Detection of exact and near-duplicate files before batching.
+
+Exact duplicates are grouped by content hash. Near-duplicates are found with
+MinHash signatures over token shingles and locality-sensitive hashing: files
+whose signatures agree on a whole band of values become candidates, which are
+then compared on their full signatures. Each file is only compared with the
+representatives sharing a band with it, so the cost grows about linearly with
+the number of files.
+"""
+import os
+import re
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from file_content import classify_sample, hash_file, sample_content
+from import_extractors import map_file_jobs
+
+# Tokens per shingle
+SHINGLE_SIZE = 5
+# Only the start of larger files is compared
+MAX_COMPARED_BYTES = 64 * 1024
+# Values of a signature, with one-permutation hashing: each is the minimum of a bin
+SIGNATURE_SIZE = 64
+# LSH bands of ROWS_PER_BAND values; files with about 0.77 similarity become candidates
+ROWS_PER_BAND = 8
+# Share of equal signature values above which files count as near-duplicates
+SIMILARITY_THRESHOLD = 0.85
+# Candidates compared per band, so a crowded band cannot make the stage quadratic
+MAX_BAND_CANDIDATES = 32
+# Value of signature bins without any shingle
+EMPTY_BIN = 1 << 32
+
+TOKEN_PATTERN = re.compile(rb"\w+|[^\w\s]")
+
+
+class FileFingerprint(NamedTuple):
+    content_hash: str
+    size: int
+    # None for files too small or not text, which are only compared exactly
+    signature: Optional[Tuple[int, ...]]
+
+
+def minhash_signature(data: bytes) -> Optional[Tuple[int, ...]]:
+    """Return the MinHash signature of the token shingles of some text.
+
+    One hash per shingle is spread over SIGNATURE_SIZE bins, keeping the
+    minimum of each bin, instead of hashing every shingle SIGNATURE_SIZE times.
+    """
+    tokens = TOKEN_PATTERN.findall(data)
+    if len(tokens) < SHINGLE_SIZE * 4:
+        return None
+    bins = [EMPTY_BIN] * SIGNATURE_SIZE
+    for index in range(len(tokens) - SHINGLE_SIZE + 1):
+        shingle = b" ".join(tokens[index:index + SHINGLE_SIZE])
+        # Mix the CRC so that its low bits, which pick the bin, are well distributed
+        value = (zlib.crc32(shingle) * 0x9E3779B1) & 0xFFFFFFFF
+        bin_index = value % SIGNATURE_SIZE
+        if value < bins[bin_index]:
+            bins[bin_index] = value
+    return tuple(bins)
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimate the Jaccard similarity of two files from their signatures."""
+    compared = equal = 0
+    for a, b in zip(first, second):
+        if a == EMPTY_BIN and b == EMPTY_BIN:
+            continue
+        compared += 1
+        equal += a == b
+    return equal / compared if compared else 0.0
+
+
+def _fingerprint_file(job: Tuple[str, str, int]) -> Optional[FileFingerprint]:
+    """Hash a file and compute its signature; runs in a worker process."""
+    base_path, path, min_bytes = job
+    full_path = os.path.join(base_path, path)
+    try:
+        content_hash = hash_file(full_path)
+        with open(full_path, "rb") as f:
+            data = f.read(MAX_COMPARED_BYTES)
+        size = os.path.getsize(full_path)
+    except OSError:
+        return None
+    signature = None
+    if size >= min_bytes and classify_sample(sample_content(data)) == "text":
+        signature = minhash_signature(data)
+    return FileFingerprint(content_hash, size, signature)
+
+
+def fingerprint_files(base_path: str, files: List[str], min_bytes: int,
+                      workers: Optional[int] = None) -> Dict[str, FileFingerprint]:
+    """Fingerprint every readable file, using a process pool for large projects."""
+    jobs = [(base_path, path, min_bytes) for path in files]
+    results = map_file_jobs(_fingerprint_file, jobs, workers)
+    return {path: result for path, result in zip(files, results) if result is not None}
+
+
+def find_duplicates(fingerprints: Dict[str, FileFingerprint],
+                    min_bytes: int) -> Dict[str, Tuple[str, bool]]:
+    """Map each duplicate file to (representative, exact) for files of at least min_bytes.
+
+    Files are visited in path order, and the first file of a group is its
+    representative. A file is only matched against representatives, so
+    chains of slightly changed copies do not merge dissimilar files.
+    """
+    duplicates = {}
+    by_hash = {}
+    # Representatives by (band index, band values)
+    bands = {}
+    signatures = {}
+    for path in sorted(fingerprints):
+        fingerprint = fingerprints[path]
+        if fingerprint.size < min_bytes:
+            continue
+        representative = by_hash.get(fingerprint.content_hash)
+        if representative is not None:
+            duplicates[path] = (representative, True)
+            continue
+        by_hash[fingerprint.content_hash] = path
+        signature = fingerprint.signature
+        if signature is None:
+            continue
+
+        keys = [
+            (start, signature[start:start + ROWS_PER_BAND])
+            for start in range(0, SIGNATURE_SIZE, ROWS_PER_BAND)
+        ]
+        match = None
+        compared = set()
+        for key in keys:
+            if all(value == EMPTY_BIN for value in key[1]):
+                continue
+            for candidate in bands.get(key, [])[:MAX_BAND_CANDIDATES]:
+                if candidate in compared:
+                    continue
+                compared.add(candidate)
+                if similarity(signature, signatures[candidate]) >= SIMILARITY_THRESHOLD:
+                    match = candidate
+                    break
+            if match is not None:
+                break
+        if match is not None:
+            duplicates[path] = (match, False)
+            continue
+
+        signatures[path] = signature
+        for key in keys:
+            bands.setdefault(key, []).append(path)
+    return duplicates
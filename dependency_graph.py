@@ -0,0 +1,183 @@
+"""Dependency graph of a project, with fast queries and MermaidJS rendering."""
+import re
+from pathlib import PurePosixPath
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Name of the module of nodes whose file is not known
+UNKNOWN_MODULE = "other"
+
+
+class DependencyGraph:
+    """Directed graph with interned node ids and forward and reverse adjacency.
+
+    Adding is a set union, so adding the same nodes and edges again never
+    removes or duplicates anything.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        # File defining each node, "" if not known
+        self._files: List[str] = []
+        self._dependencies: List[Set[int]] = []
+        self._dependents: List[Set[int]] = []
+        self.edge_count = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def add_node(self, name: str, file_path: str = "") -> int:
+        """Add a node if it does not exist yet and return its id.
+
+        The file of an existing node is only set if it was not known before.
+        """
+        node_id = self._ids.get(name)
+        if node_id is None:
+            node_id = len(self._names)
+            self._ids[name] = node_id
+            self._names.append(name)
+            self._files.append(file_path)
+            self._dependencies.append(set())
+            self._dependents.append(set())
+        elif file_path and not self._files[node_id]:
+            self._files[node_id] = file_path
+        return node_id
+
+    def add_edge(self, source: str, target: str):
+        """Add an edge meaning that source depends on target."""
+        source_id = self.add_node(source)
+        target_id = self.add_node(target)
+        if source_id == target_id or target_id in self._dependencies[source_id]:
+            return
+        self._dependencies[source_id].add(target_id)
+        self._dependents[target_id].add(source_id)
+        self.edge_count += 1
+
+    def nodes(self) -> Iterator[Tuple[str, str]]:
+        """Iterate over (name, file) of all nodes."""
+        return zip(self._names, self._files)
+
+    def edges(self) -> Iterator[Tuple[str, str]]:
+        """Iterate over (source, target) of all edges."""
+        for source_id, targets in enumerate(self._dependencies):
+            for target_id in targets:
+                yield self._names[source_id], self._names[target_id]
+
+    def file_of(self, name: str) -> str:
+        """Return the file defining a node, "" if not known."""
+        return self._files[self._ids[name]]
+
+    def module_of(self, name: str) -> str:
+        """Return the folder of the file defining a node."""
+        file_path = self.file_of(name)
+        return str(PurePosixPath(file_path).parent) if file_path else UNKNOWN_MODULE
+
+    def dependencies(self, name: str) -> Set[str]:
+        """Return the nodes a node depends on."""
+        return set(self._names[i] for i in self._dependencies[self._ids[name]])
+
+    def dependents(self, name: str) -> Set[str]:
+        """Return the nodes depending on a node."""
+        return set(self._names[i] for i in self._dependents[self._ids[name]])
+
+    def find_cycles(self) -> List[List[str]]:
+        """Return the groups of nodes that depend on each other in a cycle.
+
+        Uses an iterative version of Tarjan's strongly connected components
+        algorithm, so deep graphs do not hit the recursion limit.
+        """
+        index_of = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+
+        for root in range(len(self._names)):
+            if root in index_of:
+                continue
+            work = [(root, iter(sorted(self._dependencies[root])))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, targets = work[-1]
+                advanced = False
+                for target in targets:
+                    if target not in index_of:
+                        index_of[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(sorted(self._dependencies[target]))))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[target])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cycles.append(sorted(self._names[i] for i in component))
+        return sorted(cycles)
+
+    def collapsed(self) -> "DependencyGraph":
+        """Return the graph of modules, with an edge where any of their nodes depend."""
+        graph = DependencyGraph()
+        for name, _ in self.nodes():
+            graph.add_node(self.module_of(name))
+        for source, target in self.edges():
+            graph.add_edge(self.module_of(source), self.module_of(target))
+        return graph
+
+    def to_mermaid(self, max_nodes: Optional[int] = None) -> str:
+        """Render the graph as MermaidJS graph TD syntax.
+
+        A graph with more than max_nodes nodes is collapsed to its modules, so
+        that it stays readable.
+        """
+        if max_nodes is not None and len(self) > max_nodes:
+            return self.collapsed().to_mermaid()
+
+        names = sorted(self._names)
+        node_ids = {name: f"N{index}" for index, name in enumerate(names)}
+        lines = ["graph TD"]
+        for name in names:
+            # Mermaid labels must not contain quotes or brackets
+            label = re.sub(r'[()\[\]{}"<>]', "", name)
+            lines.append(f'    {node_ids[name]}["{label}"]')
+        for source, target in sorted(self.edges()):
+            lines.append(f"    {node_ids[source]} --> {node_ids[target]}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict:
+        """Serialize the graph to JSON-compatible data."""
+        return {
+            "nodes": dict(sorted(self.nodes())),
+            "edges": [list(edge) for edge in sorted(self.edges())],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DependencyGraph":
+        """Load a graph saved with to_dict."""
+        graph = cls()
+        for name, file_path in data.get("nodes", {}).items():
+            graph.add_node(name, file_path)
+        for source, target in data.get("edges", []):
+            graph.add_edge(source, target)
+        return graph
@@ -0,0 +1,163 @@
+"""A local stand-in for an Azure OpenAI chat completions deployment.
+
+Answers every request with a deterministic analysis of the files in the
+prompt, so the analyzer can be exercised without a real deployment:
+
+    python fake_llm_server.py --port 8089 --latency 0.5
+
+    AZURE_OPENAI_API_BASE_URL=http://127.0.0.1:8089 \\
+    AZURE_OPENAI_API_KEY=fake \\
+    AZURE_OPENAI_DEPLOYMENT_NAME=o3-mini \\
+    AZURE_OPENAI_API_VERSION=2024-12-01-preview \\
+    python project_analyzer.py --ext py --concurrency 8 <folder_to_analyze>
+
+--error-rate and --invalid-rate make some requests fail with a 429 or return
+a response that is not JSON, to exercise retries and batch splitting.
+Streamed requests are answered with server-sent events.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backends import STREAM_CHUNK_CHARS, fake_content, prompt_text
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    invalid_rate = 0.0
+    requests_served = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            body = json.dumps({"error": {
+                "code": "429", "message": "Rate limit of the fake server exceeded."
+            }}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        prompt = prompt_text(request.get("messages", []))
+        content = fake_content(prompt, invalid=random.random() < self.invalid_rate)
+
+        with FakeChatHandler.lock:
+            FakeChatHandler.requests_served += 1
+            request_id = FakeChatHandler.requests_served
+
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if request.get("stream"):
+            self.send_stream(request, request_id, content, usage)
+            return
+
+        body = json.dumps({
+            "id": f"chatcmpl-fake-{request_id}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "o3-mini"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": usage,
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, request: dict, request_id: int, content: str, usage: dict):
+        """Send the completion as server-sent events, in chunks like a deployment does."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send_chunk(choices: list, chunk_usage=None):
+            chunk = {
+                "id": f"chatcmpl-fake-{request_id}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "o3-mini"),
+                "choices": choices,
+                "usage": chunk_usage,
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            send_chunk([{
+                "index": 0,
+                "finish_reason": None,
+                "delta": {"content": content[start:start + STREAM_CHUNK_CHARS]},
+            }])
+        send_chunk([{"index": 0, "finish_reason": "stop", "delta": {}}])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send_chunk([], usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve fake Azure OpenAI chat completions for local testing"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds to wait before answering each request"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a 429 and Retry-After: 1"
+    )
+    parser.add_argument(
+        "--invalid-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of batch analyses answered with truncated JSON"
+    )
+    args = parser.parse_args()
+
+    FakeChatHandler.latency = args.latency
+    FakeChatHandler.error_rate = args.error_rate
+    FakeChatHandler.invalid_rate = args.invalid_rate
+    server = ThreadingHTTPServer((args.host, args.port), FakeChatHandler)
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
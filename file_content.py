@@ -0,0 +1,202 @@
+"""Memory-bounded loading of file contents for prompts.
+
+Files are memory-mapped, so only the bytes that end up in a prompt are copied.
+Binary, minified and generated files are detected from samples of their
+content, and files over a size cap are cut down to their head and tail.
+"""
+import hashlib
+import mmap
+import re
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Optional, Union
+
+# Bytes sampled at the start, middle and end of a file to classify it
+SAMPLE_BYTES = 8192
+# Share of control bytes above which a sample is considered binary
+BINARY_CONTROL_RATIO = 0.1
+# Average line length above which a sample is considered minified
+MINIFIED_LINE_LENGTH = 500
+# Bytes of a minified file shown in the prompt
+MINIFIED_HEAD_BYTES = 1024
+GENERATED_MARKERS = (
+    b"@generated", b"DO NOT EDIT", b"Code generated", b"auto-generated",
+    b"autogenerated", b"This file was automatically generated",
+)
+# Bytes of declarations shown for a generated file
+GENERATED_SIGNATURE_BYTES = 16 * 1024
+# Share of a truncated file taken from its start, the rest comes from its end
+HEAD_SHARE = 0.75
+
+# Size of the reads when hashing a file
+HASH_BLOCK_BYTES = 1024 * 1024
+
+# Lines declaring classes, functions, types and the like, across common languages
+SIGNATURE_PATTERN = re.compile(
+    rb"^[ \t]*(?:@\w+|(?:export|default|public|private|protected|internal|static|abstract|"
+    rb"async|pub|final|override|sealed|data|open)\s+)*"
+    rb"(?:def|class|function|interface|type|struct|enum|func|fn|trait|impl|module|record|"
+    rb"object|namespace|message|service|rpc)\b[^\n]*",
+    re.M
+)
+
+# Bytes other than tab, newline, form feed and carriage return below 0x20
+CONTROL_BYTES = bytes(set(range(32)) - {9, 10, 12, 13})
+
+
+class FileContent(NamedTuple):
+    """Content of a file as sent in a prompt."""
+    text: str
+    # "text", "truncated", "binary", "minified", "generated" or "error"
+    kind: str
+    size: int
+
+
+def decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def sample_content(data: Union[bytes, mmap.mmap]) -> bytes:
+    """Return samples from the start, middle and end of the data."""
+    size = len(data)
+    if size <= 3 * SAMPLE_BYTES:
+        return data[:]
+    middle = size // 2
+    return (data[:SAMPLE_BYTES] + data[middle:middle + SAMPLE_BYTES]
+            + data[size - SAMPLE_BYTES:])
+
+
+def classify_sample(sample: bytes) -> str:
+    """Classify a file as "binary", "generated", "minified" or "text" from a sample."""
+    if not sample:
+        return "text"
+    if b"\0" in sample:
+        return "binary"
+    control_bytes = len(sample) - len(sample.translate(None, CONTROL_BYTES))
+    if control_bytes / len(sample) > BINARY_CONTROL_RATIO:
+        return "binary"
+    head = sample[:SAMPLE_BYTES]
+    if any(marker in head for marker in GENERATED_MARKERS):
+        return "generated"
+    if len(sample) / (sample.count(b"\n") + 1) > MINIFIED_LINE_LENGTH:
+        return "minified"
+    return "text"
+
+
+def signature_summary(data: Union[bytes, mmap.mmap], max_bytes: int) -> str:
+    """Return the declaration lines of a file, up to max_bytes."""
+    lines = []
+    total = 0
+    for match in SIGNATURE_PATTERN.finditer(data):
+        line = match.group(0).rstrip()
+        total += len(line) + 1
+        if total > max_bytes:
+            lines.append(b"...")
+            break
+        lines.append(line)
+    return decode(b"\n".join(lines))
+
+
+def head_and_tail(data: Union[bytes, mmap.mmap], max_bytes: int) -> str:
+    """Return the start and end of the data, cut at line ends, within max_bytes."""
+    size = len(data)
+    head_end = int(max_bytes * HEAD_SHARE)
+    line_end = data.rfind(b"\n", 0, head_end)
+    if line_end > 0:
+        head_end = line_end + 1
+    tail_start = size - (max_bytes - head_end)
+    line_start = data.find(b"\n", tail_start, size)
+    if line_start != -1:
+        tail_start = line_start + 1
+    tail_start = max(tail_start, head_end)
+    omitted = tail_start - head_end
+    return (decode(data[:head_end])
+            + f"\n... [{omitted:,} bytes omitted] ...\n"
+            + decode(data[tail_start:]))
+
+
+def prompt_content(data: Union[bytes, mmap.mmap], max_bytes: int) -> FileContent:
+    """Content of a file to send in a prompt, at most about max_bytes long."""
+    size = len(data)
+    kind = classify_sample(sample_content(data))
+    if kind == "binary":
+        return FileContent(f"[Binary file of {size:,} bytes, not included]", kind, size)
+    if kind == "minified" and size > MINIFIED_HEAD_BYTES:
+        head = decode(data[:MINIFIED_HEAD_BYTES])
+        return FileContent(
+            f"[Minified file of {size:,} bytes, showing the first "
+            f"{MINIFIED_HEAD_BYTES:,}]\n{head}", kind, size
+        )
+    if kind == "generated" and size > SAMPLE_BYTES:
+        signatures = signature_summary(data, min(max_bytes, GENERATED_SIGNATURE_BYTES))
+        return FileContent(
+            f"[Generated file of {size:,} bytes, showing its declarations only]\n{signatures}",
+            kind, size
+        )
+    if size > max_bytes:
+        return FileContent(head_and_tail(data, max_bytes), "truncated", size)
+    return FileContent(decode(data[:]), "text", size)
+
+
+def content_size(path: str, max_bytes: int, split_bytes: Optional[int] = None) -> int:
+    """Estimate the bytes load_content returns for a file, from samples of it.
+
+    Text files up to split_bytes are counted in full, as they are sent in parts
+    rather than truncated.
+    """
+    try:
+        with open(path, "rb") as f:
+            with map_file(f) as data:
+                size = len(data)
+                kind = classify_sample(sample_content(data))
+                if kind == "binary":
+                    return 64
+                if kind == "minified":
+                    return min(size, MINIFIED_HEAD_BYTES + 64)
+                if kind == "generated" and size > SAMPLE_BYTES:
+                    return len(signature_summary(data, min(max_bytes, GENERATED_SIGNATURE_BYTES))) + 64
+                if split_bytes is not None and size <= split_bytes:
+                    return size
+                return min(size, max_bytes)
+    except (OSError, ValueError):
+        return 0
+
+
+@contextmanager
+def map_file(f) -> Iterator[Union[bytes, mmap.mmap]]:
+    """Memory-map an open file read-only; empty files map to empty bytes."""
+    try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped
+        yield b""
+        return
+    try:
+        yield data
+    finally:
+        data.close()
+
+
+def load_content(path: str, max_bytes: int, start: int = 0,
+                 end: Optional[int] = None) -> FileContent:
+    """Load a file, or its bytes from start to end, for a prompt.
+
+    A whole file is classified and capped to max_bytes; a byte range is
+    returned as it is.
+    """
+    try:
+        with open(path, "rb") as f:
+            with map_file(f) as data:
+                if end is not None:
+                    return FileContent(decode(data[start:end]), "text", len(data))
+                return prompt_content(data, max_bytes)
+    except (OSError, ValueError) as e:
+        return FileContent(f"Error reading file: {str(e)}", "error", 0)
+
+
+def hash_file(path: str) -> str:
+    """Return the hex SHA-256 digest of a file, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
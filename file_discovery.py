@@ -0,0 +1,215 @@
+"""Streaming discovery of the files of a project."""
+import os
+import re
+import subprocess
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Size of the reads from the output of git ls-files
+GIT_READ_SIZE = 1 << 16
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob to a regex matching slash-separated paths."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+class GitIgnore:
+    """The patterns of one .gitignore file, matched against paths relative to its folder."""
+
+    def __init__(self, lines: List[str]):
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            line = line.rstrip()
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # Patterns with a slash are relative to the folder, others match at any depth
+            anchored = "/" in line
+            regex = glob_to_regex(line.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.append((re.compile(regex + "$"), negated, dir_only))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["GitIgnore"]:
+        """Read a .gitignore file, returning None if it does not exist."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """Return True if ignored, False if re-included with "!", None if not matched."""
+        result = None
+        for regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                result = not negated
+        return result
+
+
+def _is_ignored(ignores: List[Tuple[str, GitIgnore]], relative_path: str,
+                is_dir: bool) -> bool:
+    # The deepest .gitignore with a matching pattern decides
+    ignored = False
+    for folder, gitignore in ignores:
+        path = relative_path[len(folder) + 1:] if folder else relative_path
+        result = gitignore.match(path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+def iter_files_scandir(base_path: str, skip_dir: Callable[[str], bool],
+                       include_file: Callable[[str], bool]) -> Iterator[str]:
+    """Walk a folder with os.scandir and yield the relative paths of matching files.
+
+    The type information of directory entries is reused, so no extra stat is
+    needed per path. .gitignore files are honored. The files of a folder are
+    yielded before its subfolders are walked, so each folder's files come
+    together.
+    """
+    # Folders to walk, with the .gitignore files applying to them
+    stack: List[Tuple[str, List[Tuple[str, GitIgnore]]]] = [("", [])]
+    while stack:
+        folder, ignores = stack.pop()
+        full_folder = os.path.join(base_path, folder) if folder else base_path
+        gitignore = GitIgnore.load(os.path.join(full_folder, ".gitignore"))
+        if gitignore is not None:
+            ignores = ignores + [(folder, gitignore)]
+
+        try:
+            with os.scandir(full_folder) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subfolders = []
+        for entry in entries:
+            relative_path = f"{folder}/{entry.name}" if folder else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_file = not is_dir and entry.is_file()
+            except OSError:
+                continue
+            if is_dir:
+                if not skip_dir(entry.name) and not _is_ignored(ignores, relative_path, True):
+                    subfolders.append(relative_path)
+            elif is_file:
+                if include_file(entry.name) and not _is_ignored(ignores, relative_path, False):
+                    yield relative_path
+
+        # Pushed in reverse so that subfolders are walked in name order
+        for subfolder in reversed(subfolders):
+            stack.append((subfolder, ignores))
+
+
+def is_git_work_tree(path: str) -> bool:
+    """Return True if the path is inside a git working tree."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--is-inside-work-tree"],
+            cwd=path, capture_output=True, text=True
+        )
+    except OSError:
+        return False
+    return result.returncode == 0 and result.stdout.strip() == "true"
+
+
+def _git_paths(path: str, *args: str) -> Iterator[str]:
+    process = subprocess.Popen(
+        ["git", "ls-files", "-z", *args],
+        cwd=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    pending = b""
+    try:
+        while True:
+            data = process.stdout.read(GIT_READ_SIZE)
+            if not data:
+                break
+            *paths, pending = (pending + data).split(b"\0")
+            for relative_path in paths:
+                yield os.fsdecode(relative_path)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def iter_files_git(base_path: str, skip_dir: Callable[[str], bool],
+                   include_file: Callable[[str], bool]) -> Iterator[str]:
+    """Yield the matching files git knows of, tracked or untracked but not ignored."""
+    deleted = set(_git_paths(base_path, "--deleted"))
+    # Folders already checked, mapped to whether they are skipped
+    skipped_folders = {"": False}
+
+    def folder_skipped(folder: str) -> bool:
+        if folder not in skipped_folders:
+            parent, _, name = folder.rpartition("/")
+            skipped_folders[folder] = folder_skipped(parent) or skip_dir(name)
+        return skipped_folders[folder]
+
+    seen = set()
+    for relative_path in _git_paths(base_path, "--cached", "--others", "--exclude-standard"):
+        # Files with merge conflicts are listed once per stage
+        if relative_path in deleted or relative_path in seen:
+            continue
+        folder, _, name = relative_path.rpartition("/")
+        if folder_skipped(folder) or not include_file(name):
+            continue
+        seen.add(relative_path)
+        yield relative_path
+
+
+def iter_project_files(base_path: str, skip_dir: Callable[[str], bool],
+                       include_file: Callable[[str], bool],
+                       use_git: bool = True) -> Iterator[str]:
+    """Yield the relative paths of the files to analyze as they are discovered.
+
+    Uses git ls-files inside a git working tree, and walks the folder otherwise.
+    """
+    if use_git and is_git_work_tree(base_path):
+        return iter_files_git(base_path, skip_dir, include_file)
+    return iter_files_scandir(base_path, skip_dir, include_file)
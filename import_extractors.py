@@ -0,0 +1,319 @@
+"""Static extraction of imports, used to build the dependency graph without the LLM."""
+import ast
+import os
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+PYTHON_EXTENSIONS = {".py", ".pyi"}
+SCRIPT_EXTENSIONS = {".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".mts", ".cts", ".vue", ".svelte"}
+JAVA_EXTENSIONS = {".java"}
+GO_EXTENSIONS = {".go"}
+# Top-level modules of the standard library, which a project file of the same name does not
+# provide unless it sits at the root (sys.stdlib_module_names is only there from Python 3.10)
+STDLIB_MODULES = frozenset(getattr(sys, "stdlib_module_names", sys.builtin_module_names))
+
+# Projects with fewer files are scanned in-process, as a pool would only add startup time
+MIN_FILES_FOR_POOL = 200
+# Jobs sent to a worker process at a time
+POOL_CHUNK_SIZE = 64
+# Only the start of larger files is scanned, where imports are; a Python file
+# cut short falls back to the regex extraction
+MAX_SCAN_BYTES = 1024 * 1024
+# Larger Python files are scanned with the regex rather than parsed
+MAX_AST_BYTES = 256 * 1024
+
+PYTHON_IMPORT_PATTERN = re.compile(
+    r"^\s*(?:from\s+(\.*[\w.]*)\s+import\s+([\w\s,*()]+)|import\s+([\w.\s,]+))", re.M
+)
+SCRIPT_IMPORT_PATTERN = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+"""
+    r"""|\brequire\s*\(\s*|\bimport\s*\(\s*)["']([^"'\n]+)["']"""
+)
+JAVA_IMPORT_PATTERN = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;", re.M)
+GO_IMPORT_BLOCK_PATTERN = re.compile(r"^import\s*\(([^)]*)\)", re.M)
+GO_IMPORT_LINE_PATTERN = re.compile(r'^import\s+(?:[\w.]+\s+)?"([^"]+)"', re.M)
+GO_IMPORT_SPEC_PATTERN = re.compile(r'"([^"]+)"')
+GO_MODULE_PATTERN = re.compile(r"^module\s+(\S+)", re.M)
+
+
+def _regex_python_imports(content: str) -> List[str]:
+    imports = []
+    for module, names, plain in PYTHON_IMPORT_PATTERN.findall(content):
+        if plain:
+            imports.extend(name.split()[0] for name in plain.split(",") if name.strip())
+            continue
+        words = [word for word in re.split(r"[\s,()]+", names) if word]
+        # Skip the alias following each "as"
+        imported = [word for index, word in enumerate(words)
+                    if word != "as" and (index == 0 or words[index - 1] != "as")]
+        imports.extend(f"{module}|{name}" for name in imported)
+    return imports
+
+
+def extract_python_imports(content: str) -> List[str]:
+    """Return imported modules, with leading dots for relative imports.
+
+    "from a import b" is returned as "a|b", as b may be a module or a name
+    defined in a.
+    """
+    # Parsing takes about 100 times the size of the file in memory
+    if len(content) > MAX_AST_BYTES:
+        return _regex_python_imports(content)
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        # Fall back to a regex for files in other Python versions or with errors
+        return _regex_python_imports(content)
+
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            imports.extend(f"{module}|{alias.name}" for alias in node.names)
+    return imports
+
+
+def extract_script_imports(content: str) -> List[str]:
+    """Return the module specifiers imported by a TypeScript or JavaScript file."""
+    return SCRIPT_IMPORT_PATTERN.findall(content)
+
+
+def extract_java_imports(content: str) -> List[str]:
+    """Return the classes and packages (ending in .*) imported by a Java file."""
+    return JAVA_IMPORT_PATTERN.findall(content)
+
+
+def extract_go_imports(content: str) -> List[str]:
+    """Return the package paths imported by a Go file."""
+    imports = GO_IMPORT_LINE_PATTERN.findall(content)
+    for block in GO_IMPORT_BLOCK_PATTERN.findall(content):
+        imports.extend(GO_IMPORT_SPEC_PATTERN.findall(block))
+    return imports
+
+
+def extract_imports(path: str, content: str) -> List[str]:
+    """Return the raw import specifiers of a file based on its language."""
+    extension = PurePosixPath(path).suffix.lower()
+    if extension in PYTHON_EXTENSIONS:
+        return extract_python_imports(content)
+    if extension in SCRIPT_EXTENSIONS:
+        return extract_script_imports(content)
+    if extension in JAVA_EXTENSIONS:
+        return extract_java_imports(content)
+    if extension in GO_EXTENSIONS:
+        return extract_go_imports(content)
+    return []
+
+
+def _extract_file_imports(job: Tuple[str, str]) -> List[str]:
+    """Read a file and extract its imports; runs in a worker process."""
+    base_path, path = job
+    try:
+        with open(os.path.join(base_path, path), "r", encoding="utf-8", errors="replace") as f:
+            return extract_imports(path, f.read(MAX_SCAN_BYTES))
+    except OSError:
+        return []
+
+
+class ImportResolver:
+    """Resolves import specifiers to files of the project."""
+
+    def __init__(self, files: List[str], go_modules: Optional[Dict[str, str]] = None):
+        self.files = set(files)
+        # Dotted Python module names, including every suffix, mapped to files
+        self.python_modules = defaultdict(list)
+        # Java class paths (a/b/C) mapped to files, and package paths to their files
+        self.java_classes = defaultdict(list)
+        self.java_packages = defaultdict(list)
+        # Folders mapped to their Go files
+        self.go_packages = defaultdict(list)
+        # Go module paths mapped to the folder of their go.mod, "" for the root
+        self.go_modules = go_modules or {}
+
+        for path in sorted(self.files):
+            pure = PurePosixPath(path)
+            extension = pure.suffix.lower()
+            if extension in PYTHON_EXTENSIONS:
+                parts = list(pure.with_suffix("").parts)
+                if parts[-1] == "__init__":
+                    parts = parts[:-1]
+                for start in range(len(parts)):
+                    self.python_modules[".".join(parts[start:])].append(path)
+            elif extension in JAVA_EXTENSIONS:
+                parts = pure.with_suffix("").parts
+                for start in range(len(parts)):
+                    self.java_classes["/".join(parts[start:])].append(path)
+                    self.java_packages["/".join(parts[start:-1])].append(path)
+            elif extension in GO_EXTENSIONS and not pure.name.endswith("_test.go"):
+                self.go_packages[str(pure.parent)].append(path)
+
+    def resolve(self, importer: str, specifier: str) -> List[str]:
+        """Return the project files an import of a file refers to."""
+        extension = PurePosixPath(importer).suffix.lower()
+        if extension in PYTHON_EXTENSIONS:
+            return self.resolve_python(importer, specifier)
+        if extension in SCRIPT_EXTENSIONS:
+            return self.resolve_script(importer, specifier)
+        if extension in JAVA_EXTENSIONS:
+            return self.resolve_java(specifier)
+        if extension in GO_EXTENSIONS:
+            return self.resolve_go(specifier)
+        return []
+
+    def _best_match(self, candidates: List[str], importer: str) -> List[str]:
+        # Prefer the candidate sharing the longest folder prefix with the importer
+        if len(candidates) <= 1:
+            return candidates
+        importer_parts = PurePosixPath(importer).parts
+
+        def shared_prefix(path):
+            count = 0
+            for a, b in zip(PurePosixPath(path).parts, importer_parts):
+                if a != b:
+                    break
+                count += 1
+            return count
+
+        return [max(candidates, key=lambda path: (shared_prefix(path), -len(path)))]
+
+    def resolve_python(self, importer: str, specifier: str) -> List[str]:
+        module, _, name = specifier.partition("|")
+        if name and name != "*":
+            separator = "" if module.endswith(".") or not module else "."
+            # "from a import b" refers to module a.b if it exists, else to a
+            resolved = self.resolve_python_module(importer, module + separator + name)
+            if resolved:
+                return resolved
+        return self.resolve_python_module(importer, module)
+
+    def resolve_python_module(self, importer: str, module: str) -> List[str]:
+        level = len(module) - len(module.lstrip("."))
+        if not level:
+            if module.partition(".")[0] in STDLIB_MODULES:
+                # e.g. "import json" is not a project file json.py in some package
+                path = module.replace(".", "/")
+                return [
+                    candidate for candidate in (path + ".py", path + ".pyi", path + "/__init__.py")
+                    if candidate in self.files
+                ][:1]
+            return self._best_match(self.python_modules.get(module, []), importer)
+
+        # Relative imports are resolved from the package of the importing file
+        package = list(PurePosixPath(importer).parent.parts)
+        if level - 1 > len(package):
+            return []
+        package = package[:len(package) - (level - 1)]
+        parts = package + [part for part in module[level:].split(".") if part]
+        if not parts:
+            return []
+        candidate = "/".join(parts)
+        for path in (candidate + ".py", candidate + ".pyi", candidate + "/__init__.py"):
+            if path in self.files:
+                return [path]
+        return []
+
+    def resolve_script(self, importer: str, specifier: str) -> List[str]:
+        specifier = specifier.split("?")[0]
+        if specifier.startswith("."):
+            base = PurePosixPath(importer).parent / specifier
+        elif specifier.startswith("@/") or specifier.startswith("~/"):
+            base = PurePosixPath("src") / specifier[2:]
+        elif specifier.startswith("/"):
+            base = PurePosixPath(specifier.lstrip("/"))
+        else:
+            # Package imports only resolve when they name a path in the project
+            base = PurePosixPath(specifier)
+        normalized = os.path.normpath(base.as_posix()).replace(os.sep, "/")
+        if normalized.startswith(".."):
+            return []
+        for candidate in [normalized] + [
+            normalized + extension for extension in sorted(SCRIPT_EXTENSIONS)
+        ] + [
+            f"{normalized}/index{extension}" for extension in sorted(SCRIPT_EXTENSIONS)
+        ]:
+            if candidate in self.files:
+                return [candidate]
+        return []
+
+    def resolve_java(self, specifier: str) -> List[str]:
+        if specifier.endswith(".*"):
+            return list(self.java_packages.get(specifier[:-2].replace(".", "/"), []))
+        parts = specifier.split(".")
+        # Static imports name a member of a class, so also try without the last part
+        for end in (len(parts), len(parts) - 1):
+            candidates = self.java_classes.get("/".join(parts[:end]), [])
+            if candidates:
+                return candidates[:1]
+        return []
+
+    def resolve_go(self, specifier: str) -> List[str]:
+        for module, folder in self.go_modules.items():
+            if specifier == module or specifier.startswith(module + "/"):
+                relative = specifier[len(module):].lstrip("/")
+                package = str(PurePosixPath(folder or ".") / relative)
+                return list(self.go_packages.get(package, []))
+        return []
+
+
+def find_go_modules(base_path: str, files: List[str]) -> Dict[str, str]:
+    """Map the module paths of go.mod files in the project to their folders."""
+    folders = sorted(set(str(PurePosixPath(path).parent) for path in files
+                         if PurePosixPath(path).suffix == ".go"))
+    modules = {}
+    for folder in folders:
+        # Walk up from each Go package folder to its go.mod
+        current = PurePosixPath(folder)
+        while True:
+            go_mod = os.path.join(base_path, str(current), "go.mod")
+            if os.path.isfile(go_mod):
+                try:
+                    with open(go_mod, "r", encoding="utf-8", errors="replace") as f:
+                        match = GO_MODULE_PATTERN.search(f.read())
+                except OSError:
+                    match = None
+                if match:
+                    modules[match.group(1)] = "" if str(current) == "." else str(current)
+                break
+            if str(current) == ".":
+                break
+            current = current.parent
+    return modules
+
+
+def map_file_jobs(function: Callable[[Any], Any], jobs: Sequence,
+                  workers: Optional[int] = None) -> List:
+    """Run a function on the jobs of every file, in a process pool for large projects.
+
+    The function must be defined at module level, so that it can be pickled.
+    """
+    if len(jobs) < MIN_FILES_FOR_POOL:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, jobs, chunksize=POOL_CHUNK_SIZE))
+
+
+def extract_project_imports(base_path: str, files: List[str],
+                            workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """Extract the raw imports of every file, using a process pool for large projects."""
+    jobs = [(base_path, path) for path in files]
+    return dict(zip(files, map_file_jobs(_extract_file_imports, jobs, workers)))
+
+
+def build_import_edges(base_path: str, files: List[str],
+                       workers: Optional[int] = None) -> List[Tuple[str, str]]:
+    """Return the (importer, imported) file pairs of a project, sorted."""
+    imports = extract_project_imports(base_path, files, workers)
+    resolver = ImportResolver(files, find_go_modules(base_path, files))
+    edges = set()
+    for importer, specifiers in imports.items():
+        for specifier in specifiers:
+            for target in resolver.resolve(importer, specifier):
+                if target != importer:
+                    edges.add((importer, target))
+    return sorted(edges)
@@ -0,0 +1,182 @@
+"""Incremental parsing of a JSON object streamed in chunks, such as a streamed LLM response."""
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+STRING_SPECIAL_PATTERN = re.compile(r'["\\]')
+
+
+class StreamingJSONObject:
+    """Parses the members of a JSON object as its text arrives.
+
+    Each member of the object is parsed once its text is complete, and so
+    is each entry of one object member, the streamed member, so that they
+    can be used before the rest of the object arrives and are kept when the
+    text is cut off. Text around the object, such as the fences of a
+    markdown code block, is ignored. Parsing keeps the position reached and
+    drops the text before the member or entry being read, so feeding a
+    response costs time linear in its length, as long as the members other
+    than the streamed one are small.
+    """
+
+    def __init__(self, streamed_member: str,
+                 on_entry: Optional[Callable[[str, Any], None]] = None):
+        self.streamed_member = streamed_member
+        # Called with the key and value of each entry of the streamed member
+        self.on_entry = on_entry
+        self.members: Dict[str, Any] = {}
+        self.entries: Dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._position = 0
+        # Open containers, "{" or "[", with whether an object expects a key next
+        # and the key of its current member
+        self._stack: List[str] = []
+        self._key_expected: List[bool] = []
+        self._keys: List[Optional[str]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        # Start of the member and of the streamed entry being read, if any
+        self._member_start: Optional[int] = None
+        self._entry_start: Optional[int] = None
+
+    def feed(self, text: str):
+        self._text += text
+        text = self._text
+        stack = self._stack
+        position = self._position
+        while position < len(text) and not self.done:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    position += 1
+                    continue
+                # Skip to the next quote or backslash, as strings are most of the text
+                match = STRING_SPECIAL_PATTERN.search(text, position)
+                if match is None:
+                    position = len(text)
+                    break
+                position = match.start()
+                if text[position] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    self._string_closed(position)
+                position += 1
+                continue
+
+            char = text[position]
+            if not stack:
+                if char == "{":
+                    self._open(char)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = position
+                if stack[-1] == "{" and self._key_expected[-1]:
+                    if len(stack) == 1:
+                        self._member_start = position
+                    elif self._in_streamed_member():
+                        self._entry_start = position
+            elif char in "{[":
+                self._open(char)
+            elif char in "}]":
+                in_streamed_member = self._in_streamed_member()
+                stack.pop()
+                self._key_expected.pop()
+                self._keys.pop()
+                if not stack:
+                    # The end of the object ends its last member
+                    self._complete_member(position)
+                    self.done = True
+                elif len(stack) == 1:
+                    if in_streamed_member:
+                        self._complete_entry(position)
+                    self._complete_member(position + 1)
+                elif self._in_streamed_member():
+                    self._complete_entry(position + 1)
+            elif char == ":":
+                if stack[-1] == "{":
+                    self._key_expected[-1] = False
+            elif char == ",":
+                if stack[-1] == "{":
+                    self._key_expected[-1] = True
+                if len(stack) == 1:
+                    self._complete_member(position)
+                elif self._in_streamed_member():
+                    self._complete_entry(position)
+            position += 1
+        self._position = position
+        self._drop_consumed_text()
+
+    def partial(self) -> Dict[str, Any]:
+        """The members read so far, with the entries read so far of the streamed member."""
+        members = dict(self.members)
+        members[self.streamed_member] = dict(self.entries)
+        return members
+
+    def _drop_consumed_text(self):
+        """Drop the text that no member, entry or key being read starts in."""
+        starts = [self._position, self._member_start, self._entry_start]
+        if self._in_string:
+            starts.append(self._string_start)
+        keep = min(start for start in starts if start is not None)
+        if keep == 0:
+            return
+        self._text = self._text[keep:]
+        self._position -= keep
+        self._string_start -= keep
+        if self._member_start is not None:
+            self._member_start -= keep
+        if self._entry_start is not None:
+            self._entry_start -= keep
+
+    def _open(self, char: str):
+        self._stack.append(char)
+        self._key_expected.append(char == "{")
+        self._keys.append(None)
+
+    def _in_streamed_member(self) -> bool:
+        return (len(self._stack) == 2 and self._stack[1] == "{"
+                and self._keys[0] == self.streamed_member)
+
+    def _string_closed(self, position: int):
+        if self._stack[-1] == "{" and self._key_expected[-1]:
+            self._keys[-1] = self._parse(self._text[self._string_start:position + 1])
+            if len(self._stack) == 1 and self._keys[0] == self.streamed_member:
+                # Its entries are parsed one by one, so its text need not be kept
+                self._member_start = None
+        elif len(self._stack) == 1:
+            self._complete_member(position + 1)
+        elif self._in_streamed_member():
+            self._complete_entry(position + 1)
+
+    def _complete_member(self, end: int):
+        if self._member_start is None:
+            return
+        start, self._member_start = self._member_start, None
+        if self._keys and self._keys[0] == self.streamed_member:
+            # Its entries were parsed one by one
+            return
+        member = self._parse("{" + self._text[start:end] + "}")
+        if isinstance(member, dict):
+            self.members.update(member)
+
+    def _complete_entry(self, end: int):
+        if self._entry_start is None:
+            return
+        start, self._entry_start = self._entry_start, None
+        entry = self._parse("{" + self._text[start:end] + "}")
+        if not isinstance(entry, dict):
+            return
+        for key, value in entry.items():
+            self.entries[key] = value
+            if self.on_entry is not None:
+                self.on_entry(key, value)
+
+    @staticmethod
+    def _parse(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
@@ -0,0 +1,488 @@
+"""Chat completion backends used by the analyzer.
+
+AzureBackend calls an Azure OpenAI deployment. FakeBackend answers locally
+with a deterministic analysis of the files in the prompt, with configurable
+latency, response size and failures, and ReplayBackend answers with responses
+recorded by RecordingBackend. The last two allow running and benchmarking the
+analyzer without a deployment or credentials.
+"""
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+AZURE_COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+BACKEND_NAMES = ("azure", "fake", "replay")
+
+PATH_PATTERN = re.compile(r'<file path="([^"]*)"[^>\n]*>\n')
+FOLDER_PATTERN = re.compile(r"^## Folder: (.*)$", re.M)
+# Tokens are estimated from characters when a backend does not count them
+CHARS_PER_TOKEN = 4
+# Characters of the chunks of a completion streamed by the fake backend
+STREAM_CHUNK_CHARS = 64
+# Ask streamed responses to end with the token usage
+STREAM_OPTIONS = {"include_usage": True}
+
+
+class Completion(NamedTuple):
+    """Answer to a chat completion request."""
+    content: str
+    # 0 when the backend did not report the usage
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class ReplayMissError(Exception):
+    """A request without a recorded response was sent to a ReplayBackend."""
+
+
+class LLMBackend:
+    """Sends chat completion requests, synchronously or from an event loop.
+
+    Errors are raised as openai exceptions, so that they are retried the same
+    way whatever the backend.
+    """
+
+    def complete(self, messages: List[Dict], max_completion_tokens: int) -> Completion:
+        raise NotImplementedError
+
+    async def complete_async(self, messages: List[Dict],
+                             max_completion_tokens: int) -> Completion:
+        return await asyncio.to_thread(self.complete, messages, max_completion_tokens)
+
+    def complete_streaming(self, messages: List[Dict], max_completion_tokens: int,
+                           on_text: Callable[[str], None], json_mode: bool = False) -> Completion:
+        """Send a request, passing the text of the completion to on_text as it is generated.
+
+        json_mode asks for a JSON object where the backend supports it.
+        Backends that do not stream pass the whole text at once.
+        """
+        completion = self.complete(messages, max_completion_tokens)
+        on_text(completion.content)
+        return completion
+
+    async def complete_streaming_async(self, messages: List[Dict], max_completion_tokens: int,
+                                       on_text: Callable[[str], None],
+                                       json_mode: bool = False) -> Completion:
+        completion = await self.complete_async(messages, max_completion_tokens)
+        on_text(completion.content)
+        return completion
+
+    async def aclose(self):
+        """Release the resources bound to the current event loop."""
+
+    def close(self):
+        """Release all resources of the backend."""
+
+
+@functools.lru_cache(maxsize=None)
+def azure_token_provider() -> Callable[[], str]:
+    """Entra ID token provider shared by all clients, so credentials are probed once."""
+    from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+    return get_bearer_token_provider(DefaultAzureCredential(), AZURE_COGNITIVE_SERVICES_SCOPE)
+
+
+def client_kwargs() -> Dict:
+    """Connection settings shared by the sync and async Azure OpenAI clients."""
+    kwargs = {
+        "azure_endpoint": os.getenv("AZURE_OPENAI_API_BASE_URL"),
+        "azure_deployment": os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        "api_version": os.getenv("AZURE_OPENAI_API_VERSION"),
+        # Retries are done by the analyzer, with backoff honoring Retry-After
+        "max_retries": 0,
+    }
+    # An API key takes precedence over Entra ID auth, e.g. for a local fake server
+    if os.getenv("AZURE_OPENAI_API_KEY"):
+        kwargs["api_key"] = os.getenv("AZURE_OPENAI_API_KEY")
+    else:
+        kwargs["azure_ad_token_provider"] = azure_token_provider()
+    return kwargs
+
+
+class StreamCollector:
+    """Builds the completion of a streamed openai response from its chunks."""
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self.parts = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, chunk):
+        # Azure sends content filter results in chunks without choices
+        if chunk.choices:
+            text = chunk.choices[0].delta.content
+            if text:
+                self.parts.append(text)
+                self.on_text(text)
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens or 0
+            self.completion_tokens = usage.completion_tokens or 0
+
+    def completion(self) -> Completion:
+        return Completion("".join(self.parts), self.prompt_tokens, self.completion_tokens)
+
+
+def to_completion(response) -> Completion:
+    """Convert an openai chat completion response."""
+    usage = getattr(response, "usage", None)
+    return Completion(
+        response.choices[0].message.content or "",
+        (usage.prompt_tokens or 0) if usage is not None else 0,
+        (usage.completion_tokens or 0) if usage is not None else 0,
+    )
+
+
+class AzureBackend(LLMBackend):
+    """Azure OpenAI deployment configured from the environment.
+
+    The openai package is imported and the clients are created on first
+    use, so credentials are only needed once a request is sent. Each client
+    keeps a pool of connections reused by all its requests. The async client
+    belongs to one event loop and is closed with aclose before that loop ends.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._client = None
+        self._async_client = None
+
+    def client(self):
+        if self._client is None:
+            from openai import AzureOpenAI
+            self._client = AzureOpenAI(**client_kwargs())
+        return self._client
+
+    def async_client(self):
+        if self._async_client is None:
+            from openai import AsyncAzureOpenAI
+            self._async_client = AsyncAzureOpenAI(**client_kwargs())
+        return self._async_client
+
+    def request_kwargs(self, messages: List[Dict], max_completion_tokens: int,
+                       json_mode: bool = False) -> Dict:
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "max_completion_tokens": max_completion_tokens,
+        }
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    def complete(self, messages: List[Dict], max_completion_tokens: int) -> Completion:
+        return to_completion(self.client().chat.completions.create(
+            **self.request_kwargs(messages, max_completion_tokens)
+        ))
+
+    async def complete_async(self, messages: List[Dict],
+                             max_completion_tokens: int) -> Completion:
+        return to_completion(await self.async_client().chat.completions.create(
+            **self.request_kwargs(messages, max_completion_tokens)
+        ))
+
+    def complete_streaming(self, messages: List[Dict], max_completion_tokens: int,
+                           on_text: Callable[[str], None], json_mode: bool = False) -> Completion:
+        collector = StreamCollector(on_text)
+        stream = self.client().chat.completions.create(
+            stream=True, stream_options=STREAM_OPTIONS,
+            **self.request_kwargs(messages, max_completion_tokens, json_mode)
+        )
+        with stream:
+            for chunk in stream:
+                collector.add(chunk)
+        return collector.completion()
+
+    async def complete_streaming_async(self, messages: List[Dict], max_completion_tokens: int,
+                                       on_text: Callable[[str], None],
+                                       json_mode: bool = False) -> Completion:
+        collector = StreamCollector(on_text)
+        stream = await self.async_client().chat.completions.create(
+            stream=True, stream_options=STREAM_OPTIONS,
+            **self.request_kwargs(messages, max_completion_tokens, json_mode)
+        )
+        async with stream:
+            async for chunk in stream:
+                collector.add(chunk)
+        return collector.completion()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+def fake_analysis(prompt: str, description_words: int = 0) -> Dict:
+    """Build a deterministic batch analysis for the files named in a prompt.
+
+    Descriptions are padded with description_words filler words, to mimic
+    the size of real responses.
+    """
+    paths = sorted(set(
+        path.replace("&quot;", '"') for path in PATH_PATTERN.findall(prompt)
+    ))
+    folders = sorted(set(str(PurePosixPath(path).parent) for path in paths))
+    padding = " lorem" * description_words
+    return {
+        "file_descriptions": {path: f"Description of {path}{padding}" for path in paths},
+        "module_descriptions": {
+            folder: f"Module in {folder}" for folder in folders
+        },
+        "features": [f"Feature of {folder}" for folder in folders],
+        "data_models": {},
+    }
+
+
+def fake_content(prompt: str, description_words: int = 0, invalid: bool = False) -> str:
+    """Answer a batch analysis, folder summary or project description prompt."""
+    folder = FOLDER_PATTERN.search(prompt)
+    if folder:
+        return f"Summary of the folder {folder.group(1)}."
+    if "Project Analysis Request" in prompt:
+        content = json.dumps(fake_analysis(prompt, description_words))
+        if invalid:
+            # A response cut off before the end of the JSON
+            content = content[:len(content) // 2]
+        return content
+    return "# Project Overview\n\nA fake project description."
+
+
+def prompt_text(messages: List[Dict]) -> str:
+    return "\n".join(message.get("content", "") for message in messages)
+
+
+def rate_limit_error(retry_after: float) -> Exception:
+    """A 429 error as raised by the openai client, asking to retry after some seconds."""
+    import httpx
+    import openai
+    response = httpx.Response(
+        429, headers={"retry-after": str(retry_after)},
+        request=httpx.Request("POST", "http://fake/chat/completions")
+    )
+    return openai.RateLimitError(
+        "Rate limit of the fake backend exceeded.", response=response, body=None
+    )
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic local stand-in for a deployment.
+
+    Each request takes latency seconds plus the time to generate its
+    completion at tokens_per_second, over which streamed completions are
+    passed in chunks. Completions are cut off at max_completion_tokens. A
+    share of the requests fail with a 429, or return truncated JSON for
+    batch analyses; those are drawn from a seeded generator, so a run can
+    be repeated. With max_in_flight, requests beyond that many at a time
+    also fail with a 429, like a deployment at its capacity.
+    """
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: Optional[float] = None,
+                 description_words: int = 0, error_rate: float = 0.0,
+                 invalid_rate: float = 0.0, retry_after: float = 0.0, seed: int = 0,
+                 max_in_flight: Optional[int] = None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.description_words = description_words
+        self.error_rate = error_rate
+        self.invalid_rate = invalid_rate
+        self.retry_after = retry_after
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def request_slot(self):
+        """Count a request in flight for its whole duration, or fail it over capacity."""
+        with self.lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                raise rate_limit_error(self.retry_after)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def answer(self, messages: List[Dict],
+               max_completion_tokens: int) -> Tuple[Completion, float]:
+        """Return the completion of a request and the seconds it takes, or raise its error."""
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+            invalid = self.random.random() < self.invalid_rate
+        if failed:
+            raise rate_limit_error(self.retry_after)
+        prompt = prompt_text(messages)
+        content = fake_content(prompt, self.description_words, invalid)
+        content = content[:max_completion_tokens * CHARS_PER_TOKEN]
+        completion = Completion(content, len(prompt) // CHARS_PER_TOKEN + 1,
+                                len(content) // CHARS_PER_TOKEN + 1)
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += completion.completion_tokens / self.tokens_per_second
+        return completion, delay
+
+    def complete(self, messages: List[Dict], max_completion_tokens: int) -> Completion:
+        with self.request_slot():
+            completion, delay = self.answer(messages, max_completion_tokens)
+            time.sleep(delay)
+        return completion
+
+    async def complete_async(self, messages: List[Dict],
+                             max_completion_tokens: int) -> Completion:
+        with self.request_slot():
+            completion, delay = self.answer(messages, max_completion_tokens)
+            await asyncio.sleep(delay)
+        return completion
+
+    def stream_chunks(self, content: str) -> Iterator[Tuple[str, float]]:
+        """Split a completion into chunks, with the seconds taken to generate each."""
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            text = content[start:start + STREAM_CHUNK_CHARS]
+            delay = 0.0
+            if self.tokens_per_second:
+                delay = len(text) / CHARS_PER_TOKEN / self.tokens_per_second
+            yield text, delay
+
+    def complete_streaming(self, messages: List[Dict], max_completion_tokens: int,
+                           on_text: Callable[[str], None], json_mode: bool = False) -> Completion:
+        with self.request_slot():
+            completion, _ = self.answer(messages, max_completion_tokens)
+            time.sleep(self.latency)
+            for text, delay in self.stream_chunks(completion.content):
+                if delay:
+                    time.sleep(delay)
+                on_text(text)
+        return completion
+
+    async def complete_streaming_async(self, messages: List[Dict], max_completion_tokens: int,
+                                       on_text: Callable[[str], None],
+                                       json_mode: bool = False) -> Completion:
+        with self.request_slot():
+            completion, _ = self.answer(messages, max_completion_tokens)
+            await asyncio.sleep(self.latency)
+            for text, delay in self.stream_chunks(completion.content):
+                # Also lets other requests run between chunks
+                await asyncio.sleep(delay)
+                on_text(text)
+        return completion
+
+
+def request_key(messages: List[Dict]) -> str:
+    """Key of a request in a recording, from the content of its messages."""
+    return hashlib.sha256(
+        json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class RecordingBackend(LLMBackend):
+    """Passes requests to another backend and appends its responses to a JSON-lines file."""
+
+    def __init__(self, backend: LLMBackend, path: str):
+        self.backend = backend
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def record(self, messages: List[Dict], completion: Completion) -> Completion:
+        line = json.dumps({"key": request_key(messages), **completion._asdict()})
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+        return completion
+
+    def complete(self, messages: List[Dict], max_completion_tokens: int) -> Completion:
+        return self.record(messages, self.backend.complete(messages, max_completion_tokens))
+
+    async def complete_async(self, messages: List[Dict],
+                             max_completion_tokens: int) -> Completion:
+        completion = await self.backend.complete_async(messages, max_completion_tokens)
+        return self.record(messages, completion)
+
+    def complete_streaming(self, messages: List[Dict], max_completion_tokens: int,
+                           on_text: Callable[[str], None], json_mode: bool = False) -> Completion:
+        return self.record(messages, self.backend.complete_streaming(
+            messages, max_completion_tokens, on_text, json_mode
+        ))
+
+    async def complete_streaming_async(self, messages: List[Dict], max_completion_tokens: int,
+                                       on_text: Callable[[str], None],
+                                       json_mode: bool = False) -> Completion:
+        completion = await self.backend.complete_streaming_async(
+            messages, max_completion_tokens, on_text, json_mode
+        )
+        return self.record(messages, completion)
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+    def close(self):
+        self.backend.close()
+        self.file.close()
+
+
+class ReplayBackend(LLMBackend):
+    """Answers requests with the responses recorded for identical requests.
+
+    A request that was not recorded raises ReplayMissError, which is not
+    retried, as the prompts of a replayed run must match the recorded one.
+    """
+
+    def __init__(self, path: str):
+        """Load the recorded responses; raises OSError or ValueError if they cannot be read."""
+        self.responses = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line torn by an interrupted recording
+                    continue
+                try:
+                    self.responses[record["key"]] = Completion(
+                        record["content"], record["prompt_tokens"], record["completion_tokens"]
+                    )
+                except (KeyError, TypeError):
+                    raise ValueError(
+                        f"{path}:{line_number}: not a recorded response"
+                    ) from None
+
+    def complete(self, messages: List[Dict], max_completion_tokens: int) -> Completion:
+        completion = self.responses.get(request_key(messages))
+        if completion is None:
+            raise ReplayMissError(
+                "No recorded response for the request; the prompts differ from the recorded run."
+            )
+        return completion
+
+    async def complete_async(self, messages: List[Dict],
+                             max_completion_tokens: int) -> Completion:
+        return self.complete(messages, max_completion_tokens)
+
+
+def create_backend(name: str, model: str, responses_path: Optional[str] = None) -> LLMBackend:
+    """Create a backend by name; azure and fake backends record to responses_path if given."""
+    if name == "replay":
+        if not responses_path:
+            raise ValueError("The replay backend needs a file of recorded responses.")
+        return ReplayBackend(responses_path)
+    backend = FakeBackend() if name == "fake" else AzureBackend(model)
+    if responses_path:
+        backend = RecordingBackend(backend, responses_path)
+    return backend
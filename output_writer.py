@@ -0,0 +1,103 @@
+"""Writer of the analysis results to disk while a run is going on."""
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SECTIONS_DIR_NAME = "sections"
+FILES_SECTION = "files"
+
+
+def file_section(file_path: str, description: str) -> str:
+    return f"### {file_path}\n\n{description}\n\n"
+
+
+class ResultsWriter:
+    """Streams the results of a run to the output folder as they are merged.
+
+    Each merged batch appends the sections of its files to the files section
+    and a record per file to a JSON-lines stream, so completed work is on
+    disk even if the run dies, and other tools can follow the stream while
+    the run goes on. Records of a file written again, e.g. for the later
+    parts of a split file, supersede the earlier ones, and a description
+    already written for a file is not written again, so descriptions
+    written as a response streams in are not repeated when the batch is
+    merged. When the run completes, the sections of the document are written one by one and
+    concatenated into the markdown file, which is replaced atomically.
+    """
+
+    def __init__(self, output_dir: str, markdown_path: str, stream_path: str):
+        self.sections_dir = os.path.join(output_dir, SECTIONS_DIR_NAME)
+        self.markdown_path = markdown_path
+        self.stream_path = stream_path
+        self._stream = None
+        self._files_section = None
+        # Last description written of each file
+        self._written: Dict[str, str] = {}
+
+    def section_path(self, name: str) -> str:
+        return os.path.join(self.sections_dir, name + ".md")
+
+    def start(self, file_descriptions: Dict[str, str], module_descriptions: Dict[str, str]):
+        """Start the stream of a run with the results it already has, e.g. when resumed."""
+        self.close()
+        shutil.rmtree(self.sections_dir, ignore_errors=True)
+        os.makedirs(self.sections_dir, exist_ok=True)
+        self._written = {}
+        self._stream = open(self.stream_path, "w", encoding="utf-8")
+        self._files_section = open(self.section_path(FILES_SECTION), "w", encoding="utf-8")
+        self.add_files(sorted(file_descriptions.items()))
+        self.add_modules(sorted(module_descriptions.items()))
+
+    def add_record(self, record: Dict):
+        if self._stream is not None:
+            self._stream.write(json.dumps(record) + "\n")
+            self._stream.flush()
+
+    def add_files(self, descriptions: Iterable[Tuple[str, str]]):
+        """Append the descriptions of files to the stream and to the files section."""
+        if self._stream is None:
+            return
+        for file_path, description in descriptions:
+            if self._written.get(file_path) == description:
+                continue
+            self._written[file_path] = description
+            self._stream.write(json.dumps(
+                {"type": "file", "path": file_path, "description": description}
+            ) + "\n")
+            self._files_section.write(file_section(file_path, description))
+        self._stream.flush()
+        self._files_section.flush()
+
+    def add_modules(self, descriptions: Iterable[Tuple[str, str]]):
+        for folder, description in descriptions:
+            self.add_record({"type": "module", "folder": folder, "description": description})
+
+    def write_section(self, name: str, chunks: Iterable[str]):
+        """Write a section of the document, replacing what was written to it during the run."""
+        if name == FILES_SECTION and self._files_section is not None:
+            self._files_section.close()
+            self._files_section = None
+        os.makedirs(self.sections_dir, exist_ok=True)
+        with open(self.section_path(name), "w", encoding="utf-8") as f:
+            f.writelines(chunks)
+
+    def assemble(self, names: List[str]):
+        """Concatenate the sections into the markdown document, then remove them."""
+        temp_path = self.markdown_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as document:
+            for name in names:
+                with open(self.section_path(name), "r", encoding="utf-8") as section:
+                    shutil.copyfileobj(section, document)
+        os.replace(temp_path, self.markdown_path)
+        shutil.rmtree(self.sections_dir, ignore_errors=True)
+
+    def close(self, final_record: Optional[Dict] = None):
+        """Close the stream, after appending a record telling how the run ended."""
+        if final_record is not None:
+            self.add_record(final_record)
+        for f in (self._stream, self._files_section):
+            if f is not None:
+                f.close()
+        self._stream = None
+        self._files_section = None
@@ -0,0 +1,164 @@
+"""Progress reporting for unattended runs: log lines and a JSON-lines event stream."""
+import json
+import sys
+import time
+from typing import Dict, Optional
+
+# Counters summed over all batches of a run
+TOTAL_KEYS = ("requests", "prompt_tokens", "completion_tokens", "retries", "cache_hits")
+
+
+def new_batch_stats() -> Dict:
+    """Metrics collected while analyzing one batch."""
+    return {
+        "cache_hit": False,
+        "latency": 0.0,
+        # Seconds until the first file description of the response arrived
+        "first_result_latency": None,
+        "requests": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "retries": 0,
+    }
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as e.g. 1h02m, 3m05s or 12s."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressReporter:
+    """Prints progress unless quiet, and writes events to a JSON-lines file.
+
+    With events written to stdout ("-"), log lines go to stderr so that the
+    event stream stays machine-readable. A label, such as the repository of
+    a workspace run, prefixes log lines and is added to events.
+    """
+
+    def __init__(self, quiet: bool = False, events_path: Optional[str] = None,
+                 label: Optional[str] = None):
+        self.quiet = quiet
+        self.label = label
+        self.log_stream = sys.stdout
+        self.events = None
+        if events_path == "-":
+            self.events = sys.stdout
+            self.log_stream = sys.stderr
+        elif events_path:
+            self.events = open(events_path, "a", encoding="utf-8")
+        self.start_time = time.monotonic()
+        self.batches_start_time = self.start_time
+        self.total_batches = 0
+        self.completed_batches = 0
+        self.total_files = 0
+        self.processed_files = 0
+        self.totals = dict.fromkeys(TOTAL_KEYS, 0)
+
+    def labeled(self, message: str) -> str:
+        if not self.label:
+            return message
+        return "\n".join(f"[{self.label}] {line}" if line else line
+                         for line in message.split("\n"))
+
+    def log(self, message: str = ""):
+        """Print a progress message unless quiet."""
+        if not self.quiet:
+            print(self.labeled(message), file=self.log_stream, flush=True)
+
+    def error(self, message: str):
+        """Print an error, even when quiet."""
+        print(self.labeled(message), file=sys.stderr, flush=True)
+
+    def event(self, name: str, **fields):
+        """Write an event to the event stream."""
+        if self.events is None:
+            return
+        record = {"event": name, "time": round(time.time(), 3)}
+        if self.label:
+            record["repository"] = self.label
+        record.update(fields)
+        self.events.write(json.dumps(record) + "\n")
+        self.events.flush()
+
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until all batches are analyzed, from the average so far."""
+        if not self.completed_batches:
+            return None
+        elapsed = time.monotonic() - self.batches_start_time
+        remaining = self.total_batches - self.completed_batches
+        return elapsed / self.completed_batches * remaining
+
+    def run_started(self, total_files: int, pending_files: int, total_batches: int):
+        self.total_files = total_files
+        self.processed_files = total_files - pending_files
+        self.total_batches = total_batches
+        self.completed_batches = 0
+        self.batches_start_time = time.monotonic()
+        self.event("run_started", files=total_files, pending_files=pending_files,
+                   batches=total_batches)
+
+    def add_request(self, stats: Dict):
+        """Count the requests, tokens and retries of a batch or other LLM call."""
+        self.totals["requests"] += stats["requests"]
+        self.totals["prompt_tokens"] += stats["prompt_tokens"]
+        self.totals["completion_tokens"] += stats["completion_tokens"]
+        self.totals["retries"] += stats["retries"]
+        self.totals["cache_hits"] += int(stats["cache_hit"])
+
+    def add_totals(self, totals: Dict):
+        """Add the totals of another reporter, e.g. of a repository to those of a workspace."""
+        for key in TOTAL_KEYS:
+            self.totals[key] += totals[key]
+
+    def batch_completed(self, batch_index: int, file_count: int, stats: Dict,
+                        processed_files: int):
+        """Report a merged batch with its metrics and the overall ETA."""
+        self.completed_batches += 1
+        self.processed_files = processed_files
+        self.add_request(stats)
+        eta = self.eta()
+        self.event(
+            "batch_completed",
+            batch=batch_index + 1,
+            files=file_count,
+            latency=round(stats["latency"], 3),
+            first_result_latency=(round(stats["first_result_latency"], 3)
+                                  if stats["first_result_latency"] is not None else None),
+            prompt_tokens=stats["prompt_tokens"],
+            completion_tokens=stats["completion_tokens"],
+            retries=stats["retries"],
+            cache_hit=stats["cache_hit"],
+            processed_files=processed_files,
+            total_files=self.total_files,
+            completed_batches=self.completed_batches,
+            total_batches=self.total_batches,
+            eta=round(eta, 1) if eta is not None else None,
+        )
+        if stats["cache_hit"]:
+            detail = "cached"
+        else:
+            detail = (f"{stats['latency']:.1f}s, {stats['prompt_tokens']:,} prompt + "
+                      f"{stats['completion_tokens']:,} completion tokens")
+            if stats["retries"]:
+                detail += f", {stats['retries']} retries"
+        self.log(f"Batch #{batch_index+1}/{self.total_batches} ({file_count} files, {detail}). "
+                 f"Processed {processed_files}/{self.total_files} files, "
+                 f"ETA {format_duration(eta or 0)}")
+
+    def run_completed(self, **fields):
+        """Report the totals of the run and close the event stream."""
+        elapsed = time.monotonic() - self.start_time
+        self.event("run_completed", elapsed=round(elapsed, 3), **self.totals, **fields)
+        self.log(f"\nAnalysis took {format_duration(elapsed)}: "
+                 f"{self.totals['requests']} requests, "
+                 f"{self.totals['prompt_tokens']:,} prompt tokens, "
+                 f"{self.totals['completion_tokens']:,} completion tokens, "
+                 f"{self.totals['retries']} retries, {self.totals['cache_hits']} cache hits")
+        if self.events is not None and self.events is not sys.stdout:
+            self.events.close()
+        self.events = None
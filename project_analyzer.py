@@ -1,31 +1,74 @@
 import os
 import argparse
+import asyncio
+import time
 from pathlib import Path
-from typing import List, Dict
-from openai import AzureOpenAI
+from typing import (
+    List, Dict, Callable, Generator, Hashable, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+)
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 import json
-from collections import defaultdict
+from collections import defaultdict, deque
 import fnmatch
+import itertools
+import subprocess
 import sys
+from adaptive import MIN_PROMPT_TOKENS, AdaptiveController
+from checkpoint import Checkpoint
+from data_models import DataModelRegistry
+from dedup import find_duplicates, fingerprint_files
+from dependency_graph import DependencyGraph
+from file_content import content_size, hash_file, load_content, map_file
+from file_discovery import iter_project_files
+from progress import ProgressReporter, new_batch_stats
+from import_extractors import build_import_edges
+from json_stream import StreamingJSONObject
+from locality import cluster_files
+from output_writer import FILES_SECTION, ResultsWriter, file_section
+from llm_backends import (
+    BACKEND_NAMES, AzureBackend, Completion, LLMBackend, ReplayMissError, create_backend
+)
+from response_cache import ResponseCache, batch_cache_key, hash_bytes
+from retry import call_with_retries, call_with_retries_async
+from skeletons import extract_skeletons
+from workspace import FairQueue, Repository, load_manifest, workspace_repositories
+from summaries import (
+    ROOT_FOLDER, build_folder_tree, folder_depth, pack_texts, take_within_budget
+)
 
 # Load environment variables
 load_dotenv()
 
-# Set up Azure OpenAI client
-credential = DefaultAzureCredential()
-AZURE_COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
-azure_token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), AZURE_COGNITIVE_SERVICES_SCOPE
-)
-
-llm = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_API_BASE_URL"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_ad_token_provider=azure_token_provider,
-)
+MODEL_NAME = "o3-mini"  # Using o3-mini as specified
+MAX_COMPLETION_TOKENS = 8192
+# Bump whenever the batch prompt or response format changes, to invalidate cached results
+PROMPT_VERSION = "6"
+# Maximum number of imports listed per file as context with a batch
+MAX_CONTEXT_IMPORTS = 20
+# Larger dependency graphs are rendered collapsed to one node per module
+MAX_MERMAID_NODES = 80
+# Folder summaries shorter than this are passed to the parent folder as they are
+INLINE_SUMMARY_TOKENS = 1000
+# Input of one folder summary request; more is summarized in groups first
+MAX_SUMMARY_INPUT_TOKENS = 12000
+# Share of the project description prompt for data models and for features
+MAX_DATA_MODEL_TOKENS = 6000
+MAX_FEATURE_TOKENS = 2000
+
+# Folder of the results, with a subfolder per repository in a workspace
+DEFAULT_OUTPUT_DIR = "out"
+OUTPUT_FILE_NAME = "project_analysis.md"
+# Analysis state saved next to the markdown, used by --incremental
+STATE_FILE_NAME = "project_analysis.json"
+STATE_VERSION = 4
+# Descriptions streamed as JSON lines while the run goes on
+STREAM_FILE_NAME = "project_analysis.ndjson"
+# Results of the batches merged so far, removed when a run completes
+CHECKPOINT_FILE_NAME = "checkpoint.jsonl"
+CHECKPOINT_VERSION = 1
+WORKSPACE_SUMMARY_FILE_NAME = "workspace_summary.md"
+
+DEFAULT_MAX_RETRIES = 6
 
 # Directories to ignore
 IGNORE_DIRS = {
@@ -34,34 +77,344 @@ IGNORE_DIRS = {
 }
 
 
+# Byte-based token estimate used when no local tokenizer is available
+BYTES_PER_TOKEN = 4
+# Files larger than this are sent as their head and tail instead of in parts
+DEFAULT_MAX_FILE_BYTES = 128 * 1024
+# Files are batched by folder, or in clusters of files coupled by imports
+BATCHING_STRATEGIES = ("folder", "locality")
+# In skeleton mode, smaller files are sent in full rather than outlined
+DEFAULT_SKELETON_MIN_BYTES = 2048
+# Smaller files are always analyzed, even when they duplicate another file
+DEFAULT_DEDUP_MIN_BYTES = 1024
+# Tokens taken by the path and JSON structure around each file in the prompt
+FILE_OVERHEAD_TOKENS = 20
+
+_token_encoding = None
+
+
+def get_token_encoding():
+    """Return the tiktoken encoding of the model if tiktoken is installed, else None."""
+    global _token_encoding
+    if _token_encoding is None:
+        try:
+            import tiktoken
+            _token_encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # Not installed, or the encoding cannot be loaded offline
+            _token_encoding = False
+    return _token_encoding or None
+
+
+def use_byte_token_estimates():
+    """Estimate tokens from bytes without loading the tokenizer, which may download it."""
+    global _token_encoding
+    _token_encoding = False
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text."""
+    encoding = get_token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // BYTES_PER_TOKEN + 1
+
+
+class FileChunk(NamedTuple):
+    """A part of a file too large to fit in a single batch."""
+    path: Path
+    part: int  # Numbered from 1
+    parts: int
+    start: int  # Byte offsets of the part within the file
+    end: int
+
+    def __str__(self):
+        return f"{self.path} (part {self.part}/{self.parts})"
+
+
+# A batch holds whole files and parts of files too large for a batch
+BatchItem = Union[Path, FileChunk]
+# Analyzed parts of a batch with their results, None for a file whose analysis failed
+BatchParts = List[Tuple[List[BatchItem], Optional[Dict]]]
+
+
+class BatchRequest(NamedTuple):
+    """A request to send for the analysis of a batch."""
+    messages: List[Dict]
+    # Returns the parser of the response of an attempt, called once per attempt
+    new_parser: Callable[[], StreamingJSONObject]
+
+
+def item_path(item: BatchItem) -> Path:
+    """Return the file a batch item belongs to."""
+    return item.path if isinstance(item, FileChunk) else item
+
+
+def item_to_dict(item: BatchItem) -> Dict:
+    """Serialize a batch item for the checkpoint."""
+    if isinstance(item, FileChunk):
+        return {"path": str(item.path), "part": item.part, "parts": item.parts,
+                "start": item.start, "end": item.end}
+    return {"path": str(item)}
+
+
+def item_from_dict(data: Dict) -> BatchItem:
+    """Load a batch item saved with item_to_dict."""
+    if "part" in data:
+        return FileChunk(Path(data["path"]), data["part"], data["parts"],
+                         data["start"], data["end"])
+    return Path(data["path"])
+
+
+def ask_confirmation(question: str, reporter: ProgressReporter):
+    """Ask a yes or no question, exiting unless the answer is yes."""
+    while True:
+        try:
+            response = input(f"{question} (y/n): ")
+        except EOFError:
+            reporter.error("\nNo confirmation given, use --yes to run unattended.")
+            sys.exit(1)
+        if response.lower() == 'y':
+            return
+        elif response.lower() == 'n':
+            print("Analysis cancelled by user.")
+            sys.exit(0)
+        else:
+            print("Please enter 'y' or 'n'.")
+
+
+def include_patterns(extensions: str) -> str:
+    """Convert extensions as given to --ext to comma-separated glob patterns."""
+    patterns = []
+    for ext in extensions.split(','):
+        ext = ext.strip()
+        if ext.lower() == 'noext':
+            # Match files with no extension
+            patterns.append('[!.]*')  # Matches any filename not containing a dot
+        else:
+            patterns.append(f'*.{ext}')
+    return ','.join(patterns)
+
+
+class RateLimiter:
+    """Sliding one-minute window limiting requests and tokens sent to a deployment."""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._sent = deque()  # (timestamp, tokens) of requests within the window
+        self._tokens_in_window = 0
+        self._lock = None
+        self._lock_loop = None
+
+    def _expire(self, now: float):
+        while self._sent and now - self._sent[0][0] >= self.WINDOW_SECONDS:
+            _, tokens = self._sent.popleft()
+            self._tokens_in_window -= tokens
+
+    def _has_capacity(self, tokens: int) -> bool:
+        if self.requests_per_minute and len(self._sent) >= self.requests_per_minute:
+            return False
+        # A single request larger than the whole budget is let through on an empty window
+        if (self.tokens_per_minute and self._sent
+                and self._tokens_in_window + tokens > self.tokens_per_minute):
+            return False
+        return True
+
+    async def acquire(self, tokens: int):
+        """Wait until a request of the given token cost fits in the window."""
+        # The limiter may outlive an event loop, so the lock is bound per loop
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        # Waiters queue on the lock, so capacity is handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if self._has_capacity(tokens):
+                    self._sent.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = self._sent[0][0] + self.WINDOW_SECONDS - now
+                await asyncio.sleep(max(wait, 0.01))
+
+
+def git_head_commit(path: Path) -> Optional[str]:
+    """Return the commit checked out in a git working tree, or None."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=path, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def git_changed_files(path: Path, commit: str) -> Optional[set]:
+    """Return the paths changed in the working tree since a commit, or None.
+
+    Paths are relative to the given directory. Deleted files are included, and
+    so are untracked files, which git diff does not list but may have changed
+    since they were analyzed.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "diff", "--name-status", "--no-renames", "--relative", commit],
+            cwd=path, capture_output=True, text=True, check=True
+        )
+        untracked = subprocess.run(
+            ["git", "ls-files", "--others", "--exclude-standard"],
+            cwd=path, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    changed = set()
+    for line in result.stdout.splitlines():
+        status, _, file_path = line.partition("\t")
+        if file_path:
+            changed.add(Path(file_path))
+    changed.update(Path(file_path) for file_path in untracked.stdout.splitlines() if file_path)
+    return changed
+
+
+# Rate limiters are shared by everything that talks to the same deployment
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(deployment: str, requests_per_minute: Optional[int] = None,
+                     tokens_per_minute: Optional[int] = None) -> RateLimiter:
+    """Return the rate limiter for a deployment, creating it on first use."""
+    if deployment not in _rate_limiters:
+        _rate_limiters[deployment] = RateLimiter(
+            requests_per_minute, tokens_per_minute
+        )
+    return _rate_limiters[deployment]
+
+
 class ProjectAnalyzer:
-    def __init__(self, base_path: str, include: str, batch_size: int = 10):
+    def __init__(self, base_path: str, include: str, batch_size: int = 40,
+                 max_prompt_tokens: int = 32000,
+                 max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                 concurrency: int = 1, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None,
+                 incremental: bool = False, use_git: bool = True,
+                 assume_yes: bool = False, max_files: Optional[int] = None,
+                 reporter: Optional[ProgressReporter] = None,
+                 resume: bool = False, max_retries: int = DEFAULT_MAX_RETRIES,
+                 mode: str = "full",
+                 skeleton_min_bytes: int = DEFAULT_SKELETON_MIN_BYTES,
+                 dedup: bool = True,
+                 dedup_min_bytes: int = DEFAULT_DEDUP_MIN_BYTES,
+                 backend: Optional[LLMBackend] = None,
+                 output_dir: str = DEFAULT_OUTPUT_DIR,
+                 json_mode: bool = False,
+                 controller: Optional[AdaptiveController] = None,
+                 batching: str = "folder"):
         self.base_path = Path(base_path).resolve()
+        # Folder of the markdown results, the analysis state and the checkpoint
+        self.output_dir = output_dir
+        self.output_file = os.path.join(output_dir, OUTPUT_FILE_NAME)
+        self.state_file = os.path.join(output_dir, STATE_FILE_NAME)
+        # Writes the results to disk as the batches are merged
+        self.writer = ResultsWriter(output_dir, self.output_file,
+                                    os.path.join(output_dir, STREAM_FILE_NAME))
+        # Answers the chat completion requests, Azure OpenAI unless given
+        self.backend = backend or AzureBackend(MODEL_NAME)
+        # Ask for batch analyses in JSON mode, for deployments that support it
+        self.json_mode = json_mode
+        # Maximum number of files in a batch
         self.batch_size = batch_size
+        # Prompt tokens a batch is packed up to
+        self.max_prompt_tokens = max_prompt_tokens
+        # Files larger than this are truncated rather than split into parts
+        self.max_file_bytes = max_file_bytes
+        self._content_budget = None
+        # "full" sends file contents, "skeleton" outlines of the larger files
+        self.mode = mode
+        # "folder" packs the files of a folder together, "locality" files that import each other
+        self.batching = batching
+        self.skeleton_min_bytes = skeleton_min_bytes
+        # Outlines sent instead of the content of files, by path
+        self.skeletons = {}
+        # Estimated prompt tokens of each file, by path, as planning reads them repeatedly
+        self.file_tokens = {}
+        # Analyze one file of each group of identical or near-identical files
+        self.dedup = dedup
+        self.dedup_min_bytes = dedup_min_bytes
+        # Map duplicate files to the file analyzed for them and whether they are identical
+        self.duplicates = {}
+        # Number of batches sent to the LLM at the same time
+        self.concurrency = max(1, concurrency)
+        # Adapts the requests in flight and the batch budget during the run, None to keep them
+        self.controller = controller
+        self.rate_limiter = get_rate_limiter(
+            os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME") or "default",
+            requests_per_minute, tokens_per_minute
+        )
+        # Cache of batch results keyed on file contents, None to always call the LLM
+        self.cache = cache
+        # Re-analyze only the files changed since the saved analysis state
+        self.incremental = incremental
+        # List files with git ls-files when the project is in a git working tree
+        self.use_git = use_git
+        # Proceed without asking for confirmation, e.g. in CI or cron runs
+        self.assume_yes = assume_yes
+        # Refuse to analyze more files than this
+        self.max_files = max_files
+        self.reporter = reporter or ProgressReporter()
+        # Continue from the checkpoint of an interrupted run
+        self.resume = resume
+        self.checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_FILE_NAME))
+        # Retries of a failed request before the run stops
+        self.max_retries = max_retries
+        self.file_hashes = {}
+        # Files analyzed in this run, None when everything is analyzed
+        self.changed_files = None
         self.include_patterns = [pattern.strip() for pattern in include.split(',')]
         self.all_files = []
         self.processed_files = set()
-        self.dependency_graph = "graph TD\n"
+        self.dependency_graph = DependencyGraph()
+        # Prompt tokens of every analyzed batch, to check that prompts stay bounded
+        self.batch_prompt_tokens = []
         self.file_descriptions = {}
         # Map folders to descriptions
         self.module_descriptions = defaultdict(str)
         self.project_description = ""
         self.features = set()  # Collection of project features
         # Collection of data models and their relationships
-        self.data_models = {}
+        self.data_models = DataModelRegistry()
+        # Features and data models of each merged batch with its files, to drop
+        # those of changed and deleted files on incremental runs
+        self.batch_records = []
 
-    def should_ignore(self, path: Path) -> bool:
-        """Check if a path should be ignored."""
+    def should_ignore(self, path: Path, is_dir: Optional[bool] = None) -> bool:
+        """Check if a path should be ignored.
+
+        Pass is_dir when the type of the path is already known, to avoid a stat.
+        """
         # Ignore hidden files and directories
         if path.name.startswith('.'):
             return True
 
+        if is_dir is None:
+            is_dir = path.is_dir()
+            is_file = path.is_file()
+        else:
+            is_file = not is_dir
+
         # Ignore specific directories
-        if path.is_dir() and path.name in IGNORE_DIRS:
+        if is_dir and path.name in IGNORE_DIRS:
             return True
 
         # For files, check if they match any of the include patterns
-        if path.is_file():
+        if is_file:
             # Check if the file matches any of the include patterns
             for pattern in self.include_patterns:
                 if fnmatch.fnmatch(path.name, pattern):
@@ -71,43 +424,147 @@ class ProjectAnalyzer:
 
         return False
 
+    def iter_files(self) -> Iterator[Path]:
+        """Yield the project files matching the include patterns as they are found.
+
+        Uses git ls-files in a git working tree, and otherwise walks the folders
+        honoring .gitignore files.
+        """
+        for file_path in iter_project_files(
+            str(self.base_path),
+            skip_dir=lambda name: self.should_ignore(Path(name), is_dir=True),
+            include_file=lambda name: not self.should_ignore(Path(name), is_dir=False),
+            use_git=self.use_git
+        ):
+            yield Path(file_path)
+
     def collect_files(self) -> List[Path]:
         """Collect all files in the project that match the include patterns."""
-        self.all_files = []
-        
-        for root, dirs, files in os.walk(self.base_path):
-            # Modify dirs in-place to skip ignored directories
-            dirs[:] = [d for d in dirs if not self.should_ignore(Path(root) / d)]
-
-            for file in files:
-                file_path = Path(root) / file
-                if not self.should_ignore(file_path):
-                    rel_path = file_path.relative_to(self.base_path)
-                    self.all_files.append(rel_path)
-
-        print("Files to be processed:")
+        self.all_files = list(self.iter_files())
+
+        self.reporter.log("Files to be processed:")
         for file in sorted(self.all_files):
-            print(str(file))
-        print(f"Found {len(self.all_files)} files to analyze.")
-        
+            self.reporter.log(str(file))
+        self.reporter.log(f"Found {len(self.all_files)} files to analyze.")
+        self.reporter.event("files_collected", files=len(self.all_files))
+
+        if self.max_files is not None and len(self.all_files) > self.max_files:
+            self.reporter.error(
+                f"Found {len(self.all_files)} files, more than --max-files "
+                f"{self.max_files}. Adjust --ext or IGNORE_DIRS."
+            )
+            sys.exit(1)
+
         # Ask for user confirmation before proceeding
-        while True:
-            file_count = len(self.all_files)
-            prompt = "Do you want to proceed with the analysis of "
-            prompt += f"{file_count} files? (y/n): "
-            response = input(prompt)
-            if response.lower() == 'y':
-                break
-            elif response.lower() == 'n':
-                print("Analysis cancelled by user.")
-                sys.exit(0)
-            else:
-                print("Please enter 'y' or 'n'.")
-        
+        if not self.assume_yes:
+            ask_confirmation(
+                f"Do you want to proceed with the analysis of {len(self.all_files)} files?",
+                self.reporter
+            )
+
         return self.all_files
 
-    def create_batches(self) -> List[List[Path]]:
-        """Create logical batches of files for processing."""
+    def content_budget(self) -> int:
+        """Prompt tokens left for file contents once the rest of the prompt is included."""
+        if self._content_budget is None:
+            self._content_budget = max(
+                self.max_prompt_tokens - self.prompt_overhead_tokens(),
+                FILE_OVERHEAD_TOKENS + 1
+            )
+        return self._content_budget
+
+    def packing_budget(self) -> int:
+        """Content tokens the next batch is packed up to, lower than the content budget
+        while the adaptive controller has shrunk the batches."""
+        if self.controller is None:
+            return self.content_budget()
+        return max(
+            min(self.content_budget(),
+                self.controller.prompt_tokens - self.prompt_overhead_tokens()),
+            FILE_OVERHEAD_TOKENS + 1
+        )
+
+    def truncated_file_bytes(self) -> int:
+        """Bytes sent of a file larger than max_file_bytes, so that it fits in a batch."""
+        return min(
+            self.max_file_bytes,
+            (self.content_budget() - FILE_OVERHEAD_TOKENS) * BYTES_PER_TOKEN
+        )
+
+    def estimate_file_tokens(self, file_path: Path) -> int:
+        """Estimate the prompt tokens taken by a file without building the prompt."""
+        tokens = self.file_tokens.get(str(file_path))
+        if tokens is not None:
+            return tokens
+        skeleton = self.skeletons.get(str(file_path))
+        if skeleton is not None:
+            # Outlines are cut down like read_file_content sends them
+            tokens = estimate_tokens(skeleton[:self.truncated_file_bytes()])
+        elif get_token_encoding() is not None:
+            tokens = estimate_tokens(self.read_file_content(file_path))
+        else:
+            # Binary, minified and generated files are estimated from samples of their content
+            size = content_size(str(self.base_path / file_path), self.truncated_file_bytes(),
+                                self.max_file_bytes)
+            tokens = size // BYTES_PER_TOKEN
+        tokens = self.file_tokens[str(file_path)] = tokens + FILE_OVERHEAD_TOKENS
+        return tokens
+
+    def estimate_item_tokens(self, item: BatchItem) -> int:
+        """Estimate the prompt tokens taken by a file or part of a file."""
+        if isinstance(item, FileChunk):
+            return (item.end - item.start) // BYTES_PER_TOKEN + FILE_OVERHEAD_TOKENS
+        return self.estimate_file_tokens(item)
+
+    def prompt_overhead_tokens(self) -> int:
+        """Estimate the prompt tokens of a batch apart from its files."""
+        return sum(
+            estimate_tokens(message["content"])
+            for message in self.build_batch_messages([])
+        )
+
+    def split_file(self, file_path: Path, max_tokens: int) -> List[FileChunk]:
+        """Split a file into parts of at most max_tokens, cutting at line ends."""
+        chunk_bytes = max(1, (max_tokens - FILE_OVERHEAD_TOKENS) * BYTES_PER_TOKEN)
+        ranges = []
+        try:
+            with open(self.base_path / file_path, 'rb') as f, map_file(f) as data:
+                start = 0
+                while start < len(data):
+                    end = min(start + chunk_bytes, len(data))
+                    if end < len(data):
+                        line_end = data.rfind(b"\n", start, end)
+                        if line_end > start:
+                            end = line_end + 1
+                    ranges.append((start, end))
+                    start = end
+        except (OSError, ValueError):
+            pass
+        return [
+            FileChunk(file_path, part, len(ranges), start, end)
+            for part, (start, end) in enumerate(ranges, start=1)
+        ]
+
+    def create_batches(self) -> List[List[BatchItem]]:
+        """Pack the remaining files into batches that fit the prompt token budget."""
+        return list(self.iter_remaining_batches())
+
+    def plan_remaining_batches(self) -> Tuple[Iterable[List[BatchItem]], int]:
+        """Plan the batches of the remaining files, returning them and how many there are.
+
+        With the adaptive controller, batches are planned as they are taken,
+        with the budget at that time, so their number is only estimated.
+        """
+        if self.controller is None:
+            batches = self.create_batches()
+            return batches, len(batches)
+        pending = [file for file in self.all_files if file not in self.processed_files]
+        tokens = sum(self.estimate_file_tokens(file) for file in pending)
+        batch_count = max(-(-tokens // self.packing_budget()), -(-len(pending) // self.batch_size))
+        return self.iter_remaining_batches(), batch_count
+
+    def iter_remaining_batches(self) -> Iterator[List[BatchItem]]:
+        """Pack the remaining files into batches, each planned when it is taken."""
         # Group files by directory first
         dir_groups = {}
         for file in self.all_files:
@@ -119,51 +576,159 @@ class ProjectAnalyzer:
                 dir_groups[parent] = []
             dir_groups[parent].append(file)
 
-        # Create batches prioritizing files from the same directory
-        batches = []
-        current_batch = []
+        files = [file for files in dir_groups.values() for file in files]
+        if self.batching == "locality":
+            clusters = self.cluster_coupled_files(files)
+            cluster_of = {file: index for index, cluster in enumerate(clusters) for file in cluster}
+            return self.iter_batches(
+                (file for cluster in clusters for file in cluster), cluster_of.__getitem__
+            )
+        return self.iter_batches(files)
+
+    def cluster_coupled_files(self, files: List[Path]) -> List[List[Path]]:
+        """Group files that import each other into clusters that fit in a batch."""
+        start = time.monotonic()
+        paths = [str(file) for file in files]
+        clusters = cluster_files(
+            paths, [self.estimate_file_tokens(file) for file in files],
+            [str(file.parent) for file in files], self.dependency_graph.edges(),
+            self.packing_budget(), self.batch_size
+        )
+        cluster_of = {path: index for index, cluster in enumerate(clusters) for path in cluster}
+        imports = within = 0
+        for source, target in self.dependency_graph.edges():
+            if source in cluster_of and target in cluster_of:
+                imports += 1
+                within += cluster_of[source] == cluster_of[target]
+        self.reporter.log(f"Grouped {len(files)} files into {len(clusters)} clusters of coupled "
+                          f"files, with {within} of {imports} imports between them inside a "
+                          f"cluster, in {time.monotonic() - start:.1f}s.")
+        return [[Path(path) for path in cluster] for cluster in clusters]
+
+    def iter_batches(self, files: Iterable[Path],
+                     group_key: Optional[Callable[[Path], Hashable]] = None
+                     ) -> Iterator[List[BatchItem]]:
+        """Pack files into batches that fit the prompt token budget.
+
+        Batches are yielded as soon as they are full, so files can be streamed
+        in while they are discovered. Consecutive files of the same group, by
+        default their directory, are kept together, and a group that fits in
+        a batch of its own is not split between batches. Files larger than the budget are split into
+        parts, unless they are over max_file_bytes and get truncated instead.
+        Each batch is packed up to the packing budget when it is started, so
+        batches taken during a run follow the adaptive controller.
+        """
+        split_budget = self.content_budget()
+        budget = self.packing_budget()
 
-        # First try to keep directories together
-        for dir_path, files in dir_groups.items():
-            while files:
-                if len(current_batch) >= self.batch_size:
-                    batches.append(current_batch)
+        current_batch = []
+        current_tokens = 0
+
+        for _, group in itertools.groupby(files, key=group_key or (lambda file: file.parent)):
+            items = []
+            for file in group:
+                tokens = self.estimate_file_tokens(file)
+                # Outlines are sent whole, never as parts of the raw file
+                if tokens > split_budget and str(file) not in self.skeletons:
+                    for chunk in self.split_file(file, split_budget):
+                        items.append((chunk, self.estimate_item_tokens(chunk)))
+                else:
+                    items.append((file, tokens))
+
+            # Start a new batch rather than split a group that fits in one
+            group_tokens = sum(tokens for _, tokens in items)
+            group_fits = group_tokens <= budget and len(items) <= self.batch_size
+            fits_current = (current_tokens + group_tokens <= budget
+                            and len(current_batch) + len(items) <= self.batch_size)
+            if current_batch and group_fits and not fits_current:
+                yield current_batch
+                current_batch = []
+                current_tokens = 0
+                budget = self.packing_budget()
+
+            for item, tokens in items:
+                if current_batch and (current_tokens + tokens > budget
+                                      or len(current_batch) >= self.batch_size):
+                    yield current_batch
                     current_batch = []
-
-                # Add files from the same directory up to batch size
-                space_left = self.batch_size - len(current_batch)
-                to_add = files[:space_left]
-                current_batch.extend(to_add)
-                files = files[space_left:]
+                    current_tokens = 0
+                    budget = self.packing_budget()
+                current_batch.append(item)
+                current_tokens += tokens
 
         # Add the last batch if not empty
         if current_batch:
-            batches.append(current_batch)
-
-        return batches
-
-    def read_file_content(self, file_path: Path) -> str:
-        """Read and return the content of a file."""
-        try:
-            full_path = self.base_path / file_path
-            with open(full_path, 'r', encoding='utf-8', errors='replace') as f:
-                return f.read()
-        except Exception as e:
-            return f"Error reading file: {str(e)}"
-
-    def analyze_batch(self, batch: List[Path]) -> Dict:
-        """Send a batch of files to the LLM for analysis."""
-        # Prepare the files data
+            yield current_batch
+
+    def print_batch_plan(self, batches: Iterable[List[BatchItem]]):
+        """Print the planned batches and their estimated prompt tokens."""
+        overhead = self.prompt_overhead_tokens()
+        total_tokens = 0
+        # Batch of each planned file, to count the imports within batches
+        files = {}
+        batch_count = 0
+        for batch_index, batch in enumerate(batches):
+            batch_count += 1
+            files.update((str(item_path(item)), batch_index) for item in batch)
+            item_tokens = [self.estimate_item_tokens(item) for item in batch]
+            batch_tokens = overhead + sum(item_tokens)
+            total_tokens += batch_tokens
+            print(f"\nBatch #{batch_index+1}: {len(batch)} files, "
+                  f"~{batch_tokens:,} estimated prompt tokens")
+            for item, tokens in zip(batch, item_tokens):
+                print(f"  - {item} (~{tokens:,} tokens)")
+        print(f"\nPlanned {batch_count} batches for {len(files)} files, "
+              f"~{total_tokens:,} estimated prompt tokens in total "
+              f"(budget {self.max_prompt_tokens:,} per batch).")
+        imports = [(files[source], files[target]) for source, target in self.dependency_graph.edges()
+                   if source in files and target in files]
+        if imports:
+            print(f"{sum(source == target for source, target in imports)} of {len(imports)} "
+                  "imports between the planned files are within a batch.")
+
+    def read_file_content(self, file_path: BatchItem) -> str:
+        """Return the content of a file or a part of a file as sent to the LLM.
+
+        Binary files are left out, minified and generated files are reduced,
+        and files over max_file_bytes are cut down to their head and tail.
+        """
+        if isinstance(file_path, FileChunk):
+            return load_content(
+                str(self.base_path / file_path.path), self.max_file_bytes,
+                file_path.start, file_path.end
+            ).text
+        skeleton = self.skeletons.get(str(file_path))
+        if skeleton is not None:
+            return skeleton[:self.truncated_file_bytes()]
+        return load_content(
+            str(self.base_path / file_path), self.truncated_file_bytes()
+        ).text
+
+    def build_batch_messages(self, batch: List[BatchItem]) -> List[Dict]:
+        """Build the chat messages asking the LLM to analyze a batch of files."""
+        # Files are delimited by tags rather than escaped into JSON, which saves tokens
         files_data = []
-        for file_path in batch:
-            content = self.read_file_content(file_path)
-            files_data.append({
-                "path": str(file_path),
-                "content": content
-            })
+        for item in batch:
+            path = str(item_path(item)).replace('"', "&quot;")
+            part = f' part="{item.part}/{item.parts}"' if isinstance(item, FileChunk) else ""
+            if str(item) in self.skeletons:
+                part = ' content="outline"'
+            files_data.append(
+                f'<file path="{path}"{part}>\n{self.read_file_content(item)}\n</file>'
+            )
+        files_text = "\n".join(files_data)
+
+        # The imports come from the static dependency graph of the project
+        imports = "\n".join(
+            f"- {file_path} imports: {', '.join(sorted(dependencies)[:MAX_CONTEXT_IMPORTS])}"
+            for file_path in sorted(set(str(item_path(item)) for item in batch))
+            if file_path in self.dependency_graph
+            for dependencies in [self.dependency_graph.dependencies(file_path)]
+            if dependencies
+        ) or "None"
 
         # Group files by folder for module-specific descriptions
-        folders = set(str(file_path.parent) for file_path in batch)
+        folders = sorted(set(str(item_path(item).parent) for item in batch))
 
         # Prepare the prompt
         system_prompt = """
@@ -176,7 +741,6 @@ class ProjectAnalyzer:
         2. Identify the modules or components these files belong to (by folder)
         3. Identify features implemented in these files
         4. Identify data models and their relationships
-        5. Update a dependency graph showing relationships between files
 
         Your output should be in JSON format with the following structure:
         {
@@ -199,21 +763,9 @@ class ProjectAnalyzer:
                         "relationship with other models (e.g., 'has many users')"
                     ]
                 }
-            },
-            "dependency_graph": "updated MermaidJS graph TD syntax showing dependencies.
-                Focus on dependencies between source code and modules, ignore project
-                setup & config files. Name the graph entities so that they're
-                understandable. Prefer class/entities and if not found, use the
-                module/file names. The graph entities must contain only text and no
-                parentheses of any kind."
+            }
         }
 
-        For the dependency graph:
-        - Use MermaidJS graph TD syntax
-        - Each node should be a file or module
-        - Arrows should represent dependencies (A --> B means A depends on B)
-        - Add new nodes and connections based on your analysis
-
         For data models:
         - Identify classes, structs, or other data structures that represent domain entities
         - Infer the purpose and relationships between these models
@@ -225,6 +777,13 @@ class ProjectAnalyzer:
         - Be specific and concise (e.g., "User authentication", "Data visualization", "PDF export")
         - Focus on end-user or developer-facing features, not implementation details
 
+        Each file is given between <file path="..."> and </file> tags. Large files
+        are split into parts. For a part, describe only the code in that part, using
+        the path of the file as the key. Very large, minified and generated files may
+        be shortened, which is noted in their content. Files with content="outline"
+        only list their imports, declarations, fields and docstrings; describe them
+        from these.
+
         Keep your tone objective. Instead of giving a review or compliments on the
         codebase, focus on the structure and dependencies of the project.
         """
@@ -234,15 +793,10 @@ class ProjectAnalyzer:
         # Project Analysis Request
 
         ## Files in Current Batch:
-        {json.dumps(files_data, indent=2)}
+        {files_text}
 
-        ## Files Processed So Far:
-        {list(self.processed_files)}
-
-        ## Current Dependency Graph:
-        ```mermaid
-        {self.dependency_graph}
-        ```
+        ## Project Files Imported by These Files:
+        {imports}
 
         ## Folders in this batch:
         {list(folders)}
@@ -251,7 +805,6 @@ class ProjectAnalyzer:
         1. A description of each file
         2. A description of each module (folder) they belong to
         3. Identification of data models and their relationships
-        4. An updated dependency graph in MermaidJS format
 
         Return your analysis in the JSON format specified in the system prompt.
         """
@@ -261,32 +814,389 @@ class ProjectAnalyzer:
             {"role": "user", "content": user_message}
         ]
 
-        print(f"Analyzing batch of {len(batch)} files...")
+        return messages
 
-        # Call the LLM
-        response = llm.chat.completions.create(
-            model="o3-mini",  # Using o3-mini as specified
-            messages=messages,
-            max_completion_tokens=8192
+    def record_usage(self, messages: List[Dict], completion: Completion, stats: Dict):
+        """Record the tokens used by a request in the stats of its batch."""
+        if completion.prompt_tokens:
+            stats["prompt_tokens"] += completion.prompt_tokens
+            stats["completion_tokens"] += completion.completion_tokens
+        else:
+            stats["prompt_tokens"] += sum(
+                estimate_tokens(message["content"]) for message in messages
+            )
+            stats["completion_tokens"] += estimate_tokens(completion.content)
+
+    def print_prompt_token_summary(self):
+        """Report how prompt tokens per batch evolved over the run."""
+        tokens = self.batch_prompt_tokens
+        if not tokens:
+            return
+        quarter = max(1, len(tokens) // 4)
+        first = sum(tokens[:quarter]) // quarter
+        last = sum(tokens[-quarter:]) // quarter
+        self.reporter.log(f"\nPrompt tokens per batch over {len(tokens)} batches: "
+              f"min {min(tokens):,}, mean {sum(tokens) // len(tokens):,}, "
+              f"max {max(tokens):,}; first quarter mean {first:,}, "
+              f"last quarter mean {last:,}")
+
+    def parse_batch_response(self, content: Optional[str]) -> Optional[Dict]:
+        """Parse the LLM response for a batch, returning None if it is not a JSON object."""
+        text = (content or "").strip()
+        # Models sometimes wrap the JSON in a markdown code block
+        if text.startswith("```"):
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError:
+            result = None
+        if not isinstance(result, dict):
+            self.reporter.error("Error: Could not parse LLM response as JSON")
+            self.reporter.error(content or "")
+            return None
+        return result
+
+    def empty_batch_result(self) -> Dict:
+        """Result used for a batch whose analysis could not be parsed."""
+        return {
+            "file_descriptions": {},
+            "module_descriptions": {},
+            "data_models": {}
+        }
+
+    def file_hash(self, file_path: Path) -> str:
+        """Return the content hash of a project file, reading it only once per run."""
+        if file_path not in self.file_hashes:
+            try:
+                content_hash = hash_file(str(self.base_path / file_path))
+            except (OSError, ValueError):
+                content_hash = "unreadable"
+            self.file_hashes[file_path] = content_hash
+        return self.file_hashes[file_path]
+
+    def batch_cache_key(self, messages: List[Dict]) -> str:
+        """Cache key for a batch based on its prompt.
+
+        The prompt holds everything a batch result depends on: the contents of
+        its files or parts of files as sent, after truncation or outlining,
+        and the imports listed as context.
+        """
+        prompt = json.dumps(messages, sort_keys=True)
+        return batch_cache_key(
+            [("batch", hash_bytes(prompt.encode("utf-8")))],
+            PROMPT_VERSION, MODEL_NAME, os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME") or ""
+        )
+
+    def cached_batch_result(self, messages: List[Dict]) -> Optional[Dict]:
+        """Return the cached result for a batch prompt, or None if it must be analyzed."""
+        if self.cache is None:
+            return None
+        return self.cache.get(self.batch_cache_key(messages))
+
+    def store_batch_result(self, messages: List[Dict], content: str) -> Optional[Dict]:
+        """Parse the LLM response for a batch prompt and cache it if it is valid."""
+        result = self.parse_batch_response(content)
+        if result is not None and self.cache is not None:
+            self.cache.put(self.batch_cache_key(messages), result)
+        return result
+
+    def retry_callback(self, stats: Dict):
+        """Return a callback counting and reporting the retries of a request."""
+        def on_retry(error: Exception, delay: float):
+            stats["retries"] += 1
+            status = getattr(error, "status_code", None)
+            reason = f"{type(error).__name__}" + (f" ({status})" if status else "")
+            self.reporter.log(f"Request failed with {reason}, retrying in {delay:.1f}s...")
+            self.reporter.event("request_retry", error=reason, delay=round(delay, 3),
+                                retries=stats["retries"])
+            if self.controller is not None:
+                self.report_adaptation(self.controller.record_throttling())
+        return on_retry
+
+    def report_adaptation(self, message: Optional[str]):
+        """Report a change of the limits made by the adaptive controller."""
+        if message is None:
+            return
+        self.reporter.log(message)
+        self.reporter.event("limits_adapted", concurrency=self.controller.concurrency,
+                            prompt_tokens=self.controller.prompt_tokens)
+
+    def observe_batch_request(self, completion: Completion, latency: float, retried: bool,
+                              parsed: bool):
+        """Let the adaptive controller learn from a batch request."""
+        if self.controller is None:
+            return
+        if not parsed:
+            self.report_adaptation(self.controller.record_truncation())
+        elif not retried:
+            # Latency that includes backoff says nothing about the deployment
+            self.report_adaptation(self.controller.record_success(
+                latency, completion.completion_tokens or estimate_tokens(completion.content)
+            ))
+
+    def response_parser(self, batch: List[BatchItem], stats: Dict,
+                        start: float) -> StreamingJSONObject:
+        """Parser of a streamed batch response, writing each file description as it arrives."""
+        # Descriptions of file parts are only complete once merged with the other parts
+        whole_files = set(
+            str(item_path(item)) for item in batch if not isinstance(item, FileChunk)
+        )
+
+        def on_entry(file_path: str, description):
+            if stats["first_result_latency"] is None:
+                stats["first_result_latency"] = time.monotonic() - start
+            if file_path in whole_files and isinstance(description, str):
+                self.writer.add_files([(file_path, description)])
+
+        return StreamingJSONObject("file_descriptions", on_entry)
+
+    def partial_batch_result(self, batch: List[BatchItem], parser: StreamingJSONObject
+                             ) -> Tuple[List[BatchItem], Dict, List[BatchItem]]:
+        """Split a batch whose response was cut off into the files it describes and the others.
+
+        The result holds the members of the response that were complete.
+        """
+        result = self.empty_batch_result()
+        result.update(parser.partial())
+        described = result["file_descriptions"]
+        analyzed = [item for item in batch if str(item_path(item)) in described]
+        missing = [item for item in batch if str(item_path(item)) not in described]
+        if analyzed:
+            self.reporter.log(f"Keeping the {len(analyzed)} files described before the "
+                              f"response was cut off, analyzing the other {len(missing)} again.")
+        return analyzed, result, missing
+
+    def split_failed_batch(self, batch: List[BatchItem]) -> Tuple[List[BatchItem], List[BatchItem]]:
+        """Halve a batch whose response could not be parsed, to retry it in smaller parts."""
+        middle = len(batch) // 2
+        self.reporter.log(f"Splitting the batch of {len(batch)} files whose response "
+                          "could not be parsed.")
+        return batch[:middle], batch[middle:]
+
+    def batch_analysis(self, batch: List[BatchItem], stats: Dict
+                       ) -> Generator[BatchRequest, Tuple[Completion, StreamingJSONObject],
+                                      BatchParts]:
+        """Analyze a batch, yielding the requests to send for it.
+
+        The caller sends each request and sends back its completion with the
+        parser of the attempt that succeeded, so the analysis is the same
+        whether requests are sent blocking or not. Returns the analyzed parts.
+        """
+        messages = self.build_batch_messages(batch)
+        cached = self.cached_batch_result(messages)
+        if cached is not None:
+            stats["cache_hit"] = True
+            return [(batch, cached)]
+
+        retries = stats["retries"]
+        start = time.monotonic()
+        completion, parser = yield BatchRequest(
+            messages, lambda: self.response_parser(batch, stats, start)
+        )
+        latency = time.monotonic() - start
+        stats["latency"] += latency
+        stats["requests"] += 1
+        self.record_usage(messages, completion, stats)
+
+        result = self.store_batch_result(messages, completion.content)
+        self.observe_batch_request(completion, latency, stats["retries"] > retries,
+                                   result is not None)
+        if result is not None:
+            return [(batch, result)]
+        analyzed, partial, missing = self.partial_batch_result(batch, parser)
+        if analyzed:
+            return [(analyzed, partial)] + (
+                (yield from self.batch_analysis(missing, stats)) if missing else []
+            )
+        if len(batch) == 1:
+            return [(batch, None)]
+        first, second = self.split_failed_batch(batch)
+        return ((yield from self.batch_analysis(first, stats))
+                + (yield from self.batch_analysis(second, stats)))
+
+    def send_batch_request(self, request: BatchRequest,
+                           stats: Dict) -> Tuple[Completion, StreamingJSONObject]:
+        """Send a batch request with retries, returning the completion and its parser."""
+        parser = None
+
+        def attempt():
+            # Every attempt parses its own response
+            nonlocal parser
+            parser = request.new_parser()
+            return self.backend.complete_streaming(
+                request.messages, MAX_COMPLETION_TOKENS, parser.feed, self.json_mode
+            )
+
+        completion = call_with_retries(attempt, self.max_retries, self.retry_callback(stats))
+        return completion, parser
+
+    async def send_batch_request_async(self, request: BatchRequest,
+                                       stats: Dict) -> Tuple[Completion, StreamingJSONObject]:
+        """Send a batch request with retries within the rate limits, without blocking."""
+        # Azure counts max_completion_tokens against the TPM quota up front
+        request_tokens = sum(
+            estimate_tokens(message["content"]) for message in request.messages
+        ) + MAX_COMPLETION_TOKENS
+        parser = None
+
+        async def attempt():
+            nonlocal parser
+            # Every attempt counts against the quota
+            await self.rate_limiter.acquire(request_tokens)
+            parser = request.new_parser()
+            return await self.backend.complete_streaming_async(
+                request.messages, MAX_COMPLETION_TOKENS, parser.feed, self.json_mode
+            )
+
+        completion = await call_with_retries_async(
+            attempt, self.max_retries, self.retry_callback(stats)
         )
+        return completion, parser
+
+    def analyze_batch(self, batch: List[BatchItem],
+                      stats: Optional[Dict] = None) -> BatchParts:
+        """Send a batch of files to the LLM for analysis.
+
+        Returns the analyzed parts of the batch with their results. The
+        response is streamed and its file descriptions parsed as they arrive,
+        so when it is cut off the files described so far are kept and only
+        the others are analyzed again. A batch whose response cannot be
+        parsed at all is split in halves that are analyzed separately; a
+        single file that still fails has a None result. Latency, token
+        usage, retries and cache hits are recorded in stats.
+        """
+        stats = stats if stats is not None else new_batch_stats()
+        analysis = self.batch_analysis(batch, stats)
+        try:
+            request = next(analysis)
+            while True:
+                request = analysis.send(self.send_batch_request(request, stats))
+        except StopIteration as done:
+            return done.value
+
+    async def analyze_batch_async(self, batch: List[BatchItem],
+                                  stats: Optional[Dict] = None) -> BatchParts:
+        """Send a batch of files to the LLM without blocking other batches."""
+        stats = stats if stats is not None else new_batch_stats()
+        analysis = self.batch_analysis(batch, stats)
+        try:
+            request = next(analysis)
+            while True:
+                request = analysis.send(await self.send_batch_request_async(request, stats))
+        except StopIteration as done:
+            return done.value
+
+    def summary_cache_key(self, folder: str, prompt: str) -> str:
+        """Cache key for the summary of a folder based on the summarized text."""
+        return batch_cache_key(
+            [(f"summary:{folder}", hash_bytes(prompt.encode("utf-8")))],
+            PROMPT_VERSION, MODEL_NAME, os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME") or ""
+        )
+
+    async def summarize_group(self, folder: str, texts: List[str], semaphore: asyncio.Semaphore) -> str:
+        """Summarize the descriptions of a folder and its subfolders with one request."""
+        system_prompt = """
+        You are a code analysis assistant. Summarize the descriptions of a folder
+        of a software project and of its subfolders into one description of the
+        folder: its purpose, its main components and how they relate. Mention the
+        subfolders by name. Answer with at most 250 words of plain text.
+        """
+        user_prompt = f"## Folder: {folder}\n\n" + "\n\n".join(texts)
+        key = self.summary_cache_key(folder, user_prompt)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached["summary"]
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        request_tokens = sum(
+            estimate_tokens(message["content"]) for message in messages
+        ) + MAX_COMPLETION_TOKENS
+
+        async def request():
+            await self.rate_limiter.acquire(request_tokens)
+            return await self.backend.complete_async(messages, MAX_COMPLETION_TOKENS)
+
+        stats = new_batch_stats()
+        async with semaphore:
+            start = time.monotonic()
+            completion = await call_with_retries_async(
+                request, self.max_retries, self.retry_callback(stats)
+            )
+        stats["latency"] = time.monotonic() - start
+        stats["requests"] = 1
+        self.record_usage(messages, completion, stats)
+        self.reporter.add_request(stats)
+        self.reporter.event(
+            "folder_summary", folder=folder, latency=round(stats["latency"], 3),
+            prompt_tokens=stats["prompt_tokens"],
+            completion_tokens=stats["completion_tokens"], retries=stats["retries"]
+        )
+
+        summary = completion.content.strip()
+        if self.cache is not None and summary:
+            self.cache.put(key, {"summary": summary})
+        return summary
+
+    async def summarize_texts(self, folder: str, texts: List[str], semaphore: asyncio.Semaphore) -> str:
+        """Reduce the descriptions of a folder and its subfolders to a bounded summary."""
+        joined = "\n\n".join(texts)
+        if estimate_tokens(joined) <= INLINE_SUMMARY_TOKENS:
+            return joined
+        groups = pack_texts(texts, MAX_SUMMARY_INPUT_TOKENS, estimate_tokens)
+        if len(groups) > 1:
+            # Too much for one request: summarize groups of subfolders first
+            summaries = await asyncio.gather(*(
+                self.summarize_group(folder, group, semaphore) for group in groups
+            ))
+            texts = [f"**{folder}** (part {index + 1}): {summary}"
+                     for index, summary in enumerate(summaries)]
+            return await self.summarize_texts(folder, texts, semaphore)
+        summary = await self.summarize_group(folder, texts, semaphore)
+        return f"**{folder}** (with subfolders): {summary}"
+
+    async def summarize_folder(self, folder: str, children: Dict[str, List[str]],
+                               semaphore: asyncio.Semaphore) -> str:
+        """Summarize a folder from its module description and its subfolder summaries.
+
+        Subfolders are summarized concurrently, so the time taken grows with
+        the depth of the tree rather than the number of folders.
+        """
+        subfolder_summaries = await asyncio.gather(*(
+            self.summarize_folder(child, children, semaphore)
+            for child in children.get(folder, [])
+        ))
+        texts = []
+        if self.module_descriptions.get(folder):
+            texts.append(f"**{folder}**: {self.module_descriptions[folder]}")
+        texts.extend(summary for summary in subfolder_summaries if summary)
+        if not texts:
+            return ""
+        return await self.summarize_texts(folder, texts, semaphore)
+
+    async def summarize_project_folders(self) -> str:
+        """Reduce the module descriptions bottom-up along the folder tree to one summary."""
+        folders = set(self.module_descriptions)
+        folders.update(str(file_path.parent) for file_path in self.all_files)
+        children = build_folder_tree(folders)
+        self.reporter.log(f"Summarizing {len(children)} folders, "
+                          f"{folder_depth(children)} levels deep...")
 
-        # Extract and parse the response
         try:
-            result = json.loads(response.choices[0].message.content)
-            return result
-        except json.JSONDecodeError:
-            print("Error: Could not parse LLM response as JSON")
-            print(response.choices[0].message.content)
-            return {
-                "file_descriptions": {},
-                "module_descriptions": {},
-                "data_models": {},
-                "dependency_graph": self.dependency_graph
-            }
+            return await self.summarize_folder(
+                ROOT_FOLDER, children, asyncio.Semaphore(self.concurrency)
+            )
+        finally:
+            await self.backend.aclose()
 
     def generate_project_description(self):
         """Generate an overall project description based on all analyzed files."""
-        print("\nGenerating overall project description...")
+        module_summary = asyncio.run(self.summarize_project_folders())
+
+        self.reporter.log("\nGenerating overall project description...")
 
         system_prompt = """
         You are a code analysis assistant. Your task is to provide a comprehensive
@@ -308,38 +1218,40 @@ class ProjectAnalyzer:
         codebase, focus on the structure and dependencies of the project.
         """
 
-        # Create a summary of module descriptions
-        module_summary = "\n\n".join([
-            f"**{folder}**: {description}" 
-            for folder, description in sorted(self.module_descriptions.items())
-        ])
-
-        # Create a summary of features
+        # Create a summary of features, bounded so the prompt stays small
         features_list = sorted(list(self.features))
-        features_summary = "\n".join([f"- {feature}" for feature in features_list])
+        features_summary = take_within_budget(
+            [f"- {feature}" for feature in features_list], MAX_FEATURE_TOKENS, estimate_tokens
+        )
 
-        # Create a summary of data models
-        data_models_summary = ""
-        for model_name, model_info in self.data_models.items():
-            data_models_summary += f"\n\n### {model_name}\n"
-            data_models_summary += f"{model_info.get('description', 'No description')}\n\n"
+        # Create a summary of data models, the richest first as the budget may cut the rest
+        data_model_blocks = []
+        for model in self.data_models.ranked():
+            block = f"\n### {model.name}\n"
+            if model.aliases != {model.name}:
+                block += f"Also named: {', '.join(sorted(model.aliases - {model.name}))}\n"
+            block += f"{model.description or 'No description'}\n\n"
 
             # Add attributes
-            if model_info.get('attributes'):
-                data_models_summary += "**Attributes:**\n"
-                for attr_name, attr_desc in model_info.get('attributes', {}).items():
-                    data_models_summary += f"- {attr_name}: {attr_desc}\n"
+            if model.attributes:
+                block += "**Attributes:**\n"
+                for attr_name, attr_desc in model.attributes.values():
+                    block += f"- {attr_name}: {attr_desc}\n"
 
             # Add relationships
-            if model_info.get('relationships'):
-                data_models_summary += "\n**Relationships:**\n"
-                for rel in model_info.get('relationships', []):
-                    data_models_summary += f"- {rel}\n"
+            if model.relationships:
+                block += "\n**Relationships:**\n"
+                for rel in model.relationships.values():
+                    block += f"- {rel}\n"
+            data_model_blocks.append(block)
+        data_models_summary = take_within_budget(
+            data_model_blocks, MAX_DATA_MODEL_TOKENS, estimate_tokens
+        )
 
         user_prompt = f"""
         I have analyzed a software project with the following structure:
 
-        Module Descriptions:
+        Summary of the Modules:
         {module_summary}
 
         Data Models:
@@ -350,7 +1262,7 @@ class ProjectAnalyzer:
 
         Dependency Graph:
         ```mermaid
-        {self.dependency_graph}
+        {self.dependency_graph.to_mermaid(MAX_MERMAID_NODES)}
         ```
 
         Please provide a well-structured project description that explains the
@@ -364,193 +1276,1012 @@ class ProjectAnalyzer:
         ]
 
         # Call the LLM
-        response = llm.chat.completions.create(
-            model="o3-mini",
-            messages=messages,
-            max_completion_tokens=8192
+        stats = new_batch_stats()
+        start = time.monotonic()
+        completion = call_with_retries(
+            lambda: self.backend.complete(messages, MAX_COMPLETION_TOKENS),
+            self.max_retries, self.retry_callback(stats)
+        )
+        stats["latency"] = time.monotonic() - start
+        stats["requests"] = 1
+        self.record_usage(messages, completion, stats)
+        self.reporter.add_request(stats)
+        self.reporter.event(
+            "project_description", latency=round(stats["latency"], 3),
+            prompt_tokens=stats["prompt_tokens"],
+            completion_tokens=stats["completion_tokens"], retries=stats["retries"]
         )
 
-        self.project_description = response.choices[0].message.content
-        print("Project description generated successfully.")
+        self.project_description = completion.content
+        self.reporter.log("Project description generated successfully.")
         return self.project_description
 
-    def process_project(self):
-        """Process the entire project in batches."""
-        # Collect all files
-        self.collect_files()
+    def merge_batch_result(self, batch: List[BatchItem], result: Dict):
+        """Merge the analysis of a batch into the project information."""
+        # Update project information, joining the descriptions of file parts
+        continued_files = set(
+            str(item.path) for item in batch
+            if isinstance(item, FileChunk) and item.part > 1
+        )
+        for file_path, description in result.get("file_descriptions", {}).items():
+            if file_path in continued_files and file_path in self.file_descriptions:
+                description = self.file_descriptions[file_path] + "\n\n" + description
+            self.file_descriptions[file_path] = description
+
+        # Update module descriptions (folder-specific)
+        module_descriptions = result.get("module_descriptions", {})
+        for folder, description in module_descriptions.items():
+            if description and description != "No description provided":
+                self.module_descriptions[folder] = description
+
+        self.merge_batch_record({
+            "files": sorted(set(str(item_path(item)) for item in batch)),
+            "features": result.get("features", []),
+            "data_models": result.get("data_models", {}),
+        })
+
+        # Mark files as processed
+        for item in batch:
+            self.processed_files.add(item_path(item))
+
+    def merge_batch_record(self, record: Dict):
+        """Merge the features and data models a batch reported for its files."""
+        features = [
+            feature.strip() for feature in record.get("features") or []
+            if isinstance(feature, str) and feature.strip()
+        ]
+        data_models = record.get("data_models") or {}
+        if not features and not data_models:
+            return
+        self.features.update(features)
+        # Merging the names of the same entity
+        self.data_models.merge_all(data_models)
+        self.batch_records.append(
+            {"files": record["files"], "features": features, "data_models": data_models}
+        )
+
+    def checkpoint_header(self) -> Dict:
+        """Identifies the runs whose checkpoint can be resumed."""
+        return {
+            "version": CHECKPOINT_VERSION,
+            "base_path": str(self.base_path),
+            "prompt_version": PROMPT_VERSION,
+            "model": MODEL_NAME,
+            "mode": self.mode,
+        }
 
-        # Process files in batches
+    def checkpoint_batch(self, batch: List[BatchItem], result: Dict):
+        """Append a merged batch result, with the hashes of its files, to the checkpoint."""
+        self.checkpoint.append({
+            "batch": [item_to_dict(item) for item in batch],
+            "hashes": {
+                str(item_path(item)): self.file_hash(item_path(item)) for item in batch
+            },
+            "result": result,
+        })
+
+    def resume_from_checkpoint(self):
+        """Merge the batch results checkpointed by an interrupted run.
+
+        Batches with files that changed or are no longer analyzed since are
+        skipped, as are files of which only some parts were checkpointed.
+        """
+        header, records = self.checkpoint.load()
+        if header != self.checkpoint_header():
+            self.reporter.log("No checkpoint to resume from, analyzing all files.")
+            self.checkpoint.start(self.checkpoint_header())
+            return
+
+        current_files = set(str(file_path) for file_path in self.all_files)
+        merged_parts = defaultdict(set)
+        resumed = 0
+        for record in records:
+            hashes = record.get("hashes", {})
+            if any(path not in current_files or self.file_hash(Path(path)) != content_hash
+                   for path, content_hash in hashes.items()):
+                continue
+            batch = [item_from_dict(item) for item in record["batch"]]
+            self.merge_batch_result(batch, record["result"])
+            for item in batch:
+                if isinstance(item, FileChunk):
+                    merged_parts[item.path].add(item.part)
+            resumed += 1
+
+        for item_file, parts in merged_parts.items():
+            chunk_count = len(self.split_file(item_file, self.content_budget()))
+            if parts != set(range(1, chunk_count + 1)):
+                self.processed_files.discard(item_file)
+                self.file_descriptions.pop(str(item_file), None)
+
+        self.checkpoint.open()
+        self.reporter.log(f"Resumed {resumed} batches from the checkpoint, "
+                          f"{len(self.processed_files)}/{len(self.all_files)} files done.")
+
+    def complete_batch(self, batch_index: int, batch: List[BatchItem],
+                       parts: BatchParts, stats: Dict):
+        """Merge and checkpoint the results of a batch and report its metrics and the progress."""
+        for part, result in parts:
+            if result is None:
+                # Not checkpointed, so that a resumed run analyzes the file again
+                self.merge_batch_result(part, self.empty_batch_result())
+                continue
+            self.merge_batch_result(part, result)
+            self.checkpoint_batch(part, result)
+            self.writer.add_modules(
+                (folder, self.module_descriptions[folder])
+                for folder in result.get("module_descriptions", {})
+                if folder in self.module_descriptions
+            )
+        batch_files = dict.fromkeys(str(item_path(item)) for item in batch)
+        self.writer.add_files(
+            (file_path, self.file_descriptions[file_path])
+            for file_path in batch_files if file_path in self.file_descriptions
+        )
+        if not stats["cache_hit"]:
+            self.batch_prompt_tokens.append(stats["prompt_tokens"])
+        self.reporter.batch_completed(
+            batch_index, len(batch), stats, len(self.processed_files)
+        )
+
+    async def process_batches_concurrently(self, batches: Iterable[List[BatchItem]]):
+        """Analyze batches with a bounded pool of workers."""
+        await analyze_batches_concurrently([(self, batches)], self.concurrency, self.controller)
+
+    def load_state(self) -> Optional[Dict]:
+        """Load the analysis state saved by a previous run of this project."""
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if (state.get("version") != STATE_VERSION
+                or state.get("base_path") != str(self.base_path)):
+            return None
+        return state
+
+    def find_changed_files(self, state: Dict) -> set:
+        """Find the collected files that differ from the saved analysis state."""
+        previous_files = state.get("files", {})
+        candidates = None
+        if state.get("commit"):
+            candidates = git_changed_files(self.base_path, state["commit"])
+        if candidates is not None:
+            # Files changed in the working tree when the state was saved may
+            # have been reverted since, which git no longer reports
+            candidates.update(Path(file_path) for file_path in state.get("dirty_files", []))
+
+        changed = set()
+        for file_path in self.all_files:
+            previous = previous_files.get(str(file_path))
+            if previous is None:
+                changed.add(file_path)
+                continue
+            if candidates is not None:
+                # Files git considers unchanged since the commit are reused as-is
+                if file_path not in candidates:
+                    continue
+            else:
+                # Without git, only files whose size or mtime changed are hashed
+                stat = (self.base_path / file_path).stat()
+                if (stat.st_size == previous.get("size")
+                        and stat.st_mtime == previous.get("mtime")):
+                    continue
+            if self.file_hash(file_path) != previous.get("hash"):
+                changed.add(file_path)
+        return changed
+
+    def find_dependent_files(self, files: Iterable[str], previous_graph: DependencyGraph) -> set:
+        """Find the collected files importing any of the given files.
+
+        Imports are looked up in the current graph and in the graph of the
+        previous analysis, which still has the imports of deleted files.
+        """
+        current_files = set(str(file_path) for file_path in self.all_files)
+        dependents = set()
+        for file_path in files:
+            for graph in (self.dependency_graph, previous_graph):
+                if file_path in graph:
+                    dependents.update(graph.dependents(file_path))
+        return set(Path(file_path) for file_path in dependents & current_files)
+
+    def restore_state(self, state: Dict):
+        """Reuse the previous analysis for every file that has not changed.
+
+        Files importing a changed or deleted file are analyzed again too, as
+        their descriptions may rely on what they import. Features and data
+        models are rebuilt from the batches that reported them, keeping those
+        of batches with files that are reused.
+        """
+        changed_files = self.find_changed_files(state)
+        current_files = set(str(file_path) for file_path in self.all_files)
+        deleted_files = set(state.get("files", {})) - current_files
+        dependent_files = self.find_dependent_files(
+            set(str(file_path) for file_path in changed_files) | deleted_files,
+            DependencyGraph.from_dict(state.get("dependency_graph", {}))
+        ) - changed_files
+        self.changed_files = changed_files | dependent_files
+
+        for file_path, description in state.get("file_descriptions", {}).items():
+            if file_path in current_files and Path(file_path) not in self.changed_files:
+                self.file_descriptions[file_path] = description
+                self.processed_files.add(Path(file_path))
+
+        # Drop modules whose files have all been deleted
+        current_folders = set(str(file_path.parent) for file_path in self.all_files)
+        for folder, description in state.get("module_descriptions", {}).items():
+            if folder in current_folders:
+                self.module_descriptions[folder] = description
+
+        reused_files = set(str(file_path) for file_path in self.processed_files)
+        for record in state.get("batch_records", []):
+            files = [file_path for file_path in record.get("files", []) if file_path in reused_files]
+            if files:
+                self.merge_batch_record(dict(record, files=files))
+
+        if not self.changed_files and not deleted_files:
+            self.project_description = state.get("project_description", "")
+
+        self.reporter.log(f"Incremental analysis: {len(changed_files)} changed or new files, "
+                          f"{len(dependent_files)} files importing them, "
+                          f"{len(deleted_files)} deleted files.")
+
+    def state_dict(self) -> Dict:
+        """Structured analysis state, used to re-analyze only changed files later."""
+        files = {}
+        for file_path in self.all_files:
+            try:
+                stat = (self.base_path / file_path).stat()
+            except OSError:
+                continue
+            files[str(file_path)] = {
+                "hash": self.file_hash(file_path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+        commit = git_head_commit(self.base_path)
+        dirty_files = git_changed_files(self.base_path, commit) if commit else None
+        return {
+            "version": STATE_VERSION,
+            "base_path": str(self.base_path),
+            "commit": commit,
+            # Files that differ from the commit, which git diff may not list later
+            "dirty_files": sorted(
+                str(file_path) for file_path in dirty_files or ()
+                if str(file_path) in files
+            ),
+            "project_description": self.project_description,
+            "module_descriptions": dict(sorted(self.module_descriptions.items())),
+            "file_descriptions": dict(sorted(self.file_descriptions.items())),
+            "features": sorted(self.features),
+            "data_models": self.data_models.to_dict(),
+            "batch_records": self.batch_records,
+            "dependency_graph": self.dependency_graph.to_dict(),
+            "files": files,
+        }
+
+    def build_dependency_graph(self):
+        """Build the file dependency graph from statically extracted imports."""
+        start = time.monotonic()
+        files = [str(file_path) for file_path in self.all_files]
+        self.dependency_graph = DependencyGraph()
+        for file_path in files:
+            self.dependency_graph.add_node(file_path, file_path)
+        for importer, imported in build_import_edges(str(self.base_path), files):
+            self.dependency_graph.add_edge(importer, imported)
+        self.reporter.log(f"Built dependency graph of {len(self.dependency_graph)} files and "
+              f"{self.dependency_graph.edge_count} imports in "
+              f"{time.monotonic() - start:.1f}s.")
+
+    def process_batches(self):
+        """Analyze the files that are not processed yet, merging each batch as it completes."""
         while len(self.processed_files) < len(self.all_files):
             # Create batches from remaining files
-            batches = self.create_batches()
-            if not batches:
+            batches, batch_count = self.plan_remaining_batches()
+            if not batch_count:
                 break
+            self.reporter.run_started(
+                len(self.all_files), len(self.all_files) - len(self.processed_files),
+                batch_count
+            )
+
+            if self.concurrency > 1:
+                asyncio.run(self.process_batches_concurrently(batches))
+                continue
 
             # Process each batch
             for batch_index, batch in enumerate(batches):
-                # Print batch information
-                print("\n" + "-"*80)
-                print(f"Processing Batch #{batch_index+1} ({len(batch)} files):")
-                for file_path in batch:
-                    print(f"  - {file_path}")
-                print("-"*80)
-
                 # Analyze the batch
-                result = self.analyze_batch(batch)
-
-                # Update project information
-                self.file_descriptions.update(result.get("file_descriptions", {}))
-
-                # Update module descriptions (folder-specific)
-                module_descriptions = result.get("module_descriptions", {})
-                for folder, description in module_descriptions.items():
-                    if description and description != "No description provided":
-                        self.module_descriptions[folder] = description
-
-                # Update features
-                features = result.get("features", [])
-                for feature in features:
-                    if feature and feature.strip():
-                        self.features.add(feature.strip())
-
-                # Update data models
-                data_models = result.get("data_models", {})
-                for model_name, model_info in data_models.items():
-                    if model_name not in self.data_models:
-                        self.data_models[model_name] = model_info
-                    else:
-                        # Merge relationships
-                        existing_relationships = set(self.data_models[model_name].get("relationships", []))
-                        new_relationships = set(model_info.get("relationships", []))
-                        merged_relationships = list(existing_relationships.union(new_relationships))
-                        
-                        # Merge attributes
-                        existing_attributes = self.data_models[model_name].get("attributes", {})
-                        new_attributes = model_info.get("attributes", {})
-                        existing_attributes.update(new_attributes)
-                        
-                        # Update the model
-                        self.data_models[model_name]["relationships"] = merged_relationships
-                        self.data_models[model_name]["attributes"] = existing_attributes
-                        
-                        # Use the most detailed description
-                        if len(model_info.get("description", "")) > len(self.data_models[model_name].get("description", "")):
-                            self.data_models[model_name]["description"] = model_info["description"]
-
-                # Update dependency graph
-                self.dependency_graph = result.get(
-                    "dependency_graph", self.dependency_graph
-                )
-
-                # Print the module descriptions for this batch
-                print("\n" + "="*80)
-                print("Module Descriptions:")
-                for folder, description in module_descriptions.items():
-                    if description:
-                        print(f"\nModule: {folder}")
-                        print(f"{description}")
-                print("="*80)
-
-                # Display the updated dependency graph
-                print("\nCurrent Dependency Graph:")
-                print("```mermaid")
-                print(self.dependency_graph)
-                print("```\n")
-
-                # Mark files as processed
-                for file in batch:
-                    self.processed_files.add(file)
-
-                # Print progress
-                processed = len(self.processed_files)
-                total = len(self.all_files)
-                print(f"Processed {processed}/{total} files")
-
-        # Generate overall project description
-        self.generate_project_description()
+                stats = new_batch_stats()
+                parts = self.analyze_batch(batch, stats)
+                self.complete_batch(batch_index, batch, parts, stats)
+
+        self.print_prompt_token_summary()
+
+    def build_skeletons(self):
+        """Outline the files to send in skeleton mode, in worker processes."""
+        start = time.monotonic()
+        files = [str(file_path) for file_path in self.all_files]
+        self.skeletons = extract_skeletons(str(self.base_path), files, self.skeleton_min_bytes)
+        self.file_tokens = {}
+        self.reporter.log(f"Outlined {len(self.skeletons)} of {len(files)} files in "
+                          f"{time.monotonic() - start:.1f}s.")
+
+    def print_dry_run(self):
+        """Print the planned batches without sending any request."""
+        if self.mode == "skeleton" or self.dedup or self.batching == "locality":
+            # Outlines, duplicates and imports are found for all files at once
+            self.all_files = list(self.iter_files())
+            if self.mode == "skeleton":
+                self.build_skeletons()
+            if self.dedup:
+                # Duplicates count as processed, so they are not planned
+                self.find_duplicates()
+            if self.batching == "locality":
+                self.build_dependency_graph()
+            self.print_batch_plan(self.iter_remaining_batches())
+            return
+        # Batches are planned while the files are still being discovered
+        self.print_batch_plan(self.iter_batches(self.iter_files()))
+
+    def find_duplicates(self):
+        """Find copied and near-copied files, which are not sent to the LLM.
+
+        Hashing the files here also fills the file hash cache used for
+        caching, checkpoints and the analysis state.
+        """
+        start = time.monotonic()
+        files = [str(file_path) for file_path in self.all_files]
+        fingerprints = fingerprint_files(str(self.base_path), files, self.dedup_min_bytes)
+        for file_path, fingerprint in fingerprints.items():
+            self.file_hashes[Path(file_path)] = fingerprint.content_hash
+        self.duplicates = {
+            Path(file_path): (Path(representative), exact)
+            for file_path, (representative, exact)
+            in find_duplicates(fingerprints, self.dedup_min_bytes).items()
+        }
+        self.processed_files.update(self.duplicates)
+        exact_count = sum(exact for _, exact in self.duplicates.values())
+        self.reporter.log(
+            f"Found {exact_count} identical and {len(self.duplicates) - exact_count} "
+            f"similar files to reuse the analysis of other files for in "
+            f"{time.monotonic() - start:.1f}s."
+        )
+        self.reporter.event("duplicates_found", identical=exact_count,
+                            similar=len(self.duplicates) - exact_count)
+
+    def describe_duplicates(self):
+        """Describe each duplicate file with the description of the file analyzed for it."""
+        for file_path, (representative, exact) in self.duplicates.items():
+            note = (f"Identical to {representative}." if exact
+                    else f"Similar to {representative}, and described from it.")
+            description = self.file_descriptions.get(str(representative))
+            self.file_descriptions[str(file_path)] = (
+                f"{description}\n\n({note})" if description else note
+            )
+
+    def prepare(self):
+        """Run the local stages on the collected files and restore previous results."""
+        self.build_dependency_graph()
+        if self.mode == "skeleton":
+            self.build_skeletons()
+        if self.dedup:
+            self.find_duplicates()
+
+        if self.incremental:
+            state = self.load_state()
+            if state is None:
+                self.reporter.log("No previous analysis found, analyzing all files.")
+            else:
+                self.restore_state(state)
+
+        if self.resume:
+            self.resume_from_checkpoint()
+        else:
+            self.checkpoint.start(self.checkpoint_header())
+        self.writer.start(self.file_descriptions, self.module_descriptions)
+
+    def finish(self):
+        """Describe the duplicates and the project once all batches are merged."""
+        self.describe_duplicates()
+        self.writer.add_files(
+            (str(file_path), self.file_descriptions[str(file_path)])
+            for file_path in sorted(self.duplicates)
+        )
+
+        # Generate overall project description, unless nothing has changed
+        if not self.project_description:
+            self.generate_project_description()
+        self.writer.add_record({"type": "project", "description": self.project_description})
+
+    def interrupt(self) -> str:
+        """Close the checkpoint of a stopped run and tell how much of it is saved."""
+        self.checkpoint.close()
+        self.writer.close({"type": "stopped", "processed_files": len(self.processed_files),
+                           "files": len(self.all_files)})
+        return (f"{len(self.processed_files)}/{len(self.all_files)} files are saved in "
+                f"{self.checkpoint.path}")
+
+    def process_project(self):
+        """Process the entire project in batches."""
+        from openai import APIError
+        # Collect all files
+        self.collect_files()
+        self.prepare()
 
+        try:
+            self.process_batches()
+            self.finish()
+        except (APIError, ReplayMissError, KeyboardInterrupt) as error:
+            reason = str(error) or type(error).__name__
+            self.reporter.error(
+                f"\nAnalysis stopped: {reason}\n{self.interrupt()}, "
+                "run again with --resume to continue."
+            )
+            sys.exit(1)
+        self.complete()
+
+    def complete(self):
+        """Save the results of a finished run and report it."""
         # Print final results
-        print("\n" + "="*80)
-        print("Project Analysis Complete")
-        print("="*80)
-        print("\nDependency Graph:")
-        print("```mermaid")
-        print(self.dependency_graph)
-        print("```")
+        self.reporter.log("\n" + "="*80)
+        self.reporter.log("Project Analysis Complete")
+        self.reporter.log("="*80)
+        self.reporter.log(f"\nDependency graph: {len(self.dependency_graph)} nodes, "
+                          f"{self.dependency_graph.edge_count} edges")
 
         # Save results to file
         self.save_results()
+        self.checkpoint.remove()
+        self.writer.close({"type": "completed", "files": len(self.all_files)})
+        self.reporter.run_completed(
+            files=len(self.all_files), graph_nodes=len(self.dependency_graph),
+            graph_edges=self.dependency_graph.edge_count
+        )
 
-    def save_results(self):
-        """Save analysis results to a single markdown file."""
-        # Create the markdown content
-
-        # Add project description
-        markdown_content = self.project_description
-        markdown_content += "\n\n"
+    def overview_section(self) -> Iterator[str]:
+        yield self.project_description
+        yield "\n\n"
 
-        # Add module descriptions
-        markdown_content += "## Module Descriptions\n\n"
+    def modules_section(self) -> Iterator[str]:
+        yield "## Module Descriptions\n\n"
         for folder, description in sorted(self.module_descriptions.items()):
-            markdown_content += f"### {folder}\n\n"
-            markdown_content += f"{description}\n\n"
-
-        # Add dependency graph
-        markdown_content += "## Project Dependency Graph\n\n"
-        if not self.dependency_graph.startswith("```mermaid"):
-            markdown_content += "```mermaid\n"
-            markdown_content += self.dependency_graph
-            markdown_content += "\n```\n\n"
-        else:
-            markdown_content += self.dependency_graph + "\n\n"
-
-        # Add file descriptions
-        markdown_content += "## File Descriptions\n\n"
+            yield f"### {folder}\n\n{description}\n\n"
+
+    def dependency_graph_section(self) -> Iterator[str]:
+        # Collapsed to modules if it is too large to read
+        yield "## Project Dependency Graph\n\n"
+        yield "```mermaid\n"
+        yield self.dependency_graph.to_mermaid(MAX_MERMAID_NODES)
+        yield "```\n\n"
+        if len(self.dependency_graph) > MAX_MERMAID_NODES:
+            yield (f"The graph of {len(self.dependency_graph)} nodes is shown "
+                   "collapsed to one node per module.\n\n")
+
+        cycles = self.dependency_graph.find_cycles()
+        if cycles:
+            yield "### Dependency Cycles\n\n"
+            for cycle in cycles:
+                yield f"- {', '.join(cycle)}\n"
+            yield "\n"
+
+    def files_section(self) -> Iterator[str]:
+        yield "## File Descriptions\n\n"
         for file_path, description in sorted(self.file_descriptions.items()):
-            markdown_content += f"### {file_path}\n\n"
-            markdown_content += f"{description}\n\n"
+            yield file_section(file_path, description)
+
+    def save_results(self):
+        """Save the markdown document, assembled from its sections, and the analysis state."""
+        sections = {
+            "overview": self.overview_section(),
+            "modules": self.modules_section(),
+            "dependency_graph": self.dependency_graph_section(),
+            # Replaces the sections streamed during the run, now in path order
+            FILES_SECTION: self.files_section(),
+        }
+        for name, chunks in sections.items():
+            self.writer.write_section(name, chunks)
+        self.writer.assemble(list(sections))
+
+        with open(self.state_file, "w", encoding="utf-8") as f:
+            json.dump(self.state_dict(), f, indent=2)
+
+        self.reporter.log(f"\nResults saved to {self.output_file} and {self.state_file}")
+
+
+async def analyze_batches_concurrently(work: List[Tuple[ProjectAnalyzer, Iterable[List[BatchItem]]]],
+                                       concurrency: int,
+                                       controller: Optional[AdaptiveController] = None):
+    """Analyze the batches of one or more projects with a bounded pool of workers.
+
+    Workers take the batches of the projects in turn, so each project gets
+    an equal share of the workers and of the rate limit they share, rather
+    than waiting for the projects before it. Results are merged in batch
+    order per project, so the output is the same as for a serial run
+    regardless of which request finishes first. With a controller, up to
+    concurrency workers run, as many at a time as it allows, and each takes
+    its batch only once it may send it, so the batch is planned with the
+    latest budget.
+    """
+    queue = FairQueue()
+    for analyzer, batches in work:
+        queue.add(analyzer, enumerate(batches))
+    results = {analyzer: {} for analyzer, _ in work}
+    planned = {analyzer: {} for analyzer, _ in work}
+    next_to_merge = {analyzer: 0 for analyzer, _ in work}
+    # Set whenever a result arrives or a worker ends, to let the merge loop catch up
+    result_ready = asyncio.Event()
+
+    async def analyze_next() -> bool:
+        try:
+            analyzer, (batch_index, batch) = queue.pop()
+        except IndexError:
+            return False
+        planned[analyzer][batch_index] = batch
+        stats = new_batch_stats()
+        parts = await analyzer.analyze_batch_async(batch, stats)
+        results[analyzer][batch_index] = (parts, stats)
+        result_ready.set()
+        return True
+
+    async def worker():
+        try:
+            while True:
+                if controller is None:
+                    if not await analyze_next():
+                        return
+                    continue
+                await controller.acquire()
+                try:
+                    if not await analyze_next():
+                        return
+                finally:
+                    await controller.release()
+        finally:
+            result_ready.set()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        while True:
+            await result_ready.wait()
+            result_ready.clear()
+            # Re-raise the first worker failure instead of waiting forever
+            for task in workers:
+                if task.done() and task.exception():
+                    raise task.exception()
+            for analyzer, _ in work:
+                while next_to_merge[analyzer] in results[analyzer]:
+                    batch_index = next_to_merge[analyzer]
+                    parts, stats = results[analyzer].pop(batch_index)
+                    analyzer.complete_batch(
+                        batch_index, planned[analyzer].pop(batch_index), parts, stats
+                    )
+                    next_to_merge[analyzer] += 1
+            # Every result is stored before its worker ends
+            if all(task.done() for task in workers):
+                break
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        backends = {id(analyzer.backend): analyzer.backend for analyzer, _ in work}
+        for backend in backends.values():
+            await backend.aclose()
+
+
+class WorkspaceAnalyzer:
+    """Analyzes the repositories of a workspace together.
+
+    The batches of all repositories go through one pool of workers and one
+    rate limiter, taking turns between repositories. Each repository gets
+    its results in its own output folder, and a summary of the workspace is
+    written next to them.
+    """
+
+    def __init__(self, analyzers: Dict[str, ProjectAnalyzer], output_dir: str,
+                 concurrency: int = 1, assume_yes: bool = False,
+                 reporter: Optional[ProgressReporter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 controller: Optional[AdaptiveController] = None):
+        # Analyzers by repository name
+        self.analyzers = analyzers
+        self.output_dir = output_dir
+        self.concurrency = max(1, concurrency)
+        # Shared by the analyzers, which report the requests they observe to it
+        self.controller = controller
+        self.assume_yes = assume_yes
+        self.reporter = reporter or ProgressReporter()
+        self.cache = cache
+        self.max_retries = max_retries
+        self.summary = ""
+
+    def process_batches(self):
+        """Analyze the remaining batches of all repositories with a shared pool of workers."""
+        work = []
+        batch_count = 0
+        for analyzer in self.analyzers.values():
+            batches, analyzer_batch_count = analyzer.plan_remaining_batches()
+            batch_count += analyzer_batch_count
+            analyzer.reporter.run_started(
+                len(analyzer.all_files), len(analyzer.all_files) - len(analyzer.processed_files),
+                analyzer_batch_count
+            )
+            work.append((analyzer, batches))
+        self.reporter.log(f"Analyzing {batch_count} batches of {len(work)} repositories "
+                          f"with {self.concurrency} workers...")
+        asyncio.run(analyze_batches_concurrently(work, self.concurrency, self.controller))
+        for analyzer in self.analyzers.values():
+            analyzer.print_prompt_token_summary()
+
+    def generate_workspace_summary(self) -> str:
+        """Summarize the workspace from the descriptions of its repositories."""
+        self.reporter.log("\nGenerating the workspace summary...")
+        system_prompt = """
+        You are a code analysis assistant. Given the descriptions of the
+        repositories of a workspace, describe the workspace as a whole: what the
+        repositories are for, how they relate to and depend on each other, and the
+        technologies they share. Format your description as markdown.
+        """
+        # Every repository gets an equal share of the prompt
+        budget = max(300, MAX_SUMMARY_INPUT_TOKENS // len(self.analyzers))
+        user_prompt = "\n\n".join(
+            f"## Repository: {name}\n\n" + take_within_budget(
+                analyzer.project_description.splitlines(), budget, estimate_tokens
+            )
+            for name, analyzer in self.analyzers.items()
+        )
+        key = batch_cache_key(
+            [("workspace", hash_bytes(user_prompt.encode("utf-8")))],
+            PROMPT_VERSION, MODEL_NAME, os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME") or ""
+        )
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            self.summary = cached["summary"]
+            return self.summary
 
-        # Save to file
-        # Create output directory if it doesn't exist
-        os.makedirs("out", exist_ok=True)
-        output_file = "out/project_analysis.md"
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(markdown_content)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        # Any analyzer sends the request, they share the backend and rate limiter
+        analyzer = next(iter(self.analyzers.values()))
+        stats = new_batch_stats()
+        start = time.monotonic()
+        completion = call_with_retries(
+            lambda: analyzer.backend.complete(messages, MAX_COMPLETION_TOKENS),
+            self.max_retries, analyzer.retry_callback(stats)
+        )
+        stats["latency"] = time.monotonic() - start
+        stats["requests"] = 1
+        analyzer.record_usage(messages, completion, stats)
+        self.reporter.add_request(stats)
+        self.reporter.event(
+            "workspace_summary", latency=round(stats["latency"], 3),
+            prompt_tokens=stats["prompt_tokens"],
+            completion_tokens=stats["completion_tokens"], retries=stats["retries"]
+        )
+        self.summary = completion.content.strip()
+        if self.cache is not None and self.summary:
+            self.cache.put(key, {"summary": self.summary})
+        return self.summary
+
+    def save_summary(self):
+        """Save the workspace summary with links to the results of each repository."""
+        content = "# Workspace Overview\n\n" + self.summary + "\n\n## Repositories\n\n"
+        content += "| Repository | Path | Files | Analysis |\n|---|---|---|---|\n"
+        for name, analyzer in self.analyzers.items():
+            link = os.path.relpath(analyzer.output_file, self.output_dir).replace(os.sep, "/")
+            content += (f"| {name} | {analyzer.base_path} | {len(analyzer.all_files)} "
+                        f"| [{link}]({link}) |\n")
+        os.makedirs(self.output_dir, exist_ok=True)
+        summary_file = os.path.join(self.output_dir, WORKSPACE_SUMMARY_FILE_NAME)
+        with open(summary_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        self.reporter.log(f"\nWorkspace summary saved to {summary_file}")
+
+    def process_workspace(self):
+        """Analyze every repository and summarize the workspace."""
+        from openai import APIError
+        for analyzer in self.analyzers.values():
+            analyzer.collect_files()
+        file_count = sum(len(analyzer.all_files) for analyzer in self.analyzers.values())
+        self.reporter.log(f"Found {file_count} files in {len(self.analyzers)} repositories.")
+        if not self.assume_yes:
+            ask_confirmation(
+                f"Do you want to proceed with the analysis of {file_count} files "
+                f"in {len(self.analyzers)} repositories?", self.reporter
+            )
+        for analyzer in self.analyzers.values():
+            analyzer.prepare()
 
-        print(f"\nResults saved to {output_file}")
+        try:
+            self.process_batches()
+            for analyzer in self.analyzers.values():
+                analyzer.finish()
+            self.generate_workspace_summary()
+        except (APIError, ReplayMissError, KeyboardInterrupt) as error:
+            reason = str(error) or type(error).__name__
+            saved = "\n".join(
+                f"{name}: {analyzer.interrupt()}" for name, analyzer in self.analyzers.items()
+            )
+            self.reporter.error(f"\nAnalysis stopped: {reason}\n{saved}\n"
+                                "Run again with --resume to continue.")
+            sys.exit(1)
+
+        for analyzer in self.analyzers.values():
+            analyzer.complete()
+            self.reporter.add_totals(analyzer.reporter.totals)
+        self.save_summary()
+        self.reporter.run_completed(repositories=len(self.analyzers), files=file_count)
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Analyze a project's structure using LLM"
     )
-    parser.add_argument("path", help="Path to the project directory")
+    parser.add_argument(
+        "path",
+        nargs="*",
+        help="Path to the project directory; several paths are analyzed as a workspace"
+    )
     parser.add_argument(
         "--ext",
-        required=True,
-        help="File extensions to include (e.g., ts,js,noext). Use 'noext' to include files without extension"
+        help="File extensions to include (e.g., ts,js,noext). Use 'noext' to include files "
+             "without extension. Required unless every workspace repository sets its own"
+    )
+    parser.add_argument(
+        "--workspace",
+        metavar="MANIFEST",
+        help="Analyze the repositories listed in this JSON or text manifest together"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=DEFAULT_OUTPUT_DIR,
+        help="Folder of the results, the analysis state and the checkpoint, with a "
+             f"subfolder per repository for a workspace (default: {DEFAULT_OUTPUT_DIR})"
     )
     parser.add_argument(
         "--batch-size",
         type=int,
-        default=15,
-        help="Number of files to process in each batch"
+        default=40,
+        help="Maximum number of files to process in each batch"
+    )
+    parser.add_argument(
+        "--max-prompt-tokens",
+        type=int,
+        default=32000,
+        help="Estimated prompt tokens each batch is packed up to"
+    )
+    parser.add_argument(
+        "--max-file-bytes",
+        type=int,
+        default=DEFAULT_MAX_FILE_BYTES,
+        help="Files larger than this are sent as their head and tail instead of "
+             f"in parts (default: {DEFAULT_MAX_FILE_BYTES})"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["full", "skeleton"],
+        default="full",
+        help="Send the full content of files, or outlines of their imports, declarations, "
+             "fields and docstrings (default: full)"
+    )
+    parser.add_argument(
+        "--batching",
+        choices=BATCHING_STRATEGIES,
+        default="folder",
+        help="Batch the files of a folder together, or files that import each other, "
+             "grouped under the batch budget (default: folder)"
+    )
+    parser.add_argument(
+        "--skeleton-min-bytes",
+        type=int,
+        default=DEFAULT_SKELETON_MIN_BYTES,
+        help="In skeleton mode, send smaller files in full "
+             f"(default: {DEFAULT_SKELETON_MIN_BYTES})"
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Analyze every file, instead of reusing the analysis of a file for its "
+             "identical and near-identical copies"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the planned batches and their estimated tokens without analyzing them "
+             "or using the network"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of batches to analyze in parallel"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        help="Maximum requests per minute sent to the deployment (with --concurrency)"
+    )
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        help="Maximum tokens per minute sent to the deployment (with --concurrency)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-analyze only files changed since the previous analysis of the project"
+    )
+    parser.add_argument(
+        "--no-git",
+        action="store_true",
+        help="Walk the folders instead of listing files with git ls-files"
+    )
+    parser.add_argument(
+        "-y", "--yes",
+        action="store_true",
+        help="Proceed without asking for confirmation"
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        help="Exit with an error instead of analyzing more files than this"
+    )
+    parser.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        help="Only print errors"
+    )
+    parser.add_argument(
+        "--events",
+        help="Append progress events as JSON lines to this file, '-' for stdout"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Continue an interrupted run from {CHECKPOINT_FILE_NAME} in the output folder"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help="Retries of a failed LLM request, with exponential backoff, "
+             f"before the run stops (default: {DEFAULT_MAX_RETRIES})"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKEND_NAMES,
+        default="azure",
+        help="Send requests to the Azure OpenAI deployment, answer them with a local "
+             "fake, or replay the responses recorded in --responses (default: azure)"
+    )
+    parser.add_argument(
+        "--responses",
+        help="JSON-lines file the responses are recorded to, or replayed from "
+             "with --backend replay"
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt the requests in flight, up to --concurrency, and the prompt tokens of "
+             "batches, between --min-prompt-tokens and --max-prompt-tokens, to the observed "
+             "latency, rate limits and cut-off responses"
+    )
+    parser.add_argument(
+        "--min-prompt-tokens",
+        type=int,
+        default=MIN_PROMPT_TOKENS,
+        help=f"Smallest prompt budget --adaptive shrinks batches to (default: {MIN_PROMPT_TOKENS})"
+    )
+    parser.add_argument(
+        "--json-mode",
+        action="store_true",
+        help="Ask the deployment to answer batch analyses with a JSON object "
+             "(response_format json_object), if it supports JSON mode"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join("out", "cache"),
+        help="Directory of the cache of batch analysis results"
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=512,
+        help="Maximum size of the cache before least recently used results are evicted"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Analyze every batch with the LLM instead of reusing cached results"
     )
     args = parser.parse_args()
 
-    # Convert extensions to glob patterns
-    extensions = args.ext.split(',')
-    include_patterns = []
-    for ext in extensions:
-        ext = ext.strip()
-        if ext.lower() == 'noext':
-            # Match files with no extension
-            include_patterns.append('[!.]*')  # Matches any filename not containing a dot
+    if args.workspace:
+        try:
+            repositories = load_manifest(args.workspace)
+        except (OSError, ValueError) as error:
+            parser.error(f"cannot read the workspace manifest: {error}")
+        repositories += workspace_repositories([(None, path, None) for path in args.path])
+    elif args.path:
+        repositories = workspace_repositories([(None, path, None) for path in args.path])
+    else:
+        parser.error("a project path or --workspace is required")
+    if not args.ext and any(repository.ext is None for repository in repositories):
+        parser.error("--ext is required for repositories without extensions in the manifest")
+    if args.backend == "replay" and not args.responses:
+        parser.error("--backend replay requires --responses")
+    workspace = args.workspace is not None or len(repositories) > 1
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+    # A dry run sends no requests and does not record any; a workspace shares one backend
+    backend = None
+    if not args.dry_run:
+        try:
+            backend = create_backend(args.backend, MODEL_NAME, args.responses)
+        except (OSError, ValueError) as error:
+            action = "read" if args.backend == "replay" else "record"
+            parser.error(f"cannot {action} the responses: {error}")
+    # One controller for the deployment, as the backend; a dry run plans with the largest budget
+    controller = None
+    if args.adaptive and not args.dry_run:
+        controller = AdaptiveController(args.concurrency, args.max_prompt_tokens,
+                                        min_prompt_tokens=args.min_prompt_tokens)
+
+    def create_analyzer(repository: Repository) -> ProjectAnalyzer:
+        return ProjectAnalyzer(
+            repository.path, include_patterns(repository.ext or args.ext), args.batch_size,
+            max_prompt_tokens=args.max_prompt_tokens,
+            max_file_bytes=args.max_file_bytes,
+            mode=args.mode,
+            batching=args.batching,
+            skeleton_min_bytes=args.skeleton_min_bytes,
+            dedup=not args.no_dedup,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            cache=cache,
+            incremental=args.incremental,
+            use_git=not args.no_git,
+            # A workspace asks once for all its repositories
+            assume_yes=args.yes or workspace,
+            max_files=args.max_files,
+            reporter=ProgressReporter(args.quiet, args.events,
+                                      repository.name if workspace else None),
+            resume=args.resume,
+            max_retries=args.max_retries,
+            backend=backend,
+            json_mode=args.json_mode,
+            controller=controller,
+            output_dir=(os.path.join(args.output_dir, repository.name) if workspace
+                        else args.output_dir),
+        )
+
+    analyzers = {repository.name: create_analyzer(repository) for repository in repositories}
+    if args.dry_run:
+        # Planning works offline: no credentials, no client and no tokenizer download
+        use_byte_token_estimates()
+        for name, analyzer in analyzers.items():
+            if workspace:
+                print(f"\n## {name}")
+            analyzer.print_dry_run()
+        return
+
+    try:
+        if workspace:
+            WorkspaceAnalyzer(
+                analyzers, args.output_dir, concurrency=args.concurrency, assume_yes=args.yes,
+                reporter=ProgressReporter(args.quiet, args.events), cache=cache,
+                max_retries=args.max_retries, controller=controller,
+            ).process_workspace()
         else:
-            include_patterns.append(f'*.{ext}')
-    
-    analyzer = ProjectAnalyzer(args.path, ','.join(include_patterns), args.batch_size)
-    analyzer.process_project()
+            analyzers[repositories[0].name].process_project()
+    finally:
+        if backend is not None:
+            backend.close()
 
 
 if __name__ == "__main__":
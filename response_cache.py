@@ -0,0 +1,101 @@
+"""Persistent, content-addressed cache of batch analysis results."""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the hex SHA-256 digest of some bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def batch_cache_key(file_hashes: Iterable[Tuple[str, str]], prompt_version: str,
+                    model: str, deployment: str) -> str:
+    """Build a cache key from (path, content hash) pairs and the LLM setup.
+
+    The key does not depend on the order of the files in the batch.
+    """
+    key = hashlib.sha256()
+    for part in (prompt_version, model, deployment):
+        key.update(part.encode("utf-8"))
+        key.update(b"\0")
+    for path, content_hash in sorted(file_hashes):
+        key.update(path.encode("utf-8"))
+        key.update(b"\0")
+        key.update(content_hash.encode("ascii"))
+        key.update(b"\0")
+    return key.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed cache with least-recently-used eviction by total size."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = Path(cache_dir) / "responses.sqlite"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used"
+            " ON responses (last_used)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for a key, or None on a miss."""
+        row = self._db.execute(
+            "SELECT value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._db.execute(
+            "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        self._db.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict):
+        """Store a result and evict the least recently used entries if needed."""
+        value = json.dumps(result)
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, last_used)"
+            " VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time())
+        )
+        self._evict()
+        self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        )
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def close(self):
+        self._db.close()
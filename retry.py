@@ -0,0 +1,97 @@
+"""Retries of failed LLM requests with jittered exponential backoff."""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Timeouts, conflicts, rate limits and server errors are worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+
+def is_retryable(error: Exception) -> bool:
+    """Return True if a request that raised this error may succeed when sent again."""
+    # Imported here as it takes a while, and only failed requests need it
+    import openai
+    if isinstance(error, openai.APIConnectionError):
+        # Includes timeouts
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Return the seconds to wait that the server asked for, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    # Retry-After may also be an HTTP date
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int, error: Exception) -> float:
+    """Seconds to wait before the given retry (0 for the first).
+
+    Uses full jitter, so clients that failed together do not retry together.
+    A Retry-After from the server is honored, with jitter added on top.
+    """
+    server_delay = retry_after(error)
+    if server_delay is not None:
+        return server_delay + random.uniform(0, BASE_DELAY)
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def call_with_retries(call: Callable[[], T], max_retries: int,
+                      on_retry: Optional[Callable[[Exception, float], None]] = None) -> T:
+    """Call a function, retrying retryable errors up to max_retries times."""
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as error:
+            if attempt >= max_retries or not is_retryable(error):
+                raise
+            delay = retry_delay(attempt, error)
+            if on_retry is not None:
+                on_retry(error, delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+async def call_with_retries_async(call: Callable[[], Awaitable[T]], max_retries: int,
+                                  on_retry: Optional[Callable[[Exception, float], None]] = None) -> T:
+    """Await a coroutine function, retrying retryable errors up to max_retries times."""
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as error:
+            if attempt >= max_retries or not is_retryable(error):
+                raise
+            delay = retry_delay(attempt, error)
+            if on_retry is not None:
+                on_retry(error, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
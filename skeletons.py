@@ -0,0 +1,213 @@
+"""Local extraction of file outlines: imports, declarations, fields and docstrings.
+
+In skeleton mode these outlines are sent to the LLM instead of the full source
+of larger files, which is usually enough to describe their purpose, features
+and data models.
+"""
+import ast
+import os
+import re
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Tuple
+
+from file_content import classify_sample, sample_content
+from import_extractors import MAX_AST_BYTES, PYTHON_EXTENSIONS, map_file_jobs
+
+BRACE_EXTENSIONS = {
+    ".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".mts", ".cts", ".java", ".go",
+    ".cs", ".kt", ".kts", ".swift", ".rs", ".scala", ".php", ".c", ".h", ".cc",
+    ".cpp", ".hpp", ".dart",
+}
+# Larger files are outlined from their start only
+MAX_SOURCE_BYTES = 4 * 1024 * 1024
+# Outlines longer than this share of the file are not worth sending instead of it
+MAX_SKELETON_RATIO = 0.8
+MAX_LINE_LENGTH = 160
+MAX_DOCSTRING_LENGTH = 300
+
+IMPORT_PATTERN = re.compile(
+    r"^\s*(?:import|from|export\s+\*|export\s+\{[^}]*\}\s+from|#include|using|package|"
+    r"require|use|namespace)\b"
+)
+DECLARATION_PATTERN = re.compile(
+    r"^\s*(?:@\w+|(?:export|default|public|private|protected|internal|static|abstract|"
+    r"async|pub|final|override|sealed|data|open|declare|const|let|var|readonly|virtual|"
+    r"synchronized|partial)\s+)*"
+    r"(?:def|class|function|interface|type|struct|enum|func|fn|trait|impl|module|record|"
+    r"object|namespace|extension|protocol)\b"
+)
+# Methods and fields with access modifiers, as in Java, C# or TypeScript classes
+MEMBER_PATTERN = re.compile(
+    r"^\s*(?:@\w+(?:\([^)]*\))?\s+)*(?:(?:public|private|protected|internal|static|final|"
+    r"abstract|readonly|override|virtual|async|synchronized|get|set)\s+)+[^;{=]*[\w)>\]]\s*"
+    r"(?:[;{=(]|$)"
+)
+# Exported constants and arrow functions, as in JavaScript modules
+EXPORT_PATTERN = re.compile(r"^\s*export\s+(?:default\s+)?(?:const|let|var)\s+\w+")
+ANNOTATION_PATTERN = re.compile(r"^\s*@\w+")
+# Constructors and typed class properties without modifiers, as in TypeScript
+PROPERTY_PATTERN = re.compile(
+    r"^\s+(?:constructor\s*\(|\w+\??\s*:\s*[^=;(,]+(?:=[^;]*)?;\s*$)"
+)
+# Import blocks kept in full, as in Go
+IMPORT_BLOCK_PATTERN = re.compile(r"^\s*import\s*\(\s*$")
+# Declarations whose body lists fields, kept in full
+TYPE_BODY_PATTERN = re.compile(r"\b(?:struct|interface|enum|record)\b[^{;]*\{\s*$")
+DOC_COMMENT_PATTERN = re.compile(r"^\s*(?:/\*\*|///|//!)")
+
+
+def shorten(line: str, max_length: int = MAX_LINE_LENGTH) -> str:
+    line = line.rstrip()
+    return line if len(line) <= max_length else line[:max_length - 3] + "..."
+
+
+def first_paragraph(docstring: str) -> str:
+    paragraph = " ".join(docstring.strip().split("\n\n")[0].split())
+    return shorten(paragraph, MAX_DOCSTRING_LENGTH)
+
+
+def _python_docstring(node, indent: str, lines: List[str]):
+    docstring = ast.get_docstring(node)
+    if docstring:
+        lines.append(f'{indent}"""{first_paragraph(docstring)}"""')
+
+
+def _python_function(node, indent: str, lines: List[str]):
+    for decorator in node.decorator_list:
+        lines.append(shorten(f"{indent}@{ast.unparse(decorator)}"))
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    lines.append(shorten(f"{indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}:"))
+    _python_docstring(node, indent + "    ", lines)
+    lines.append(f"{indent}    ...")
+
+
+def _python_body(body: List[ast.stmt], indent: str, lines: List[str], in_class: bool):
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(shorten(indent + ast.unparse(node)))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            _python_function(node, indent, lines)
+        elif isinstance(node, ast.ClassDef):
+            for decorator in node.decorator_list:
+                lines.append(shorten(f"{indent}@{ast.unparse(decorator)}"))
+            bases = [ast.unparse(base) for base in node.bases + node.keywords]
+            lines.append(shorten(f"{indent}class {node.name}"
+                                 + (f"({', '.join(bases)})" if bases else "") + ":"))
+            _python_docstring(node, indent + "    ", lines)
+            _python_body(node.body, indent + "    ", lines, True)
+        elif isinstance(node, ast.AnnAssign):
+            # Class fields and annotated module variables
+            lines.append(shorten(indent + ast.unparse(node)))
+        elif isinstance(node, ast.Assign):
+            names = [target.id for target in node.targets if isinstance(target, ast.Name)]
+            # Class fields and module constants
+            if names and (in_class or all(name.isupper() for name in names)):
+                lines.append(shorten(indent + ast.unparse(node)))
+        elif isinstance(node, (ast.If, ast.Try)) and not in_class:
+            # Imports under "if TYPE_CHECKING:" or "try:"
+            nested = []
+            _python_body(node.body, indent, nested, in_class)
+            lines.extend(line for line in nested if IMPORT_PATTERN.match(line))
+
+
+def python_skeleton(content: str) -> Optional[str]:
+    """Outline a Python module, or return None if it cannot be parsed."""
+    if len(content) > MAX_AST_BYTES:
+        return None
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    lines = []
+    _python_docstring(tree, "", lines)
+    _python_body(tree.body, "", lines, False)
+    return "\n".join(lines)
+
+
+def brace_skeleton(content: str) -> str:
+    """Outline a file of a C-like language line by line, without parsing it."""
+    lines = []
+    # Depth of braces inside a struct, interface, enum or record body being kept
+    type_body_depth = 0
+    in_import_block = False
+    in_doc_comment = False
+    for line in content.splitlines():
+        stripped = line.strip()
+        if in_import_block:
+            lines.append(shorten(line))
+            in_import_block = stripped != ")"
+            continue
+        if IMPORT_BLOCK_PATTERN.match(line):
+            lines.append(shorten(line))
+            in_import_block = True
+            continue
+        if type_body_depth:
+            lines.append(shorten(line))
+            type_body_depth += line.count("{") - line.count("}")
+            continue
+        if in_doc_comment:
+            # Keep the first line of text of a doc comment
+            text = stripped.lstrip("*").strip()
+            if text and not text.startswith("@"):
+                lines.append(shorten(line))
+                in_doc_comment = False
+            if "*/" in stripped:
+                in_doc_comment = False
+            continue
+        if DOC_COMMENT_PATTERN.match(line):
+            text = stripped.lstrip("/*!").rstrip("*/").strip()
+            if text:
+                lines.append(shorten(line))
+            else:
+                in_doc_comment = "*/" not in stripped[3:]
+            continue
+        if (IMPORT_PATTERN.match(line) or DECLARATION_PATTERN.match(line)
+                or MEMBER_PATTERN.match(line) or EXPORT_PATTERN.match(line)
+                or ANNOTATION_PATTERN.match(line) or PROPERTY_PATTERN.match(line)):
+            lines.append(shorten(line))
+            if TYPE_BODY_PATTERN.search(line):
+                type_body_depth = line.count("{") - line.count("}")
+    return "\n".join(lines)
+
+
+def extract_skeleton(path: str, content: str) -> Optional[str]:
+    """Outline a file based on its language, None if the language is not supported."""
+    extension = PurePosixPath(path).suffix.lower()
+    if extension in PYTHON_EXTENSIONS:
+        return python_skeleton(content)
+    if extension in BRACE_EXTENSIONS:
+        return brace_skeleton(content)
+    return None
+
+
+def _extract_file_skeleton(job: Tuple[str, str, int]) -> Optional[str]:
+    """Read a file and outline it; runs in a worker process.
+
+    Returns None when the full content should be sent instead: for small,
+    binary, minified or generated files, unsupported languages, and outlines
+    that would not save much.
+    """
+    base_path, path, min_bytes = job
+    try:
+        with open(os.path.join(base_path, path), "rb") as f:
+            data = f.read(MAX_SOURCE_BYTES)
+    except OSError:
+        return None
+    if len(data) < min_bytes or classify_sample(sample_content(data)) != "text":
+        return None
+    skeleton = extract_skeleton(path, data.decode("utf-8", errors="replace"))
+    if skeleton is None or len(skeleton) > len(data) * MAX_SKELETON_RATIO:
+        return None
+    return skeleton
+
+
+def extract_skeletons(base_path: str, files: List[str], min_bytes: int,
+                      workers: Optional[int] = None) -> Dict[str, str]:
+    """Outline the files of at least min_bytes, using a process pool for large projects.
+
+    Files that are sent in full are left out of the result.
+    """
+    jobs = [(base_path, path, min_bytes) for path in files]
+    results = map_file_jobs(_extract_file_skeleton, jobs, workers)
+    return {path: skeleton for path, skeleton in zip(files, results) if skeleton is not None}
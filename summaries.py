@@ -0,0 +1,74 @@
+"""Folder tree and text packing helpers for the hierarchical project summary."""
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Iterable, List
+
+# Folder of the files at the top of the project
+ROOT_FOLDER = "."
+
+
+def parent_folder(folder: str) -> str:
+    """Return the parent of a folder relative to the project root."""
+    return str(PurePosixPath(folder).parent)
+
+
+def build_folder_tree(folders: Iterable[str]) -> Dict[str, List[str]]:
+    """Map every folder, including the ancestors of the given ones, to its sorted subfolders."""
+    children = {ROOT_FOLDER: set()}
+    for folder in folders:
+        children.setdefault(folder, set())
+        # Link the folder and its ancestors up to the first one already linked
+        while folder != ROOT_FOLDER:
+            parent = parent_folder(folder)
+            linked = parent in children and folder in children[parent]
+            children.setdefault(parent, set()).add(folder)
+            if linked:
+                break
+            folder = parent
+    return {folder: sorted(subfolders) for folder, subfolders in children.items()}
+
+
+def folder_depth(children: Dict[str, List[str]], folder: str = ROOT_FOLDER) -> int:
+    """Return the number of folder levels below a folder, including it."""
+    depth = 1
+    stack = [(folder, 1)]
+    while stack:
+        folder, level = stack.pop()
+        depth = max(depth, level)
+        stack.extend((child, level + 1) for child in children.get(folder, []))
+    return depth
+
+
+def pack_texts(texts: List[str], max_tokens: int,
+               estimate_tokens: Callable[[str], int]) -> List[List[str]]:
+    """Split texts, in order, into groups of at most max_tokens each.
+
+    A text larger than max_tokens gets a group of its own.
+    """
+    groups = []
+    group = []
+    group_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if group and group_tokens + tokens > max_tokens:
+            groups.append(group)
+            group = []
+            group_tokens = 0
+        group.append(text)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+def take_within_budget(lines: List[str], max_tokens: int,
+                       estimate_tokens: Callable[[str], int]) -> str:
+    """Join lines up to a token budget, noting how many were left out."""
+    taken = []
+    tokens = 0
+    for line in lines:
+        tokens += estimate_tokens(line)
+        if tokens > max_tokens:
+            taken.append(f"... and {len(lines) - len(taken)} more")
+            break
+        taken.append(line)
+    return "\n".join(taken)
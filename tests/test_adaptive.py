@@ -0,0 +1,18 @@
+from adaptive import AdaptiveController
+
+
+def test_failures_before_the_first_success_decrease_once():
+    controller = AdaptiveController(16, 32000)
+    assert controller.concurrency == 8
+    for _ in range(5):
+        controller.record_throttling()
+        controller.record_truncation()
+    assert controller.concurrency == 4
+    assert controller.prompt_tokens == 16000
+
+
+def test_failures_after_the_cooldown_decrease_again():
+    controller = AdaptiveController(16, 32000, initial_cooldown=0.0)
+    controller.record_throttling()
+    controller.record_throttling()
+    assert controller.concurrency == 2
@@ -0,0 +1,43 @@
+from checkpoint import Checkpoint
+
+
+def test_resume_after_a_partial_write_drops_the_torn_record(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.start({"version": 1})
+    checkpoint.append({"batch": 1})
+    checkpoint.append({"batch": 2})
+    checkpoint.close()
+    # A crash in the middle of writing the third record
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"batch": 3, "res')
+
+    header, records = Checkpoint(str(path)).load()
+    assert header == {"version": 1}
+    assert records == [{"batch": 1}, {"batch": 2}]
+
+    # The torn line is truncated, so appending after resuming keeps every line valid
+    checkpoint = Checkpoint(str(path))
+    checkpoint.open()
+    checkpoint.append({"batch": 3})
+    checkpoint.close()
+    assert Checkpoint(str(path)).load() == (
+        {"version": 1}, [{"batch": 1}, {"batch": 2}, {"batch": 3}]
+    )
+
+
+def test_missing_or_empty_checkpoint_has_no_header(tmp_path):
+    assert Checkpoint(str(tmp_path / "missing.jsonl")).load() == (None, [])
+    path = tmp_path / "torn_header.jsonl"
+    path.write_text('{"vers')
+    assert Checkpoint(str(path)).load() == (None, [])
+
+
+def test_start_replaces_a_previous_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.start({"run": 1})
+    checkpoint.append({"batch": 1})
+    checkpoint.start({"run": 2})
+    checkpoint.close()
+    assert Checkpoint(str(path)).load() == ({"run": 2}, [])
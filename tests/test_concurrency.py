@@ -0,0 +1,94 @@
+import asyncio
+
+import project_analyzer
+from llm_backends import FakeBackend
+from progress import ProgressReporter
+from project_analyzer import ProjectAnalyzer, RateLimiter
+
+
+def test_concurrent_results_are_merged_in_batch_order(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    for name in "abcde":
+        (project / f"{name}.py").write_text(f"{name.upper()} = 1\n")
+    analyzer = ProjectAnalyzer(
+        str(project), "*.py", batch_size=1, concurrency=5, assume_yes=True,
+        reporter=ProgressReporter(quiet=True), backend=FakeBackend(),
+        output_dir=str(tmp_path / "out")
+    )
+    analyzer.collect_files()
+    analyzer.prepare()
+
+    finished, merged = [], []
+    analyze_batch_async = analyzer.analyze_batch_async
+    complete_batch = analyzer.complete_batch
+
+    async def slow_first_batches(batch, stats):
+        # The first batches take longest, so the requests finish in reverse order
+        await asyncio.sleep(0.01 * (ord("e") - ord(batch[0].name[0])))
+        parts = await analyze_batch_async(batch, stats)
+        finished.append(batch[0].name)
+        return parts
+
+    def record_merge(batch_index, batch, parts, stats):
+        merged.append((batch_index, batch[0].name))
+        complete_batch(batch_index, batch, parts, stats)
+
+    analyzer.analyze_batch_async = slow_first_batches
+    analyzer.complete_batch = record_merge
+    analyzer.process_batches()
+
+    assert finished == ["e.py", "d.py", "c.py", "b.py", "a.py"]
+    assert merged == [(0, "a.py"), (1, "b.py"), (2, "c.py"), (3, "d.py"), (4, "e.py")]
+    assert list(analyzer.file_descriptions) == ["a.py", "b.py", "c.py", "d.py", "e.py"]
+
+
+class FakeClock:
+    """Stands in for the time module of the rate limiter, advanced by its sleeps."""
+
+    def __init__(self, monkeypatch):
+        self.now = 0.0
+        self.sleep = asyncio.sleep
+        monkeypatch.setattr(project_analyzer, "time", self)
+        monkeypatch.setattr(project_analyzer.asyncio, "sleep", self.advance)
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def advance(self, seconds: float):
+        self.now += seconds
+        await self.sleep(0)
+
+
+def acquire_all(limiter: RateLimiter, clock: FakeClock, costs) -> list:
+    """Acquire the limiter for each token cost in turn, returning when each was granted."""
+    granted = []
+
+    async def acquire():
+        for tokens in costs:
+            await limiter.acquire(tokens)
+            granted.append(clock.now)
+
+    asyncio.run(acquire())
+    return granted
+
+
+def test_requests_wait_for_the_window(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    limiter = RateLimiter(requests_per_minute=2)
+    granted = acquire_all(limiter, clock, [1, 1, 1, 1, 1])
+    window = RateLimiter.WINDOW_SECONDS
+    assert granted == [0.0, 0.0, window, window, 2 * window]
+
+
+def test_tokens_wait_for_the_window(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    limiter = RateLimiter(tokens_per_minute=1000)
+    # A request over the whole budget still goes through on an empty window
+    granted = acquire_all(limiter, clock, [600, 300, 200, 5000])
+    window = RateLimiter.WINDOW_SECONDS
+    assert granted == [0.0, 0.0, window, 2 * window]
+
+    limiter._expire(3 * window)
+    assert len(limiter._sent) == 0
+    assert limiter._tokens_in_window == 0
@@ -0,0 +1,68 @@
+import pytest
+
+from data_models import DataModelRegistry, attribute_key, model_key
+
+
+@pytest.mark.parametrize("name", ["User", "UserEntity", "users", "models.User", "App\\Models\\User", "user_dto"])
+def test_names_of_the_same_entity_share_a_key(name):
+    assert model_key(name) == "user"
+
+
+def test_distinct_entities_keep_distinct_keys():
+    assert model_key("OrderItem") == "order_item"
+    assert model_key("Categories") == "category"
+    assert model_key("Address") == "address"
+    assert model_key("Entity") == "entity"
+    assert attribute_key("userId") == attribute_key("UserID") == attribute_key("user_id")
+
+
+def test_merge_combines_attributes_and_relationships():
+    registry = DataModelRegistry()
+    registry.merge_all({
+        "UserEntity": {
+            "description": "A user",
+            "attributes": {"userId": "", "email": "Login email"},
+            "relationships": ["has many Orders"],
+        },
+        "users": {
+            "description": "A registered user of the shop",
+            "attributes": {"user_id": "Primary key", "createdAt": "Signup time"},
+            "relationships": ["Has  many orders", "belongs to Company"],
+        },
+    })
+    registry.merge("Order", {"attributes": ["id", "total"]})
+
+    assert len(registry) == 2
+    user = registry.get("models.User")
+    assert user.name == "users"
+    assert user.to_dict() == {
+        "description": "A registered user of the shop",
+        "attributes": {"userId": "Primary key", "email": "Login email", "createdAt": "Signup time"},
+        "relationships": ["has many Orders", "belongs to Company"],
+        "aliases": ["UserEntity"],
+    }
+    assert [model.name for model in registry.ranked()] == ["users", "Order"]
+    assert DataModelRegistry.from_dict(registry.to_dict()).to_dict() == registry.to_dict()
+
+
+def test_merge_tolerates_malformed_models():
+    registry = DataModelRegistry()
+    registry.merge("", {"attributes": {"id": ""}})
+    registry.merge(None, {})
+    registry.merge("Invoice", "not a dict")
+    registry.merge("Invoice", {
+        "description": 3,
+        "attributes": {"amount": None},
+        "relationships": "belongs to Customer",
+        "aliases": [None, "Bill"],
+    })
+    registry.merge("Invoice", {"attributes": 5, "relationships": {"a": 1}})
+    registry.merge_all(["not", "a", "dict"])
+
+    assert len(registry) == 1
+    assert registry.get("invoices").to_dict() == {
+        "description": "",
+        "attributes": {"amount": ""},
+        "relationships": ["belongs to Customer"],
+        "aliases": ["Bill"],
+    }
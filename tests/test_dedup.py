@@ -0,0 +1,54 @@
+import random
+
+from dedup import fingerprint_files, find_duplicates
+
+WORDS = ["alpha", "beta", "gamma", "delta", "user", "order", "total", "price",
+         "count", "items", "value", "result", "name", "index", "first", "last"]
+
+
+def make_source(seed, lines=120):
+    rng = random.Random(seed)
+    return "".join(
+        f"def f{i}({rng.choice(WORDS)}, {rng.choice(WORDS)}):\n"
+        f"    return {rng.choice(WORDS)} + {rng.choice(WORDS)} * {i}\n"
+        for i in range(lines)
+    )
+
+
+def write(tmp_path, name, text):
+    (tmp_path / name).write_text(text)
+    return name
+
+
+def test_identical_and_similar_files_are_grouped(tmp_path):
+    original = make_source(1)
+    lines = original.splitlines(keepends=True)
+    # Change a few lines out of 240
+    similar = "".join(line.replace("return", "return -") if i % 60 == 1 else line
+                      for i, line in enumerate(lines))
+    files = [
+        write(tmp_path, "a.py", original),
+        write(tmp_path, "b.py", original),
+        write(tmp_path, "c.py", similar),
+        write(tmp_path, "d.py", make_source(2)),
+    ]
+    duplicates = find_duplicates(fingerprint_files(str(tmp_path), files, 1024, workers=1), 1024)
+    assert duplicates == {"b.py": ("a.py", True), "c.py": ("a.py", False)}
+
+
+def test_files_below_the_threshold_are_not_grouped(tmp_path):
+    files = [write(tmp_path, "a.py", "x = 1\n"), write(tmp_path, "b.py", "x = 1\n")]
+    fingerprints = fingerprint_files(str(tmp_path), files, 1024, workers=1)
+    assert fingerprints["a.py"].signature is None
+    assert find_duplicates(fingerprints, 1024) == {}
+    assert find_duplicates(fingerprints, 1) == {"b.py": ("a.py", True)}
+
+
+def test_files_sharing_half_their_content_are_not_grouped(tmp_path):
+    first, second = make_source(3).splitlines(True), make_source(4).splitlines(True)
+    half = len(first) // 2
+    files = [
+        write(tmp_path, "a.py", "".join(first)),
+        write(tmp_path, "b.py", "".join(first[:half] + second[half:])),
+    ]
+    assert find_duplicates(fingerprint_files(str(tmp_path), files, 1024, workers=1), 1024) == {}
@@ -0,0 +1,66 @@
+import subprocess
+
+from file_discovery import GitIgnore, iter_files_git, iter_files_scandir
+
+GITIGNORE = """\
+# Comments and blank lines are skipped
+
+*.log
+!keep.log
+/build
+docs/tmp
+out/
+cache
+\\#notes.txt
+"""
+
+FILES = [
+    "app.py", "debug.log", "keep.log", "#notes.txt",
+    "build/main.py", "src/build/main.py",
+    "docs/tmp/draft.py", "src/docs/tmp/draft.py",
+    "out/result.py", "src/out", "src/cache/data.py", "src/cache.py",
+    "src/nested.log", "src/keep.log",
+]
+
+
+def create_tree(root):
+    for path in FILES:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text("x\n")
+    (root / ".gitignore").write_text(GITIGNORE)
+
+
+def test_negation_reincludes_a_file():
+    gitignore = GitIgnore(["*.log", "!keep.log"])
+    assert gitignore.match("debug.log", False) is True
+    assert gitignore.match("src/keep.log", False) is False
+    assert gitignore.match("app.py", False) is None
+
+
+def test_patterns_with_a_slash_are_anchored():
+    gitignore = GitIgnore(["/build", "docs/tmp", "cache"])
+    assert gitignore.match("build", True) is True
+    assert gitignore.match("src/build", True) is None
+    assert gitignore.match("docs/tmp", True) is True
+    assert gitignore.match("src/docs/tmp", True) is None
+    assert gitignore.match("src/cache", True) is True
+
+
+def test_directory_patterns_only_match_directories():
+    gitignore = GitIgnore(["out/"])
+    assert gitignore.match("out", True) is True
+    assert gitignore.match("src/out", True) is True
+    assert gitignore.match("src/out", False) is None
+
+
+def test_scandir_walk_ignores_the_same_files_as_git(tmp_path):
+    create_tree(tmp_path)
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+
+    def walk(iter_files):
+        return sorted(iter_files(str(tmp_path), lambda name: name == ".git", lambda name: True))
+
+    expected = walk(iter_files_git)
+    assert "keep.log" in expected and "src/build/main.py" in expected
+    assert "debug.log" not in expected and "build/main.py" not in expected
+    assert walk(iter_files_scandir) == expected
@@ -0,0 +1,63 @@
+from import_extractors import ImportResolver, build_import_edges, extract_imports
+
+FILES = [
+    "app/__init__.py", "app/main.py", "app/models/user.py", "app/util/json.py",
+    "app/util/helpers.py", "logging.py", "tools/app/main.py",
+    "web/src/api/index.ts", "web/src/components/Button.tsx", "web/src/app.ts",
+    "java/com/acme/model/User.java", "java/com/acme/model/Order.java",
+    "go/server/handler.go", "go/server/handler_test.go",
+]
+
+
+def resolver() -> ImportResolver:
+    return ImportResolver(FILES, {"example.com/shop": "go"})
+
+
+def test_python_imports_resolve_to_project_modules():
+    imports = resolver()
+    assert imports.resolve("app/main.py", "app.models.user") == ["app/models/user.py"]
+    # "from app.models import user" names the submodule
+    assert imports.resolve("app/main.py", "app.models|user") == ["app/models/user.py"]
+    assert imports.resolve("app/util/helpers.py", ".json") == ["app/util/json.py"]
+    assert imports.resolve("app/models/user.py", "..util|helpers") == ["app/util/helpers.py"]
+    # Of two modules with the same dotted suffix, the closest to the importer wins
+    assert imports.resolve("app/models/user.py", "main") == ["app/main.py"]
+    assert imports.resolve("tools/other.py", "main") == ["tools/app/main.py"]
+
+
+def test_standard_library_imports_are_not_project_files():
+    imports = resolver()
+    assert imports.resolve("app/main.py", "json") == []
+    assert imports.resolve("app/main.py", "json|loads") == []
+    assert imports.resolve("app/main.py", "os.path") == []
+    # A module at the root shadows the standard library one
+    assert imports.resolve("app/main.py", "logging") == ["logging.py"]
+
+
+def test_script_java_and_go_imports_resolve():
+    imports = resolver()
+    assert imports.resolve("web/src/app.ts", "./api") == ["web/src/api/index.ts"]
+    assert imports.resolve("web/src/api/index.ts", "../components/Button") == [
+        "web/src/components/Button.tsx"
+    ]
+    assert imports.resolve("web/src/app.ts", "react") == []
+    assert imports.resolve("java/com/acme/model/Order.java", "com.acme.model.User") == [
+        "java/com/acme/model/User.java"
+    ]
+    assert sorted(imports.resolve("java/Main.java", "com.acme.model.*")) == [
+        "java/com/acme/model/Order.java", "java/com/acme/model/User.java"
+    ]
+    assert imports.resolve("go/main.go", "example.com/shop/server") == ["go/server/handler.go"]
+    assert imports.resolve("go/main.go", "fmt") == []
+
+
+def test_import_edges_of_a_project(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "json.py").write_text("import json\nfrom . import util\n")
+    (tmp_path / "pkg" / "util.py").write_text("import json\nimport pkg.json as local\n")
+    files = ["pkg/__init__.py", "pkg/json.py", "pkg/util.py"]
+    assert extract_imports("pkg/util.py", "import json\n") == ["json"]
+    assert build_import_edges(str(tmp_path), files) == [
+        ("pkg/json.py", "pkg/util.py"), ("pkg/util.py", "pkg/json.py"),
+    ]
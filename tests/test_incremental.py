@@ -0,0 +1,105 @@
+import subprocess
+from pathlib import Path
+
+from llm_backends import FakeBackend
+from progress import ProgressReporter
+from project_analyzer import ProjectAnalyzer
+
+
+def git(path: Path, *args: str):
+    subprocess.run(["git", *args], cwd=path, check=True, capture_output=True)
+
+
+def create_analyzer(project: Path, output_dir: Path, use_git: bool = True) -> ProjectAnalyzer:
+    analyzer = ProjectAnalyzer(
+        str(project), "*.py", incremental=True, use_git=use_git, assume_yes=True,
+        reporter=ProgressReporter(quiet=True), backend=FakeBackend(),
+        output_dir=str(output_dir)
+    )
+    analyzer.collect_files()
+    return analyzer
+
+
+def test_edited_untracked_file_is_changed(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    git(project, "init", "-q")
+    (project / "a.py").write_text("A = 1\n")
+    git(project, "add", "a.py")
+    git(project, "-c", "user.name=test", "-c", "user.email=test@example.com",
+        "commit", "-q", "-m", "a")
+    (project / "b.py").write_text("B = 1\n")
+
+    state = create_analyzer(project, tmp_path / "out").state_dict()
+    assert state["commit"]
+    assert set(state["files"]) == {"a.py", "b.py"}
+
+    (project / "b.py").write_text("B = 2\n")
+    analyzer = create_analyzer(project, tmp_path / "out")
+    assert analyzer.find_changed_files(state) == {Path("b.py")}
+
+
+def test_importers_of_changed_and_deleted_files_are_analyzed_again(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "a.py").write_text("A = 1\n")
+    (project / "b.py").write_text("from a import A\n")
+    (project / "c.py").write_text("C = 1\n")
+    (project / "d.py").write_text("from c import C\n")
+    (project / "e.py").write_text("E = 1\n")
+
+    analyzer = create_analyzer(project, tmp_path / "out", use_git=False)
+    analyzer.build_dependency_graph()
+    state = analyzer.state_dict()
+    state["file_descriptions"] = {file_path: "Described." for file_path in state["files"]}
+
+    (project / "a.py").write_text("A = 2\n")
+    (project / "c.py").unlink()
+    analyzer = create_analyzer(project, tmp_path / "out", use_git=False)
+    analyzer.build_dependency_graph()
+    analyzer.restore_state(state)
+    assert analyzer.changed_files == {Path("a.py"), Path("b.py"), Path("d.py")}
+    assert analyzer.processed_files == {Path("e.py")}
+
+
+def test_reverted_file_that_was_dirty_when_saved_is_changed(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    git(project, "init", "-q")
+    (project / "a.py").write_text("A = 1\n")
+    git(project, "add", "a.py")
+    git(project, "-c", "user.name=test", "-c", "user.email=test@example.com",
+        "commit", "-q", "-m", "a")
+
+    (project / "a.py").write_text("A = 2\n")
+    state = create_analyzer(project, tmp_path / "out").state_dict()
+    assert state["dirty_files"] == ["a.py"]
+
+    (project / "a.py").write_text("A = 1\n")
+    analyzer = create_analyzer(project, tmp_path / "out")
+    assert analyzer.find_changed_files(state) == {Path("a.py")}
+
+
+def test_features_and_data_models_of_changed_and_deleted_files_are_dropped(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    for name in ("a", "b", "c"):
+        (project / f"{name}.py").write_text(f"{name.upper()} = 1\n")
+
+    analyzer = create_analyzer(project, tmp_path / "out", use_git=False)
+    analyzer.build_dependency_graph()
+    for name in ("a", "b", "c"):
+        analyzer.merge_batch_result([Path(f"{name}.py")], {
+            "file_descriptions": {f"{name}.py": "Described."},
+            "features": [f"Feature {name}"],
+            "data_models": {f"Model{name.upper()}": {"attributes": {"id": ""}}},
+        })
+    state = analyzer.state_dict()
+
+    (project / "b.py").write_text("B = 2\n")
+    (project / "c.py").unlink()
+    analyzer = create_analyzer(project, tmp_path / "out", use_git=False)
+    analyzer.build_dependency_graph()
+    analyzer.restore_state(state)
+    assert analyzer.features == {"Feature a"}
+    assert [model.name for model in analyzer.data_models] == ["ModelA"]
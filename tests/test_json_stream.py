@@ -0,0 +1,71 @@
+import json
+
+from json_stream import StreamingJSONObject
+
+RESPONSE = {
+    "file_descriptions": {
+        "src/app.py": "Starts the \"app\" server.",
+        "src/paths.py": "Joins C:\\ paths and {braces}, [brackets] and \\\"quotes\\\".",
+        "src/unicode.py": "Handles caf\u00e9 and \u2603.",
+    },
+    "module_descriptions": {"src": "The application."},
+    "features": ["Serving", "Routing"],
+    "data_models": {"User": {"attributes": {"id": "Key"}, "relationships": ["has Orders"]}},
+}
+
+
+def feed_in_chunks(text: str, size: int) -> StreamingJSONObject:
+    entries = []
+    parser = StreamingJSONObject(
+        "file_descriptions", lambda key, value: entries.append((key, value))
+    )
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    parser.streamed = entries
+    return parser
+
+
+def test_members_and_entries_are_parsed_in_any_chunking():
+    text = "```json\n" + json.dumps(RESPONSE, indent=2) + "\n```"
+    for size in (1, 2, 3, 7, 64, len(text)):
+        parser = feed_in_chunks(text, size)
+        assert parser.done
+        assert parser.partial() == RESPONSE
+        assert parser.streamed == list(RESPONSE["file_descriptions"].items())
+
+
+def test_escaped_strings_do_not_end_strings_or_entries():
+    text = json.dumps({"file_descriptions": {"a\"b.py": "x\\", "c.py": "\\\"}, {"}})
+    parser = feed_in_chunks(text, 1)
+    assert parser.entries == {"a\"b.py": "x\\", "c.py": "\\\"}, {"}
+
+
+def test_nested_members_are_parsed_once_complete():
+    parser = StreamingJSONObject("file_descriptions")
+    parser.feed('{"data_models": {"User": {"attributes": {"id": "Key"}')
+    assert parser.members == {}
+    parser.feed('}}, "features": ["A"')
+    assert parser.members == {"data_models": {"User": {"attributes": {"id": "Key"}}}}
+    parser.feed("]}")
+    assert parser.members["features"] == ["A"]
+    assert parser.done
+
+
+def test_truncated_input_keeps_complete_entries_and_members():
+    text = json.dumps(RESPONSE)
+    cut = text.index("src/unicode.py") + 10
+    parser = feed_in_chunks(text[:cut], 5)
+    assert not parser.done
+    assert parser.partial() == {
+        "file_descriptions": {
+            "src/app.py": RESPONSE["file_descriptions"]["src/app.py"],
+            "src/paths.py": RESPONSE["file_descriptions"]["src/paths.py"],
+        },
+    }
+
+
+def test_text_after_the_object_is_ignored():
+    parser = StreamingJSONObject("file_descriptions")
+    parser.feed('Here it is: {"features": ["A"]} and {"features": ["B"]}')
+    assert parser.done
+    assert parser.partial() == {"features": ["A"], "file_descriptions": {}}
@@ -0,0 +1,27 @@
+import json
+
+from output_writer import FILES_SECTION, ResultsWriter
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_descriptions_written_while_streaming_are_not_repeated_when_merged(tmp_path):
+    stream_path = tmp_path / "stream.ndjson"
+    writer = ResultsWriter(str(tmp_path), str(tmp_path / "analysis.md"), str(stream_path))
+    writer.start({"old.py": "Resumed."}, {})
+    writer.add_files([("a.py", "First.")])
+    writer.add_files([("old.py", "Resumed."), ("a.py", "First."), ("b.py", "Second.")])
+    writer.add_files([("a.py", "Retried.")])
+    writer.close({"type": "stopped"})
+
+    assert [(record.get("path"), record.get("description"))
+            for record in read_records(stream_path)] == [
+        ("old.py", "Resumed."), ("a.py", "First."), ("b.py", "Second."),
+        ("a.py", "Retried."), (None, None),
+    ]
+    section = (tmp_path / "sections" / (FILES_SECTION + ".md")).read_text()
+    assert section.count("### a.py") == 2
+    assert section.count("### old.py") == 1
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from progress import ProgressReporter
+from project_analyzer import ProjectAnalyzer
+from response_cache import ResponseCache
+
+
+def test_get_returns_what_put_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get("a") is None
+    cache.put("a", {"file_descriptions": {"a.py": "A."}})
+    assert cache.get("a") == {"file_descriptions": {"a.py": "A."}}
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path))
+    assert reopened.get("a") == {"file_descriptions": {"a.py": "A."}}
+    reopened.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("response_cache.time.time", lambda: next(clock))
+    value = {"text": "x" * 100}
+    # Room for two entries of 112 bytes
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+    cache.put("a", value)
+    cache.put("b", value)
+    assert cache.get("a") == value
+    cache.put("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+    cache.close()
+
+
+def first_batch_key(project: Path, **options) -> str:
+    analyzer = ProjectAnalyzer(
+        str(project), "*.py", assume_yes=True, reporter=ProgressReporter(quiet=True),
+        output_dir=str(project.parent / "out"), **options
+    )
+    analyzer.collect_files()
+    batch = next(analyzer.iter_remaining_batches())
+    return analyzer.batch_cache_key(analyzer.build_batch_messages(batch))
+
+
+def test_batch_key_follows_the_prompt(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "a.py").write_text("".join(f"VALUE_{i} = {i}\n" for i in range(500)))
+    key = first_batch_key(project, max_file_bytes=1024)
+
+    assert first_batch_key(project, max_file_bytes=1024) == key
+    # The file is truncated differently, so the prompt differs
+    assert first_batch_key(project, max_file_bytes=2048) != key
+    (project / "a.py").write_text("".join(f"VALUE_{i} = {i + 1}\n" for i in range(500)))
+    assert first_batch_key(project, max_file_bytes=1024) != key
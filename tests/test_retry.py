@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import retry
+from llm_backends import rate_limit_error
+from retry import call_with_retries, call_with_retries_async, is_retryable, retry_after
+
+
+def status_error(status_code: int, headers=None) -> openai.APIStatusError:
+    response = httpx.Response(
+        status_code, headers=headers or {},
+        request=httpx.Request("POST", "http://test/chat/completions")
+    )
+    return openai.APIStatusError(f"Status {status_code}", response=response, body=None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(retry.time, "sleep", delays.append)
+
+    async def sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(retry.asyncio, "sleep", sleep)
+    return delays
+
+
+def failing_then_succeeding(errors):
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "done"
+    return call
+
+
+def test_errors_are_classified():
+    assert is_retryable(rate_limit_error(1.0))
+    assert is_retryable(status_error(408))
+    assert is_retryable(status_error(503))
+    assert is_retryable(openai.APITimeoutError(httpx.Request("POST", "http://test")))
+    assert not is_retryable(status_error(400))
+    assert not is_retryable(status_error(401))
+    assert not is_retryable(status_error(404))
+    assert not is_retryable(ValueError("not a request error"))
+
+
+def test_retry_after_headers_are_read():
+    assert retry_after(status_error(429, {"retry-after": "7"})) == 7.0
+    assert retry_after(status_error(429, {"retry-after-ms": "1500", "retry-after": "7"})) == 1.5
+    assert retry_after(status_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after(status_error(429)) is None
+    assert retry_after(ValueError()) is None
+
+
+def test_retry_after_is_honored(sleeps):
+    retries = []
+    result = call_with_retries(
+        failing_then_succeeding([rate_limit_error(30.0), rate_limit_error(5.0)]), 3,
+        lambda error, delay: retries.append(delay)
+    )
+    assert result == "done"
+    assert sleeps == retries
+    # Jitter of up to one base delay is added to what the server asked for
+    assert 30.0 <= sleeps[0] <= 30.0 + retry.BASE_DELAY
+    assert 5.0 <= sleeps[1] <= 5.0 + retry.BASE_DELAY
+
+
+def test_non_retryable_errors_are_raised_at_once(sleeps):
+    with pytest.raises(openai.APIStatusError):
+        call_with_retries(failing_then_succeeding([status_error(400)]), 3)
+    assert sleeps == []
+
+
+def test_retries_stop_after_max_retries(sleeps):
+    call = failing_then_succeeding([status_error(500)] * 3)
+
+    async def call_async():
+        return call()
+
+    with pytest.raises(openai.APIStatusError):
+        asyncio.run(call_with_retries_async(call_async, 2))
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= retry.BASE_DELAY * 2 for delay in sleeps)
@@ -0,0 +1,23 @@
+import pytest
+
+from workspace import FairQueue, unique_names
+
+
+def test_repeated_names_are_numbered():
+    assert unique_names(["api", "web", "api", "api"]) == ["api", "web", "api-2", "api-3"]
+
+
+def test_numbers_skip_names_already_given():
+    names = unique_names(["api", "api", "api-2"])
+    assert names == ["api", "api-3", "api-2"]
+    assert unique_names(["api-2", "api", "api", "api-2"]) == ["api-2", "api", "api-3", "api-2-2"]
+
+
+def test_fair_queue_takes_turns_between_repositories():
+    queue = FairQueue()
+    queue.add("a", [1, 2, 3])
+    queue.add("b", [4])
+    taken = [queue.pop() for _ in range(4)]
+    assert taken == [("a", 1), ("b", 4), ("a", 2), ("a", 3)]
+    with pytest.raises(IndexError):
+        queue.pop()
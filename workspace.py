@@ -0,0 +1,121 @@
+"""Repositories of a workspace analyzed together, and the fair queue sharing the LLM among them."""
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Repository(NamedTuple):
+    """A repository of a workspace."""
+    # Unique name, also the folder of its outputs
+    name: str
+    path: str
+    # Extensions as for --ext, None to use the ones given on the command line
+    ext: Optional[str]
+
+
+def unique_names(names: List[str]) -> List[str]:
+    """Make names unique by numbering repeated ones, e.g. api, api-2.
+
+    Numbers skip the names already given, so ["api", "api", "api-2"] gives
+    api, api-3 and api-2.
+    """
+    given = set(names)
+    taken = set()
+    unique = []
+    for name in names:
+        candidate = name
+        number = 1
+        while candidate in taken or (candidate != name and candidate in given):
+            number += 1
+            candidate = f"{name}-{number}"
+        taken.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
+def _repository_entries(entries: List[Any], base_dir: str) -> List[Tuple[Optional[str], str, Optional[str]]]:
+    """(name, path, ext) of manifest entries, with paths relative to base_dir resolved."""
+    parsed = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        if not isinstance(entry, dict) or not entry.get("path"):
+            raise ValueError(f"Invalid repository entry in the manifest: {entry!r}")
+        parsed.append((
+            entry.get("name"),
+            os.path.join(base_dir, os.path.expanduser(entry["path"])),
+            entry.get("ext"),
+        ))
+    return parsed
+
+
+def load_manifest(manifest_path: str) -> List[Repository]:
+    """Read the repositories of a workspace manifest.
+
+    The manifest is either JSON, a list of repositories or an object with a
+    "repositories" list, where each repository is a path or an object with a
+    "path" and optionally a "name" and an "ext"; or text with one repository
+    per line, as a path optionally followed by its extensions. Relative paths
+    are relative to the manifest.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        data = data.get("repositories")
+    if isinstance(data, list):
+        entries = _repository_entries(data, base_dir)
+    else:
+        entries = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path, _, ext = line.partition(" ")
+            entries.append((None, os.path.join(base_dir, os.path.expanduser(path)),
+                            ext.strip() or None))
+    if not entries:
+        raise ValueError(f"No repositories listed in {manifest_path}")
+    return workspace_repositories(entries)
+
+
+def workspace_repositories(entries: List[Tuple[Optional[str], str, Optional[str]]]) -> List[Repository]:
+    """Build repositories from (name, path, ext), naming unnamed ones after their folder."""
+    names = unique_names([
+        name or Path(path).resolve().name or "repository" for name, path, _ in entries
+    ])
+    return [Repository(name, path, ext) for name, (_, path, ext) in zip(names, entries)]
+
+
+class FairQueue:
+    """Round-robin queue over the items of several owners.
+
+    Each pop takes the next item of the next owner that has items left, so
+    every owner gets an equal share of the consumers, however many items the
+    others have. Items are taken from their iterables only when popped, so
+    they can be produced lazily.
+    """
+
+    def __init__(self):
+        self._queues: Deque[Tuple[Any, Iterator]] = deque()
+
+    def add(self, owner: Any, items: Iterable):
+        self._queues.append((owner, iter(items)))
+
+    def pop(self) -> Tuple[Any, Any]:
+        """Return the next (owner, item); raises IndexError when no owner has items left."""
+        while self._queues:
+            owner, items = self._queues.popleft()
+            try:
+                item = next(items)
+            except StopIteration:
+                continue
+            self._queues.append((owner, items))
+            return owner, item
+        raise IndexError("pop from an empty FairQueue")